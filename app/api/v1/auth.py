@@ -1,13 +1,22 @@
-from fastapi import APIRouter
-from app.schemas.user import UserCreate, UserRead, UserLogin, Token
+from fastapi import APIRouter, Depends
+from app.core.hashing import password_hasher
+from app.core.security import get_current_superuser
+from app.schemas.user import UserCreate, UserRead, UserLogin, Token, HashingStatsResponse
 from app.services.user_service import register_user, login_user
 
 router = APIRouter()
 
 @router.post("/register", summary="Registrar usuario", response_model=UserRead)
-def register(user: UserCreate):
-    return register_user(user)
+async def register(user: UserCreate):
+    return await register_user(user)
 
 @router.post("/login", summary="Autenticar usuario", response_model=Token)
-def login(user: UserLogin):
-    return login_user(user)
\ No newline at end of file
+async def login(user: UserLogin):
+    return await login_user(user)
+
+@router.get("/hashing/", summary="Estado de los procesos de cifrado de contraseñas", response_model=HashingStatsResponse, dependencies=[Depends(get_current_superuser)])
+def hashing_stats():
+    """
+    Devuelve las contraseñas cifradas, verificadas y actualizadas, y los tiempos de cifrado y de espera
+    """
+    return HashingStatsResponse(**password_hasher.stats())
\ No newline at end of file
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Response, status
+from app.db.database import ping
+from app.schemas.health import LivenessResponse, ReadinessResponse
+from app.services.extraction_pool import extraction_pool
+from app.services.startup import startup_state
+
+router = APIRouter()
+
+@router.get("/live", summary="Comprobar que el proceso responde", response_model=LivenessResponse)
+def live():
+    """
+    Responde mientras el proceso esté en ejecución, sin comprobar sus dependencias
+    """
+    return LivenessResponse(status='ok')
+
+@router.get("/ready", summary="Comprobar que el servidor puede procesar estados de cuenta", response_model=ReadinessResponse)
+async def ready(response: Response):
+    """
+    Responde con el código 200 cuando el servidor terminó de iniciar, incluido el precalentamiento si está activado,
+    los procesos de extracción están en ejecución y la base de datos responde, y con 503 en caso contrario.
+    Devuelve también los segundos que tardaron el inicio y el precalentamiento
+    """
+    checks = {
+        "startup": startup_state.ready,
+        "extraction_pool": extraction_pool.workers <= 0 or extraction_pool.running,
+        "database": await ping(),
+    }
+    is_ready = all(checks.values())
+    if not is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return ReadinessResponse(
+        status='ready' if is_ready else 'not_ready',
+        checks=checks,
+        startup_seconds=startup_state.startup_seconds,
+        warmup_seconds=startup_state.warmup_seconds,
+    )
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+@router.get("", summary="Métricas en formato Prometheus", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Devuelve los histogramas de duración de cada etapa del procesamiento y de cada endpoint, y de las páginas y transacciones de los estados de cuenta extraídos, en el formato de texto de Prometheus
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Las métricas están deshabilitadas")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
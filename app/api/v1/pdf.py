@@ -1,132 +1,359 @@
-from fastapi import APIRouter, Depends
-from app.services.pdf_analyzer import PdfAnalyzer
-from app.schemas.pdf import PdfContentRequest, PdfTransactionsResponse, PdfDepositsResponse, PdfSalesResponse
-import tempfile
-from app.core.security import get_current_user
+import asyncio
+import os
+import pandas as pd
+from typing import Literal, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status as http_status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from app.db.models import User
+from app.services.pdf_analyzer import analyze_pdf, analyze_pdfs, records
+from app.services.pagination import keyset_page, uses_cursor
+from app.services.export import ExportFormat, export_response, negotiate_format, table_chunks
+from app.services.parse_cache import parse_cache
+from app.services.extraction_pool import extraction_pool, PoolSaturatedError
+from app.schemas.pdf import PdfContentRequest, PdfBatchRequest, PdfBatchResponse, PdfTransactionsResponse, PdfDepositsResponse, PdfSalesResponse, PdfSummaryResponse, PdfTimeseriesResponse, PdfSuppliersResponse, PdfFailuresResponse, CacheStatsResponse, PoolStatsResponse, PdfJobResponse, PdfJobResultsResponse
+from app.services.upload import UploadedPdf, save_upload, save_batch, keep_upload, count_statements
+from app.services.jobs import Job, job_manager
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.rate_limit import Admission, admit_parse, admit_user, release_admission
+from app.core.security import get_current_user, get_current_superuser
 
 router = APIRouter(
     dependencies=[Depends(get_current_user)]
 )
 
+async def get_uploaded_pdf(params: PdfContentRequest = Depends(), admission: Admission = Depends(admit_parse)):
+    """Stores the uploaded PDF on disk for the duration of the request, once the user is admitted"""
+    async with save_upload(params.file) as pdf:
+        yield pdf
+
+async def admit_batch(params: PdfBatchRequest = Depends(), current_user: User = Depends(get_current_user)):
+    """Admits a batch charging the rate limit of the user one request per statement, before storing it"""
+    admission = await admit_user(current_user, await asyncio.to_thread(count_statements, params.files))
+    try:
+        yield admission
+    finally:
+        await release_admission(admission)
+
+async def run_analysis(pdf: UploadedPdf, method: str, **kwargs):
+    """
+    Runs an analysis of the statement in the extraction pool
+
+    Raises:
+        HTTPException: If the server is busy processing other files
+    """
+    try:
+        return await analyze_pdf(pdf.path, method, digest=pdf.digest, **kwargs)
+    except PoolSaturatedError:
+        raise busy_error()
+
+def paginate(pdf_data: pd.DataFrame, page: Optional[int], limit: Optional[int], cursor: Optional[str] = None, pagination: str = 'page') -> dict:
+    """
+    Returns the fields of the response for the requested page, or all data if there is no page.
+    Pages requested by cursor are ordered by date and id.
+    Only the rows of the page are converted into dictionaries.
+    """
+    if uses_cursor(limit, cursor, pagination):
+        return keyset_page(pdf_data, limit, cursor)
+
+    # If no exist `page` and `limit`, return all data
+    if page is None or limit is None:
+        return {"results": records(pdf_data)}
+
+    # Apply pagination
+    paginated_data = pdf_data.iloc[(page - 1) * limit: page * limit]
+    return {"total": len(pdf_data), "page": page, "limit": limit, "results": records(paginated_data)}
+
+def json_response(content: Union[BaseModel, dict]) -> Response:
+    """
+    Serializes the content of a response once. FastAPI does not validate a returned Response
+    against `response_model` again, which stays for the documentation.
+
+    Args:
+        content (Union[BaseModel, dict]): A model, already validated when it was created, or the
+        fields of a response whose transactions were converted by `records` to the types of `TransactionData`
+    """
+    with metrics.stage('serialize'):
+        if isinstance(content, BaseModel):
+            return Response(content.model_dump_json(), media_type="application/json")
+        return ORJSONResponse(content)
+
+def transactions_response(pdf_data: pd.DataFrame, page: Optional[int] = None, limit: Optional[int] = None, cursor: Optional[str] = None, pagination: str = 'page') -> dict:
+    """Builds the fields of `PdfTransactionsResponse` from the result of `PdfAnalyzer.transactions`"""
+    return {"total": None, "page": None, "limit": None, "next_cursor": None, **paginate(pdf_data, page, limit, cursor, pagination)}
+
+def deposits_response(deposits: tuple, page: Optional[int] = None, limit: Optional[int] = None, cursor: Optional[str] = None, pagination: str = 'page') -> dict:
+    """Builds the fields of `PdfDepositsResponse` from the result of `PdfAnalyzer.deposits`"""
+    total_amount, pdf_data = deposits
+    return {**transactions_response(pdf_data, page, limit, cursor, pagination), "total_amount": total_amount}
+
+def sales_response(sales: tuple, page: Optional[int] = None, limit: Optional[int] = None, cursor: Optional[str] = None, pagination: str = 'page') -> dict:
+    """Builds the fields of `PdfSalesResponse` from the result of `PdfAnalyzer.sales`"""
+    total_amount, total_saldo, total_propia, total_movil, total_nauta, total_nauta_hogar, total_factura, profits, pdf_data = sales
+    return {
+        **transactions_response(pdf_data, page, limit, cursor, pagination),
+        "total_amount": total_amount,
+        "total_saldo": total_saldo,
+        "total_propia": total_propia,
+        "total_movil": total_movil,
+        "total_nauta": total_nauta,
+        "total_nauta_hogar": total_nauta_hogar,
+        "total_factura": total_factura,
+        "profits": profits,
+    }
+
+def busy_error() -> HTTPException:
+    """Error returned when the server cannot accept more files"""
+    return HTTPException(
+        status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="El servidor está procesando demasiados archivos. Inténtalo de nuevo más tarde",
+        headers={"Retry-After": str(settings.EXTRACTION_RETRY_AFTER_SECONDS)},
+    )
+
+def unprocessable_error(error: ValueError) -> HTTPException:
+    """Error returned when the statement cannot be read or the analysis is not valid, with the message of `error`"""
+    return HTTPException(status_code=http_status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error))
+
 @router.post("/transactions/", summary="Obtener todas las transacciones", response_model=PdfTransactionsResponse)
-async def transactions(params: PdfContentRequest = Depends()):
+async def transactions(
+    params: PdfContentRequest = Depends(),
+    pdf: UploadedPdf = Depends(get_uploaded_pdf),
+    format: Optional[ExportFormat] = Query(None, description="Formato de la respuesta, por defecto según la cabecera Accept"),
+    accept: Optional[str] = Header(None, include_in_schema=False),
+):
     """
     Extrae todas las transacciones del estado de cuenta, de forma paginada si se especifica *file* y *page*
     - **file**: Archivo PDF del estado de cuenta
     - **status**: Estado de las transacciones
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
     - **page** (opcional): Número de página
     - **limit** (opcional): Número de transacciones por cada página
+    - **pagination** (opcional): *cursor* para paginar por cursor, ordenadas por fecha e id, desde la primera página
+    - **cursor** (opcional): Valor de *next_cursor* de la página anterior
+    - **format** (opcional): *json*, o *ndjson*, *csv*, *arrow* y *xlsx* para descargar todas las transacciones sin paginar
     """
     try:
-        # Read request data
-        status = params.status if params.status else None
-        page = params.page if params.page else None
-        limit = params.limit if params.limit else None
-
-        # Save the PDF temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(await params.file.read())
-
-        pdf_data = PdfAnalyzer(temp_pdf.name).transactions(transaction_status=status)
-
-        # If no exist `page` and `limit`, return all data
-        if page is None or limit is None:
-            return PdfTransactionsResponse(results=pdf_data)
-
-        # Apply pagination
-        paginated_data = pdf_data[(page - 1) * limit: page * limit]
-
-        return PdfTransactionsResponse(
-            total=len(pdf_data), page=page, limit=limit, results=paginated_data
-        )
-    except Exception as e:
-        return {"error": str(e)}
+        pdf_data = await run_analysis(pdf, 'transactions', filters=params.filters(), transaction_status=params.status)
+        format = negotiate_format(format, accept)
+        if format != 'json':
+            return export_response(table_chunks(pdf_data), format, 'transacciones')
+        return json_response(transactions_response(pdf_data, params.page, params.limit, params.cursor, params.pagination))
+    except ValueError as e:
+        raise unprocessable_error(e)
 
 @router.post("/deposits/", summary="Obtener todos los depósitos realizados", response_model=PdfDepositsResponse)
-async def deposits(params: PdfContentRequest = Depends()):
+async def deposits(params: PdfContentRequest = Depends(), pdf: UploadedPdf = Depends(get_uploaded_pdf)):
     """
     Extrae todos los depósitos del estado de cuenta, de forma paginada si se especifica *file* y *page*
     - **file**: Archivo PDF del estado de cuenta
     - **status**: Estado de las transacciones
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    - **page** (opcional): Número de página
+    - **limit** (opcional): Número de transacciones por cada página
+    - **pagination** (opcional): *cursor* para paginar por cursor, ordenadas por fecha e id, desde la primera página
+    - **cursor** (opcional): Valor de *next_cursor* de la página anterior
+    """
+    try:
+        result = await run_analysis(pdf, 'deposits', filters=params.filters(), transaction_status=params.status)
+        return json_response(deposits_response(result, params.page, params.limit, params.cursor, params.pagination))
+    except ValueError as e:
+        raise unprocessable_error(e)
+
+@router.post("/sales/", summary="Obtener todas las ventas realizadas y las ganancias", response_model=PdfSalesResponse)
+async def sales(params: PdfContentRequest = Depends(), pdf: UploadedPdf = Depends(get_uploaded_pdf)):
+    """
+    Extrae todas las ventas del estado de cuenta, de forma paginada si se especifica *file* y *page*
+    - **file**: Archivo PDF del estado de cuenta
+    - **status**: Estado de las transacciones
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
     - **page** (opcional): Número de página
     - **limit** (opcional): Número de transacciones por cada página
+    - **pagination** (opcional): *cursor* para paginar por cursor, ordenadas por fecha e id, desde la primera página
+    - **cursor** (opcional): Valor de *next_cursor* de la página anterior
+    """
+    try:
+        result = await run_analysis(pdf, 'sales', filters=params.filters(), transaction_status=params.status)
+        return json_response(sales_response(result, params.page, params.limit, params.cursor, params.pagination))
+    except ValueError as e:
+        raise unprocessable_error(e)
+
+@router.post("/summary/", summary="Obtener el resumen del estado de cuenta", response_model=PdfSummaryResponse)
+async def summary(params: PdfContentRequest = Depends(), pdf: UploadedPdf = Depends(get_uploaded_pdf)):
+    """
+    Calcula en una sola pasada la cantidad de transacciones, el total depositado, el total vendido por tipo de recarga y las ganancias
+    - **file**: Archivo PDF del estado de cuenta
+    - **status**: Estado de las transacciones
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    """
+    try:
+        result = await run_analysis(pdf, 'summary', filters=params.filters(), transaction_status=params.status)
+        return PdfSummaryResponse(**result)
+    except ValueError as e:
+        raise unprocessable_error(e)
+
+@router.post("/analytics/timeseries/", summary="Obtener las ventas, depósitos y ganancias por día, semana o mes", response_model=PdfTimeseriesResponse)
+async def timeseries(
+    params: PdfContentRequest = Depends(),
+    pdf: UploadedPdf = Depends(get_uploaded_pdf),
+    period: Literal['day', 'week', 'month'] = Query('day', description="Periodo de los totales, las semanas empiezan el lunes"),
+):
+    """
+    Calcula por cada día, semana o mes la cantidad de transacciones, las ventas, los depósitos y las ganancias, sin devolver las transacciones
+    - **file**: Archivo PDF del estado de cuenta
+    - **status**: Estado de las transacciones
+    - **period**: *day*, *week* o *month*
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
     """
     try:
-        # Read request data
-        status = params.status if params.status else None
-        page = params.page if params.page else None
-        limit = params.limit if params.limit else None
+        result = await run_analysis(pdf, 'timeseries', filters=params.filters(), transaction_status=params.status, period=period)
+        return PdfTimeseriesResponse(**result)
+    except ValueError as e:
+        raise unprocessable_error(e)
 
-        # Save the PDF temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(await params.file.read())
+@router.post("/analytics/suppliers/", summary="Obtener los clientes con más ventas", response_model=PdfSuppliersResponse)
+async def top_suppliers(
+    params: PdfContentRequest = Depends(),
+    pdf: UploadedPdf = Depends(get_uploaded_pdf),
+    top: int = Query(10, ge=1, le=100, description="Cantidad de clientes a devolver"),
+    order_by: Literal['amount', 'count'] = Query('amount', description="Ordenar por importe vendido o por cantidad de ventas"),
+):
+    """
+    Devuelve los clientes a los que más se vendió, con su importe, su cantidad de ventas y su parte del total vendido
+    - **file**: Archivo PDF del estado de cuenta
+    - **status**: Estado de las transacciones
+    - **top**: Cantidad de clientes
+    - **order_by**: *amount* o *count*
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    """
+    try:
+        result = await run_analysis(pdf, 'top_suppliers', filters=params.filters(), transaction_status=params.status, top=top, order_by=order_by)
+        return PdfSuppliersResponse(**result)
+    except ValueError as e:
+        raise unprocessable_error(e)
 
-        total_amount, pdf_data = PdfAnalyzer(temp_pdf.name).deposits(transaction_status=status)
+@router.post("/analytics/failures/", summary="Obtener la tasa de transacciones fallidas por forma de pago o tipo", response_model=PdfFailuresResponse)
+async def failure_rates(
+    params: PdfContentRequest = Depends(),
+    pdf: UploadedPdf = Depends(get_uploaded_pdf),
+    by: Literal['payment_type', 'transaction_type'] = Query('payment_type', description="Columna por la que se agrupan las transacciones"),
+):
+    """
+    Calcula por cada forma de pago o tipo de transacción la cantidad de transacciones, las fallidas, su importe y la tasa de fallos.
+    Se consideran todas las transacciones, sin importar *status*
+    - **file**: Archivo PDF del estado de cuenta
+    - **by**: *payment_type* o *transaction_type*
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    """
+    try:
+        result = await run_analysis(pdf, 'failure_rates', filters=params.filters(), by=by)
+        return PdfFailuresResponse(**result)
+    except ValueError as e:
+        raise unprocessable_error(e)
 
-        # If no exist `page` and `limit`, return all data
-        if page is None or limit is None:
-            return PdfDepositsResponse(total_amount=total_amount, results=pdf_data)
+@router.post("/batch/", summary="Analizar varios estados de cuenta a la vez", response_model=PdfBatchResponse, dependencies=[Depends(admit_batch)])
+async def batch(params: PdfBatchRequest = Depends()):
+    """
+    Procesa varios estados de cuenta a la vez, por ejemplo los de todos los días de un mes, y une sus transacciones.
+    Las transacciones repetidas en estados de cuenta que se solapan se cuentan una sola vez
+    - **files**: Archivos PDF de los estados de cuenta o archivos ZIP que los contienen
+    - **status**: Estado de las transacciones
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    """
+    async with save_batch(params.files) as pdfs:
+        try:
+            result = await analyze_pdfs([(pdf.path, pdf.digest) for _, pdf in pdfs], params.status, params.filters())
+        except PoolSaturatedError:
+            raise busy_error()
+    for (filename, _), file in zip(pdfs, result["files"]):
+        file["filename"] = filename
+    return PdfBatchResponse(**result)
 
-        # Apply pagination
-        paginated_data = pdf_data[(page - 1) * limit: page * limit]
+def find_job(job_id: str, current_user: User) -> Job:
+    """
+    Returns the job of the current user
 
-        return PdfDepositsResponse(
-            total=len(pdf_data), page=page, limit=limit, total_amount=total_amount, results=paginated_data
-        )
-    except Exception as e:
-        return {"error": str(e)}
+    Raises:
+        HTTPException: If the job does not exist, expired or belongs to another user
+    """
+    job = job_manager.get(job_id, current_user.username)
+    if job is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Trabajo no encontrado")
+    return job
 
-@router.post("/sales/", summary="Obtener todas las ventas realizadas y las ganancias", response_model=PdfSalesResponse)
-async def sales(params: PdfContentRequest = Depends()):
+@router.post("/jobs", summary="Procesar un estado de cuenta en segundo plano", response_model=PdfJobResponse, status_code=http_status.HTTP_202_ACCEPTED)
+async def submit_job(
+    params: PdfContentRequest = Depends(),
+    pdf: UploadedPdf = Depends(get_uploaded_pdf),
+    admission: Admission = Depends(admit_parse),
+    current_user: User = Depends(get_current_user)
+):
     """
-    Extrae todas las ventas del estado de cuenta, de forma paginada si se especifica *file* y *page*
+    Encola el análisis del estado de cuenta y devuelve el identificador del trabajo sin esperar a que termine.
+    Útil para estados de cuenta con cientos de páginas
     - **file**: Archivo PDF del estado de cuenta
     - **status**: Estado de las transacciones
+    - **transaction_type**, **supplier_id**, **date_from** / **date_to**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    """
+    file_path = keep_upload(pdf)
+    try:
+        job = job_manager.submit(file_path, pdf.digest, params.status, current_user.username, params.filters(), admission.slot)
+    except asyncio.QueueFull:
+        os.remove(file_path)
+        raise busy_error()
+    # The parse slot counts against the limit of the user until the job finishes, the job releases it
+    admission.slot = None
+    return PdfJobResponse.model_validate(job)
+
+@router.get("/jobs/{job_id}", summary="Consultar el estado de un trabajo", response_model=PdfJobResponse)
+def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Devuelve el estado y el progreso del trabajo
+    - **job_id**: Identificador del trabajo
+    """
+    return PdfJobResponse.model_validate(find_job(job_id, current_user))
+
+@router.get("/jobs/{job_id}/results", summary="Obtener los resultados de un trabajo", response_model=PdfJobResultsResponse)
+def get_job_results(
+    job_id: str,
+    page: Optional[int] = Query(None, ge=1, description="Número de página a extraer"),
+    limit: Optional[int] = Query(None, ge=5, description="Cantidad de transacciones por página"),
+    pagination: Literal['page', 'cursor'] = Query('page', description="Paginación por número de página o por cursor"),
+    transactions_cursor: Optional[str] = Query(None, description="Cursor devuelto en *transactions.next_cursor*"),
+    deposits_cursor: Optional[str] = Query(None, description="Cursor devuelto en *deposits.next_cursor*"),
+    sales_cursor: Optional[str] = Query(None, description="Cursor devuelto en *sales.next_cursor*"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Devuelve las transacciones, los depósitos y las ventas del estado de cuenta, de forma paginada si se especifica *page* y *limit*
+    - **job_id**: Identificador del trabajo
     - **page** (opcional): Número de página
     - **limit** (opcional): Número de transacciones por cada página
+    - **pagination** (opcional): *cursor* para paginar por cursor, ordenadas por fecha e id, desde la primera página
+    - **transactions_cursor**, **deposits_cursor**, **sales_cursor** (opcional): Valor de *next_cursor* de la página anterior de cada lista
     """
-    try:
-        # Read request data
-        status = params.status if params.status else None
-        page = params.page if params.page else None
-        limit = params.limit if params.limit else None
-
-        # Save the PDF temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(await params.file.read())
-
-        total_amount, total_saldo, total_propia, total_movil, total_nauta, total_nauta_hogar, total_factura, profits, pdf_data = PdfAnalyzer(temp_pdf.name).sales(transaction_status=status)
-
-        # If no exist `page` and `limit`, return all data
-        if page is None or limit is None:
-            return PdfSalesResponse(
-                total_amount=total_amount,
-                total_saldo=total_saldo,
-                total_propia=total_propia,
-                total_movil=total_movil,
-                total_nauta=total_nauta,
-                total_nauta_hogar=total_nauta_hogar,
-                total_factura=total_factura,
-                profits=profits, 
-                results=pdf_data
-            )
-
-        # Apply pagination
-        paginated_data = pdf_data[(page - 1) * limit: page * limit]
-
-        return PdfSalesResponse(
-            total=len(pdf_data), 
-            page=page, 
-            limit=limit, 
-            total_amount=total_amount,
-            total_saldo=total_saldo,
-            total_propia=total_propia,
-            total_movil=total_movil,
-            total_nauta=total_nauta,
-            total_nauta_hogar=total_nauta_hogar,
-            total_factura=total_factura,
-            profits=profits,
-            results=paginated_data
-        )
-    except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+    job = find_job(job_id, current_user)
+    if job.status == 'failed':
+        raise HTTPException(status_code=http_status.HTTP_409_CONFLICT, detail=f"El trabajo ha fallado: {job.error}")
+    if job.status != 'done':
+        raise HTTPException(status_code=http_status.HTTP_409_CONFLICT, detail="El trabajo aún no ha terminado")
+    return json_response({
+        "transactions": transactions_response(job.results['transactions'], page, limit, transactions_cursor, pagination),
+        "deposits": deposits_response(job.results['deposits'], page, limit, deposits_cursor, pagination),
+        "sales": sales_response(job.results['sales'], page, limit, sales_cursor, pagination),
+    })
+
+@router.get("/cache/", summary="Estadísticas de la caché de estados de cuenta", response_model=CacheStatsResponse, dependencies=[Depends(get_current_superuser)])
+def cache_stats():
+    """
+    Devuelve los aciertos, fallos y el uso de memoria de la caché de estados de cuenta ya procesados
+    """
+    return CacheStatsResponse(**parse_cache.stats())
+
+
+@router.get("/pool/", summary="Estado de los procesos de extracción", response_model=PoolStatsResponse, dependencies=[Depends(get_current_superuser)])
+def pool_stats():
+    """
+    Devuelve la cantidad de archivos en proceso y en espera, los tiempos de espera y los reinicios de los procesos de extracción
+    """
+    return PoolStatsResponse(**extraction_pool.stats())
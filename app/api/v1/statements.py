@@ -0,0 +1,92 @@
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status as http_status
+from app.api.v1.pdf import get_uploaded_pdf, busy_error, json_response
+from app.core.security import get_current_user
+from app.db.models import User
+from app.schemas.pdf import PdfContentRequest, PdfTransactionsResponse, PdfDepositsResponse, PdfSalesResponse
+from app.schemas.statement import StatementRead, StatementIngestResponse, StatementQuery
+from app.services.export import ExportFormat, export_response, negotiate_format
+from app.services.extraction_pool import PoolSaturatedError
+from app.services.pdf_analyzer import extract_pdf
+from app.services.statement_service import ingest_statement, list_statements, iter_transactions, query_transactions, query_deposits, query_sales
+from app.services.upload import UploadedPdf
+import pandas as pd
+
+router = APIRouter(
+    dependencies=[Depends(get_current_user)]
+)
+
+@router.post("/", summary="Guardar un estado de cuenta", response_model=StatementIngestResponse)
+async def ingest(params: PdfContentRequest = Depends(), pdf: UploadedPdf = Depends(get_uploaded_pdf), current_user: User = Depends(get_current_user)):
+    """
+    Procesa el estado de cuenta y guarda sus transacciones para consultarlas después sin volver a subir el archivo.
+    Las transacciones ya guardadas por el usuario no se repiten, pero también se consultan con el *statement_id* de este estado de cuenta
+    - **file**: Archivo PDF del estado de cuenta
+    """
+    try:
+        table = await extract_pdf(pdf.path, pdf.digest)
+    except PoolSaturatedError:
+        raise busy_error()
+    if not isinstance(table, pd.DataFrame):
+        # `read_pdf` returns an error message instead of a table when it fails
+        raise HTTPException(status_code=http_status.HTTP_422_UNPROCESSABLE_ENTITY, detail=table)
+    return await asyncio.to_thread(ingest_statement, current_user.id, pdf.digest, params.file.filename, table)
+
+@router.get("/", summary="Listar los estados de cuenta guardados", response_model=List[StatementRead])
+def statements(current_user: User = Depends(get_current_user)):
+    return list_statements(current_user.id)
+
+@router.get("/transactions/", summary="Obtener las transacciones guardadas", response_model=PdfTransactionsResponse)
+def transactions(
+    query: StatementQuery = Depends(),
+    format: Optional[ExportFormat] = Query(None, description="Formato de la respuesta, por defecto según la cabecera Accept"),
+    accept: Optional[str] = Header(None, include_in_schema=False),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Devuelve las transacciones guardadas de un estado de cuenta o de un rango de fechas, de forma paginada si se especifica *page* y *limit*
+    - **statement_id** (opcional): Estado de cuenta guardado
+    - **date_from** / **date_to** (opcional): Rango de fechas
+    - **transaction_type**, **supplier_id**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    - **status**: Estado de las transacciones
+    - **page** (opcional): Número de página
+    - **limit** (opcional): Número de transacciones por cada página
+    - **pagination** (opcional): *cursor* para paginar por cursor, ordenadas por fecha e id, desde la primera página
+    - **cursor** (opcional): Valor de *next_cursor* de la página anterior
+    - **format** (opcional): *json*, o *ndjson*, *csv*, *arrow* y *xlsx* para descargar todas las transacciones sin paginar
+    """
+    format = negotiate_format(format, accept)
+    if format != 'json':
+        return export_response(iter_transactions(current_user.id, query), format, 'transacciones')
+    return json_response(query_transactions(current_user.id, query))
+
+@router.get("/deposits/", summary="Obtener los depósitos guardados", response_model=PdfDepositsResponse)
+def deposits(query: StatementQuery = Depends(), current_user: User = Depends(get_current_user)):
+    """
+    Devuelve los depósitos guardados y su total, calculado por la base de datos
+    - **statement_id** (opcional): Estado de cuenta guardado
+    - **date_from** / **date_to** (opcional): Rango de fechas
+    - **transaction_type**, **supplier_id**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    - **status**: Estado de las transacciones
+    - **page** (opcional): Número de página
+    - **limit** (opcional): Número de transacciones por cada página
+    - **pagination** (opcional): *cursor* para paginar por cursor, ordenadas por fecha e id, desde la primera página
+    - **cursor** (opcional): Valor de *next_cursor* de la página anterior
+    """
+    return json_response(query_deposits(current_user.id, query))
+
+@router.get("/sales/", summary="Obtener las ventas guardadas y las ganancias", response_model=PdfSalesResponse)
+def sales(query: StatementQuery = Depends(), current_user: User = Depends(get_current_user)):
+    """
+    Devuelve las ventas guardadas, los totales por tipo de recarga y las ganancias, calculados por la base de datos
+    - **statement_id** (opcional): Estado de cuenta guardado
+    - **date_from** / **date_to** (opcional): Rango de fechas
+    - **transaction_type**, **supplier_id**, **amount_min** / **amount_max** (opcional): Filtros de las transacciones
+    - **status**: Estado de las transacciones
+    - **page** (opcional): Número de página
+    - **limit** (opcional): Número de transacciones por cada página
+    - **pagination** (opcional): *cursor* para paginar por cursor, ordenadas por fecha e id, desde la primera página
+    - **cursor** (opcional): Valor de *next_cursor* de la página anterior
+    """
+    return json_response(query_sales(current_user.id, query))
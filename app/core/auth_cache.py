@@ -0,0 +1,124 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+from sqlalchemy import event, inspect
+from app.core.config import settings
+from app.db.models import User
+
+class AuthCache:
+    """
+    Bounded LRU cache with TTL of decoded access tokens and the users they belong to.
+    The cache lives in each process: changes saved through the ORM of the process drop the user at
+    once, changes saved by other processes are seen when the entry expires, after `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int) -> None:
+        """
+        Initializes an empty cache
+
+        Args:
+            max_entries (int): Maximum number of tokens, and of users, kept in the cache
+            ttl_seconds (int): Seconds an entry stays in the cache after being stored
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.__tokens: "OrderedDict[str, tuple]" = OrderedDict()
+        self.__users: "OrderedDict[str, tuple]" = OrderedDict()
+        self.__lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Every resolution of the current user starts with one token lookup
+        self.token_lookups = 0
+
+    def get_username(self, token: str) -> Optional[str]:
+        """Returns the username of an already verified token, or None if it is missing or expired"""
+        with self.__lock:
+            self.token_lookups += 1
+        return self.__get(self.__tokens, token)
+
+    def put_token(self, token: str, username: str, expires_at: Optional[float] = None) -> None:
+        """
+        Stores the username of a verified token
+
+        Args:
+            token (str): The JWT token string
+            username (str): Subject of the token
+            expires_at (Optional[float]): Expiration of the token as a UNIX timestamp,
+            the entry never outlives the token
+        """
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        self.__put(self.__tokens, token, username, ttl)
+
+    def get_user(self, username: str) -> Optional[User]:
+        """Returns the stored user, or None if it is missing or expired"""
+        return self.__get(self.__users, username)
+
+    def put_user(self, user: User) -> None:
+        """Stores a user loaded from the database"""
+        self.__put(self.__users, user.username, user, self.ttl_seconds)
+
+    def invalidate_user(self, username: str) -> None:
+        """Removes a user so the next request loads it again from the database"""
+        with self.__lock:
+            if self.__users.pop(username, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Removes every entry from the cache"""
+        with self.__lock:
+            self.__tokens.clear()
+            self.__users.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters and the current usage of the cache"""
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "token_lookups": self.token_lookups,
+                "tokens": len(self.__tokens),
+                "users": len(self.__users),
+                "max_entries": self.max_entries,
+            }
+
+    def __get(self, entries: "OrderedDict[str, tuple]", key: str) -> Optional[Any]:
+        with self.__lock:
+            entry = entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del entries[key]
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def __put(self, entries: "OrderedDict[str, tuple]", key: str, value: Any, ttl: float) -> None:
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        with self.__lock:
+            entries[key] = (time.monotonic() + ttl, value)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+auth_cache = AuthCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_changed_user(mapper, connection, user: User) -> None:
+    """
+    Drops a user changed or deleted through the ORM of this process, also under its previous username
+    if it was renamed. Other processes keep their entry until it expires
+    """
+    auth_cache.invalidate_user(user.username)
+    for username in inspect(user).attrs.username.history.deleted:
+        auth_cache.invalidate_user(username)
@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Optional
+from urllib.parse import quote_plus
 
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
@@ -9,6 +11,107 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "clave")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./name.db")
+    # Postgres is used when POSTGRES_HOST is set and DATABASE_URL is not
+    POSTGRES_HOST: Optional[str] = os.getenv("POSTGRES_HOST") or None
+    POSTGRES_PORT: int = int(os.getenv("POSTGRES_PORT", 5432))
+    POSTGRES_USER: str = os.getenv("POSTGRES_USER", "postgres")
+    POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "")
+    POSTGRES_DB: str = os.getenv("POSTGRES_DB", "ecuenta")
+    DATABASE_URL: str = os.getenv("DATABASE_URL") or (
+        f"postgresql://{quote_plus(POSTGRES_USER)}:{quote_plus(POSTGRES_PASSWORD)}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+        if POSTGRES_HOST else "sqlite:///./name.db"
+    )
+    # Async driver URL used by the authentication services, derived from DATABASE_URL if not set
+    ASYNC_DATABASE_URL: Optional[str] = os.getenv("ASYNC_DATABASE_URL") or None
+
+    # Connection pool of each worker process, SQLite in memory does not use it
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+    # Pragmas run on every SQLite connection, WAL lets readers work while another worker writes
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", 16384))
+
+    # Cache of parsed statements, keyed by the SHA-256 of the uploaded file
+    PARSE_CACHE_MAX_ENTRIES: int = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", 32))
+    PARSE_CACHE_TTL_SECONDS: int = int(os.getenv("PARSE_CACHE_TTL_SECONDS", 600))
+    PARSE_CACHE_MAX_MB: int = int(os.getenv("PARSE_CACHE_MAX_MB", 64))
+
+    # Worker processes that keep a tabula JVM warm, 0 extracts in a thread of the web process
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", 2))
+    EXTRACTION_QUEUE_SIZE: int = int(os.getenv("EXTRACTION_QUEUE_SIZE", 8))
+    EXTRACTION_RETRY_AFTER_SECONDS: int = int(os.getenv("EXTRACTION_RETRY_AFTER_SECONDS", 5))
+    EXTRACTION_HEALTH_INTERVAL_SECONDS: int = int(os.getenv("EXTRACTION_HEALTH_INTERVAL_SECONDS", 30))
+    EXTRACTION_HEALTH_TIMEOUT_SECONDS: int = int(os.getenv("EXTRACTION_HEALTH_TIMEOUT_SECONDS", 10))
+
+    # Engine that reads the tables: 'tabula', or 'text' that reads the layout of the statement without
+    # Java. A shadow engine also reads every statement and only reports its differences and timings
+    EXTRACTION_ENGINE: str = os.getenv("EXTRACTION_ENGINE", "tabula")
+    EXTRACTION_SHADOW_ENGINE: Optional[str] = os.getenv("EXTRACTION_SHADOW_ENGINE") or None
+
+    # Parses a small bundled statement in every worker before reporting ready, so the first
+    # request of a new instance does not pay for loading the modules and the JVM classes
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    # Statements longer than PAGE_CHUNK_SIZE pages are read in parallel ranges, 0 disables it
+    PAGE_CHUNK_SIZE: int = int(os.getenv("PAGE_CHUNK_SIZE", 25))
+    PAGE_PARALLEL_WORKERS: int = int(os.getenv("PAGE_PARALLEL_WORKERS", EXTRACTION_WORKERS))
+    # Summaries of statements with at least STREAMING_MIN_PAGES pages are totaled page by page without caching their table, 0 disables it
+    STREAMING_MIN_PAGES: int = int(os.getenv("STREAMING_MIN_PAGES", 0))
+
+    # Uploaded files are copied to this directory, a tmpfs such as /dev/shm avoids disk I/O
+    UPLOAD_DIR: Optional[str] = os.getenv("UPLOAD_DIR") or None
+    UPLOAD_MAX_MB: int = int(os.getenv("UPLOAD_MAX_MB", 20))
+
+    # Batch uploads, as many PDF files or ZIP archives of them, parsed BATCH_CONCURRENCY at a time
+    BATCH_MAX_FILES: int = int(os.getenv("BATCH_MAX_FILES", 62))
+    BATCH_MAX_MB: int = int(os.getenv("BATCH_MAX_MB", 200))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", EXTRACTION_WORKERS or 1))
+
+    # Background analysis of large statements
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 2))
+    JOB_QUEUE_SIZE: int = int(os.getenv("JOB_QUEUE_SIZE", 32))
+    JOB_TTL_SECONDS: int = int(os.getenv("JOB_TTL_SECONDS", 3600))
+
+    # Worker processes that run bcrypt, 0 hashes in a thread of the web process. Changing the
+    # cost rehashes each password the next time its user logs in
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    HASH_WORKERS: int = int(os.getenv("HASH_WORKERS", 2))
+    HASH_QUEUE_SIZE: int = int(os.getenv("HASH_QUEUE_SIZE", 64))
+
+    # Per user limits of the /pdf routes that parse files, shared by the uvicorn workers of the host through
+    # the SQLite file RATE_LIMIT_DB. A bucket of RATE_LIMIT_BURST requests refills at RATE_LIMIT_PER_MINUTE
+    # and at most RATE_LIMIT_CONCURRENT files of a user are parsed at a time, 0 disables a limit
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+    RATE_LIMIT_DB: str = os.getenv("RATE_LIMIT_DB", "./rate_limit.db")
+    RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", 30))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", 10))
+    RATE_LIMIT_CONCURRENT: int = int(os.getenv("RATE_LIMIT_CONCURRENT", 2))
+    SUPERUSER_RATE_LIMIT_PER_MINUTE: float = float(os.getenv("SUPERUSER_RATE_LIMIT_PER_MINUTE", 120))
+    SUPERUSER_RATE_LIMIT_BURST: int = int(os.getenv("SUPERUSER_RATE_LIMIT_BURST", 40))
+    SUPERUSER_RATE_LIMIT_CONCURRENT: int = int(os.getenv("SUPERUSER_RATE_LIMIT_CONCURRENT", 8))
+    # Parse slots not released, by a worker that died, are freed after this time
+    RATE_LIMIT_LEASE_SECONDS: int = int(os.getenv("RATE_LIMIT_LEASE_SECONDS", 600))
+
+    # Decoded tokens and users kept in memory so authentication skips the database, 0 disables it.
+    # Changes saved by another process (another uvicorn worker or host, a script) are seen after at most AUTH_CACHE_TTL_SECONDS
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 1024))
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+
+    # Stage and request latency histograms served at /metrics, and the Server-Timing header
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # Responses of at least COMPRESSION_MIN_BYTES are compressed with brotli, if installed, or gzip as the client accepts
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", 4))
 
 settings = Settings()
\ No newline at end of file
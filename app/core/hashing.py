@@ -0,0 +1,204 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+@lru_cache(maxsize=None)
+def pwd_context() -> "CryptContext":
+    """Returns the bcrypt context, passlib is imported on the first hash instead of on startup"""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+class HashingSaturatedError(Exception):
+    """Raised when every hashing worker is busy and the wait queue is full"""
+
+def _timed(function: Callable[..., Any], *args) -> Tuple[Any, float, float]:
+    """Runs a function inside a worker and returns its result, the time it started and how long it took"""
+    started = time.time()
+    result = function(*args)
+    return result, started, time.time() - started
+
+def _ping() -> int:
+    return os.getpid()
+
+def _hash(password: str) -> str:
+    return pwd_context().hash(password)
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context().verify_and_update(password, hashed_password)
+
+class PasswordHasher:
+    """
+    Pool of worker processes that run bcrypt outside the web process, so a burst of
+    logins neither holds the GIL nor takes the threads of the sync routes. At most one
+    hash per worker runs at a time and a bounded number of them wait.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        """
+        Initializes the pool without starting any process
+
+        Args:
+            workers (int): Number of worker processes, 0 hashes in a thread of the calling process
+            queue_size (int): Maximum number of hashes waiting for a free worker
+        """
+        self.workers = workers
+        self.concurrency = max(workers, 1)
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.__slots: Optional[asyncio.Semaphore] = None
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__lock = Lock()
+
+    def start(self) -> None:
+        """Starts the worker processes and waits until every one is ready"""
+        self.__slots = asyncio.Semaphore(self.concurrency)
+        self.__spawn()
+
+    def __spawn(self) -> None:
+        if self.workers <= 0:
+            return
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        with self.__lock:
+            self.__executor = executor
+        # Spawning every process now keeps the interpreter startup out of the first logins
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        """Stops the worker processes"""
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def restart(self, broken: Optional[ProcessPoolExecutor] = None) -> None:
+        """
+        Replaces the worker processes
+
+        Args:
+            broken (Optional[ProcessPoolExecutor]): The executor that failed, if it was
+            already replaced by another caller nothing is done
+        """
+        with self.__lock:
+            if broken is not None and broken is not self.__executor:
+                return
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.__spawn()
+
+    async def hash(self, password: str) -> str:
+        """
+        Hashes a password with the configured bcrypt cost
+
+        Raises:
+            HashingSaturatedError: If every worker is busy and the wait queue is full
+        """
+        hashed_password = await self.__run(_hash, password)
+        self.hashed += 1
+        return hashed_password
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verifies a password and, if its hash uses another cost, hashes it again
+
+        Args:
+            password (str): The user's entered password
+            hashed_password (str): The stored hashed password
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the password matches, and the new hash to store if it needs an update
+
+        Raises:
+            HashingSaturatedError: If every worker is busy and the wait queue is full
+        """
+        valid, new_hash = await self.__run(_verify_and_update, password, hashed_password)
+        self.verified += 1
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the usage counters and the hash and queue latencies"""
+        completed = self.hashed + self.verified
+        return {
+            "workers": self.workers,
+            "rounds": settings.BCRYPT_ROUNDS,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+            "hash_seconds_avg": self.hash_seconds_total / completed if completed else 0.0,
+            "hash_seconds_max": self.hash_seconds_max,
+            "queue_seconds_avg": self.queue_seconds_total / completed if completed else 0.0,
+            "queue_seconds_max": self.queue_seconds_max,
+        }
+
+    async def __run(self, function: Callable[..., Any], *args) -> Any:
+        if self.__slots is None:
+            # The lifespan hook did not start the pool, hashes run in threads
+            self.__slots = asyncio.Semaphore(self.concurrency)
+        if self.__slots.locked() and self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise HashingSaturatedError()
+
+        submitted = time.time()
+        self.waiting += 1
+        try:
+            await self.__slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            result, started, elapsed = await self.__submit(partial(_timed, function, *args))
+        finally:
+            self.active -= 1
+            self.__slots.release()
+
+        # Queue time covers the wait for a free slot and the handoff to the worker process
+        queued = max(started - submitted, 0.0)
+        self.queue_seconds_total += queued
+        self.queue_seconds_max = max(self.queue_seconds_max, queued)
+        self.hash_seconds_total += elapsed
+        self.hash_seconds_max = max(self.hash_seconds_max, elapsed)
+        return result
+
+    async def __submit(self, task: Callable[[], Any]) -> Any:
+        executor = self.__executor
+        if executor is None:
+            return await asyncio.to_thread(task)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, task)
+        except BrokenProcessPool:
+            # A worker died, the pool is replaced outside the event loop and the hash retried once
+            await asyncio.to_thread(self.restart, executor)
+            return await loop.run_in_executor(self.__executor, task)
+
+password_hasher = PasswordHasher(
+    workers=settings.HASH_WORKERS,
+    queue_size=settings.HASH_QUEUE_SIZE,
+)
@@ -0,0 +1,216 @@
+import time
+from bisect import bisect_left
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PAGES_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+ROWS_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+class Histogram:
+    """Prometheus histogram with one series per combination of label values"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float]) -> None:
+        """
+        Args:
+            name (str): Name of the metric
+            documentation (str): Help text of the metric
+            labels (Sequence[str]): Names of the labels of every series
+            buckets (Sequence[float]): Upper bounds of the buckets, in increasing order
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Label values -> count of every bucket, followed by the sum and the count of the series
+        self.__series: Dict[Tuple[str, ...], List[float]] = {}
+        self.__lock = Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Adds an observation to the series of the given label values"""
+        index = bisect_left(self.buckets, value)
+        with self.__lock:
+            series = self.__series.get(label_values)
+            if series is None:
+                series = self.__series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        """Returns the lines of the histogram in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.__lock:
+            series = {label_values: list(values) for label_values, values in self.__series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = list(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(labels + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels + [('le', '+Inf')])} {values[-1]}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {values[-2]}")
+            lines.append(f"{self.name}_count{_labels(labels)} {values[-1]}")
+        return lines
+
+def _labels(labels: List[Tuple[str, Any]]) -> str:
+    """Formats the labels of a series, escaping their values"""
+    if not labels:
+        return ""
+    values = [str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels]
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, values)) + "}"
+
+class Counter:
+    """Prometheus counter with one series per combination of label values"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]) -> None:
+        """
+        Args:
+            name (str): Name of the metric
+            documentation (str): Help text of the metric
+            labels (Sequence[str]): Names of the labels of every series
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.__values: Dict[Tuple[str, ...], float] = {}
+        self.__lock = Lock()
+
+    def inc(self, value: float, *label_values: str) -> None:
+        """Adds `value` to the series of the given label values"""
+        with self.__lock:
+            self.__values[label_values] = self.__values.get(label_values, 0) + value
+
+    def render(self) -> List[str]:
+        """Returns the lines of the counter in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.__lock:
+            values = dict(self.__values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(list(zip(self.labels, label_values)))} {value}")
+        return lines
+
+class Timings:
+    """Stage durations measured during a request"""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """Returns the value of the Server-Timing header, durations in milliseconds"""
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+_timings: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+# Calls made inside a worker task, replayed in the web process where the metrics are served
+_collected: ContextVar[Optional[List[Tuple[str, tuple]]]] = ContextVar("collected", default=None)
+_DISABLED = nullcontext()
+
+class Metrics:
+    """
+    Latency histograms of the stages of the statement pipeline and of every endpoint.
+    Measures taken in the extraction workers are collected there and recorded in the web process.
+    When disabled the hooks return right away and nothing is stored.
+    """
+
+    def __init__(self, enabled: bool) -> None:
+        """
+        Args:
+            enabled (bool): Whether the durations are measured
+        """
+        self.enabled = enabled
+        self.stage_seconds = Histogram("ecuenta_stage_seconds", "Duration of every stage of the statement pipeline", ["stage"], SECONDS_BUCKETS)
+        self.request_seconds = Histogram("ecuenta_request_seconds", "Duration of every request by endpoint", ["method", "path", "status"], SECONDS_BUCKETS)
+        self.statement_pages = Histogram("ecuenta_statement_pages", "Pages of every extracted statement", [], PAGES_BUCKETS)
+        self.statement_rows = Histogram("ecuenta_statement_rows", "Transactions of every extracted statement", [], ROWS_BUCKETS)
+        self.shadow_rows = Counter("ecuenta_shadow_rows_total", "Transactions compared with the shadow extraction engine by result", ["engine", "result"])
+
+    def stage(self, name: str) -> AbstractContextManager:
+        """Measures the duration of the enclosed block as the stage `name`"""
+        # A shared no-op context keeps the disabled hooks almost free
+        return self.__timed(name) if self.enabled else _DISABLED
+
+    @contextmanager
+    def __timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def __collected(self, method: str, *args) -> bool:
+        """Keeps the call to replay it in the web process if running inside a worker task"""
+        collected = _collected.get()
+        if collected is None:
+            return False
+        collected.append((method, args))
+        return True
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Adds a stage duration to the current request and to its histogram"""
+        if not self.enabled or self.__collected("record", stage, seconds):
+            return
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+        self.stage_seconds.observe(seconds, stage)
+
+    def statement(self, pages: int, rows: int) -> None:
+        """Records the size of an extracted statement"""
+        if not self.enabled or self.__collected("statement", pages, rows):
+            return
+        self.statement_pages.observe(pages)
+        self.statement_rows.observe(rows)
+
+    def shadow(self, engine: str, results: Dict[str, int]) -> None:
+        """Counts the transactions compared with the shadow engine, by result of the comparison"""
+        if not self.enabled or self.__collected("shadow", engine, results):
+            return
+        for result, rows in results.items():
+            self.shadow_rows.inc(rows, engine, result)
+
+    def replay(self, collected: List[Tuple[str, tuple]]) -> None:
+        """Records the calls collected by `collect` in a worker"""
+        for method, args in collected:
+            getattr(self, method)(*args)
+
+    @contextmanager
+    def request(self) -> Iterator[Timings]:
+        """Collects the stages measured while the enclosed block runs, for the Server-Timing header"""
+        token = _timings.set(Timings())
+        try:
+            yield _timings.get()
+        finally:
+            _timings.reset(token)
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format"""
+        lines = []
+        for metric in (self.stage_seconds, self.request_seconds, self.statement_pages, self.statement_rows, self.shadow_rows):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def collect(task: Callable[[], Any]) -> Tuple[Any, List[Tuple[str, tuple]]]:
+    """
+    Runs a task collecting the measures it takes, meant to be executed in a worker
+
+    Returns:
+        Tuple[Any, List[Tuple[str, tuple]]]: The value returned by the task and the calls
+        to replay with `Metrics.replay`
+    """
+    token = _collected.set([])
+    try:
+        return task(), _collected.get()
+    finally:
+        _collected.reset(token)
+
+metrics = Metrics(enabled=settings.METRICS_ENABLED)
@@ -0,0 +1,237 @@
+import asyncio
+import importlib.util
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import metrics
+from app.services.upload import upload_too_large
+
+class UploadSizeLimitMiddleware:
+    """Rejects request bodies larger than `max_bytes` before they are read completely"""
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefix: str, path_limits: Optional[Dict[str, int]] = None) -> None:
+        """
+        Args:
+            app (ASGIApp): The wrapped application
+            max_bytes (int): Maximum size of the request body in bytes
+            path_prefix (str): Only requests whose path starts with this prefix are limited
+            path_limits (Optional[Dict[str, int]]): Maximum upload size in MB of the paths starting
+            with each prefix, for routes that accept larger bodies such as batch uploads
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+        self.path_limits = path_limits or {}
+
+    def limit(self, path: str) -> Tuple[int, Optional[int]]:
+        """Returns the maximum body size of a path and its upload size in MB, the longest matching prefix wins"""
+        prefixes = [prefix for prefix in self.path_limits if path.startswith(prefix)]
+        if not prefixes:
+            return self.max_bytes, None
+        max_mb = self.path_limits[max(prefixes, key=len)]
+        # Like the default limit, the body also carries the multipart boundaries and form fields
+        return (max_mb + 1) * 1024 * 1024, max_mb
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes, max_mb = self.limit(scope["path"])
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            error = upload_too_large(max_mb)
+            response = JSONResponse(status_code=error.status_code, content={"detail": error.detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            # Bodies sent without Content-Length are counted while they are read
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise upload_too_large(max_mb)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class MetricsMiddleware:
+    """Measures every request by endpoint and reports the duration of its stages in the Server-Timing header"""
+
+    def __init__(self, app: ASGIApp, server_timing: bool) -> None:
+        """
+        Args:
+            app (ASGIApp): The wrapped application
+            server_timing (bool): Whether to add the Server-Timing header to the responses
+        """
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        with metrics.request() as timings:
+
+            async def timed_send(message: Message) -> None:
+                # Headers are sent before a streamed body, its stages are only in the histograms
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    if self.server_timing:
+                        MutableHeaders(scope=message).append("Server-Timing", timings.server_timing(time.perf_counter() - start))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, timed_send)
+            finally:
+                # The route template keeps ids out of the labels, unknown paths share one series
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                metrics.request_seconds.observe(time.perf_counter() - start, scope["method"], path, str(status_code))
+
+
+# Formats that are already compressed, such as xlsx files that are zip archives
+INCOMPRESSIBLE_TYPES = ("application/vnd.openxmlformats", "application/zip", "application/gzip", "image/", "audio/", "video/")
+# Larger bodies are compressed in a thread, zlib and brotli release the GIL
+THREAD_MIN_BYTES = 256 * 1024
+
+def choose_encoding(accept_encoding: str, encodings: Sequence[str]) -> Optional[str]:
+    """
+    Chooses the content encoding of the response from the Accept-Encoding header
+
+    Args:
+        accept_encoding (str): Accept-Encoding header of the request
+        encodings (Sequence[str]): Encodings supported by the server, preferred first
+
+    Returns:
+        Optional[str]: The accepted encoding with the highest weight, the preferred one on ties,
+        or None if the client accepts none of them
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, parameters = item.partition(";")
+        weight = 1.0
+        parameters = parameters.strip().lower()
+        if parameters.startswith("q="):
+            try:
+                weight = float(parameters[2:])
+            except ValueError:
+                weight = 0.0
+        if name.strip():
+            weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+class GzipCompressor:
+    def __init__(self, level: int) -> None:
+        # 31 writes the gzip header and trailer around the deflate stream
+        self.__compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compresses a part of the body, flushing it so streamed parts reach the client right away"""
+        return self.__compressor.compress(data) + self.__compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class BrotliCompressor:
+    def __init__(self, quality: int) -> None:
+        import brotli
+
+        self.__compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compresses a part of the body, flushing it so streamed parts reach the client right away"""
+        return self.__compressor.process(data) + (self.__compressor.finish() if final else self.__compressor.flush())
+
+class CompressionMiddleware:
+    """
+    Compresses the responses of at least `minimum_size` bytes with brotli or gzip, as accepted
+    by the client. Streamed responses are compressed part by part.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int, brotli_quality: int) -> None:
+        """
+        Args:
+            app (ASGIApp): The wrapped application
+            minimum_size (int): Smaller responses are sent as they are
+            gzip_level (int): Compression level of gzip, from 1 to 9
+            brotli_quality (int): Quality of brotli, from 0 to 11
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        # Brotli gives smaller bodies for the same CPU, its module is optional
+        self.encodings: List[str] = (["br"] if importlib.util.find_spec("brotli") is not None else []) + ["gzip"]
+
+    def compressor(self, encoding: str):
+        return BrotliCompressor(self.brotli_quality) if encoding == "br" else GzipCompressor(self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor = None
+
+        async def compress(body: bytes, final: bool) -> bytes:
+            with metrics.stage("compress"):
+                if len(body) >= THREAD_MIN_BYTES:
+                    return await asyncio.to_thread(compressor.compress, body, final)
+                return compressor.compress(body, final)
+
+        async def compressed_send(message: Message) -> None:
+            # The headers wait for the first part of the body, that tells whether it is worth compressing
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(scope=start)
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" not in headers
+                    and not content_type.startswith(INCOMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                ):
+                    compressor = self.compressor(encoding)
+                    body = await compress(body, not more_body)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body:
+                        if "content-length" in headers:
+                            del headers["Content-Length"]
+                    else:
+                        headers["Content-Length"] = str(len(body))
+                    message = {**message, "body": body}
+                await send(start)
+                start = None
+            elif compressor is not None:
+                message = {**message, "body": await compress(body, not more_body)}
+            await send(message)
+
+        await self.app(scope, receive, compressed_send)
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import math
+import sqlite3
+import time
+from threading import Lock
+from typing import AsyncIterator, Optional
+from fastapi import Depends, HTTPException, status
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.db.models import User
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (username TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS slots (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, expires REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS slots_username ON slots (username);
+"""
+
+class Limits:
+    """Limits of the files a user can parse, 0 disables a limit"""
+
+    def __init__(self, per_minute: float, burst: int, concurrent: int) -> None:
+        """
+        Args:
+            per_minute (float): Requests per minute that refill the bucket of the user
+            burst (int): Size of the bucket, requests accepted at once after being idle
+            concurrent (int): Files of the user parsed at the same time
+        """
+        self.per_minute = per_minute
+        self.burst = burst
+        self.concurrent = concurrent
+
+def limits_for(user: User) -> Limits:
+    """Returns the limits of a user, superusers have their own"""
+    if user.is_superuser:
+        return Limits(settings.SUPERUSER_RATE_LIMIT_PER_MINUTE, settings.SUPERUSER_RATE_LIMIT_BURST, settings.SUPERUSER_RATE_LIMIT_CONCURRENT)
+    return Limits(settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST, settings.RATE_LIMIT_CONCURRENT)
+
+class Admission:
+    """Result of `RateLimiter.admit`"""
+
+    def __init__(self, allowed: bool, retry_after: float = 0.0, slot: Optional[int] = None, reason: Optional[str] = None) -> None:
+        """
+        Args:
+            allowed (bool): Whether the request can go on
+            retry_after (float): Seconds until the request would be accepted, if rejected
+            slot (Optional[int]): Parse slot taken, to release when the request ends
+            reason (Optional[str]): 'rate' or 'concurrent', the limit that rejected the request
+        """
+        self.allowed = allowed
+        self.retry_after = retry_after
+        self.slot = slot
+        self.reason = reason
+
+class RateLimiter:
+    """
+    Token bucket and parse slots of every user, stored in a SQLite file so the uvicorn workers
+    of the host share them. Slots are leases that expire after `lease_seconds`, so the slots
+    taken by a worker that died are freed. If the file cannot be used requests are admitted.
+
+    A request is admitted while the bucket has a token and is charged its cost, so a request
+    that costs more than the bucket holds leaves it in debt until it refills.
+    """
+
+    def __init__(self, path: str, lease_seconds: int, busy_retry_after: int) -> None:
+        """
+        Args:
+            path (str): Path of the SQLite file
+            lease_seconds (int): Seconds a parse slot lasts if it is not released
+            busy_retry_after (int): Seconds to wait suggested when every slot of the user is taken
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.busy_retry_after = busy_retry_after
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__lock = Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def __connect(self) -> sqlite3.Connection:
+        """Opens the file the first time it is used, in the process that uses it"""
+        if self.__connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            # The state is only worth the current limits, it does not need to survive a crash of the host
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.executescript(SCHEMA)
+            self.__connection = connection
+        return self.__connection
+
+    def admit(self, username: str, limits: Limits, cost: int = 1) -> Admission:
+        """
+        Takes a parse slot and `cost` tokens of the bucket of the user, or neither if one of them is exhausted
+
+        Args:
+            username (str): The user making the request
+            limits (Limits): The limits of the user
+            cost (int): Tokens charged to the bucket, one per file the request parses
+
+        Returns:
+            Admission: Whether the request is admitted, the slot to release or how long to wait
+        """
+        if limits.per_minute <= 0 and limits.concurrent <= 0:
+            return Admission(True)
+        now = time.time()
+        with self.__lock:
+            try:
+                admission = self.__admit(self.__connect(), username, limits, cost, now)
+            except sqlite3.Error as e:
+                logger.warning(f'No se pudo aplicar el límite de solicitudes de {username}: {e}')
+                return Admission(True)
+            if admission.allowed:
+                self.admitted += 1
+            else:
+                self.rejected += 1
+            return admission
+
+    def __admit(self, connection: sqlite3.Connection, username: str, limits: Limits, cost: int, now: float) -> Admission:
+        # Taking the write lock first keeps the read and the update of a user atomic across workers
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if limits.concurrent > 0:
+                connection.execute("DELETE FROM slots WHERE expires <= ?", (now,))
+                taken = connection.execute("SELECT COUNT(*) FROM slots WHERE username = ?", (username,)).fetchone()[0]
+                if taken >= limits.concurrent:
+                    connection.execute("COMMIT")
+                    return Admission(False, self.busy_retry_after, reason='concurrent')
+            if limits.per_minute > 0:
+                rate = limits.per_minute / 60
+                capacity = max(limits.burst, 1)
+                row = connection.execute("SELECT tokens, updated FROM buckets WHERE username = ?", (username,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                if tokens < 1:
+                    connection.execute("COMMIT")
+                    return Admission(False, (1 - tokens) / rate, reason='rate')
+                connection.execute("INSERT OR REPLACE INTO buckets (username, tokens, updated) VALUES (?, ?, ?)", (username, tokens - cost, now))
+            slot = None
+            if limits.concurrent > 0:
+                slot = connection.execute("INSERT INTO slots (username, expires) VALUES (?, ?)", (username, now + self.lease_seconds)).lastrowid
+            connection.execute("COMMIT")
+            return Admission(True, slot=slot)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def release(self, slot: int) -> None:
+        """Frees a parse slot taken by `admit`"""
+        with self.__lock:
+            try:
+                self.__connect().execute("DELETE FROM slots WHERE id = ?", (slot,))
+            except sqlite3.Error as e:
+                logger.warning(f'No se pudo liberar el turno {slot}, se liberará al vencer: {e}')
+
+    def reset(self) -> None:
+        """Forgets the buckets and the slots of every user"""
+        with self.__lock:
+            connection = self.__connect()
+            connection.execute("DELETE FROM buckets")
+            connection.execute("DELETE FROM slots")
+
+def too_many_requests(admission: Admission) -> HTTPException:
+    """Error returned when a user is over one of their limits"""
+    if admission.reason == 'concurrent':
+        detail = "Ya tienes el máximo de archivos en proceso. Espera a que terminen antes de enviar otro"
+    else:
+        detail = "Has enviado demasiados archivos. Inténtalo de nuevo más tarde"
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(math.ceil(admission.retry_after), 1))},
+    )
+
+async def admit_user(user: User, cost: int = 1) -> Admission:
+    """
+    Admits a request of the user that parses `cost` files, the caller releases its slot with `release_admission`
+
+    Raises:
+        HTTPException: 429 if the user is over their rate or has every parse slot taken
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return Admission(True)
+    admission = await asyncio.to_thread(rate_limiter.admit, user.username, limits_for(user), cost)
+    if not admission.allowed:
+        raise too_many_requests(admission)
+    return admission
+
+async def release_admission(admission: Admission) -> None:
+    """Frees the slot of an admission, unless it was handed to a background job that releases it"""
+    if admission.slot is not None:
+        await asyncio.to_thread(rate_limiter.release, admission.slot)
+
+async def admit_parse(current_user: User = Depends(get_current_user)) -> AsyncIterator[Admission]:
+    """
+    Admits a request that parses a file of the current user for as long as it runs
+
+    Raises:
+        HTTPException: 429 if the user is over their rate or has every parse slot taken
+    """
+    admission = await admit_user(current_user)
+    try:
+        yield admission
+    finally:
+        await release_admission(admission)
+
+rate_limiter = RateLimiter(settings.RATE_LIMIT_DB, settings.RATE_LIMIT_LEASE_SECONDS, settings.EXTRACTION_RETRY_AFTER_SECONDS)
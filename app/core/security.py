@@ -1,15 +1,15 @@
 from fastapi import Depends, HTTPException, status
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from jose import JWTError, jwt, ExpiredSignatureError
 from app.core.config import settings
+from app.core.auth_cache import auth_cache
+from app.core.hashing import pwd_context
 from app.db.models import User
-from sqlmodel import Session, select
-from app.db.database import engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import async_engine
 from typing import Optional
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = HTTPBearer()
 
 def get_password_hash(password: str) -> str:
@@ -22,11 +22,26 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: The hashed password
     """
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme)) -> User:
+async def get_user(username: str) -> Optional[User]:
     """
-    Retrieves the current authenticated user based on the provided token
+    Loads a user from the database through the async engine
+
+    Args:
+        username (str): The username of the user
+
+    Returns:
+        Optional[User]: The user, or None if it does not exist
+    """
+    async with AsyncSession(async_engine) as session:
+        return (await session.exec(select(User).where(User.username == username))).first()
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme)) -> User:
+    """
+    Retrieves the current authenticated user based on the provided token.
+    Verified tokens and their users are kept in `auth_cache`, so repeated requests
+    neither decode the token again nor query the database.
 
     Args:
         credentials (HTTPAuthorizationCredentials): Bearer token credentials
@@ -35,23 +50,32 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(oauth2_
         User: The authenticated user object
 
     Raises:
-        HTTPException: If the token is invalid, expired, or the user does not exist
+        HTTPException: If the token is invalid, expired, or the user does not exist or is disabled
     """
     token = credentials.credentials
-    username = decode_access_token(token)
-
-    if not username:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido o expirado",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.username == username)).first()
+    username = auth_cache.get_username(token)
+
+    if username is None:
+        payload = decode_token_payload(token)
+        username = payload.get("sub")
+        if not username:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token inválido o expirado",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        auth_cache.put_token(token, username, payload.get("exp"))
+
+    user = auth_cache.get_user(username)
+    if user is None:
+        user = await get_user(username)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        return user
+        auth_cache.put_user(user)
+
+    if user.disabled:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuario deshabilitado")
+    return user
 
 def get_current_superuser(current_user: User = Depends(get_current_user)) -> User:
     """
@@ -84,7 +108,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True if passwords match, False otherwise
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 def create_access_token(data: dict) -> str:
     """
@@ -96,27 +120,31 @@ def create_access_token(data: dict) -> str:
     Returns:
         str: The encoded JWT token
     """
+    # jose loads its cryptography backend and bcrypt, it is imported on the first token instead of on startup
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-def decode_access_token(token: str) -> Optional[str]:
+def decode_token_payload(token: str) -> dict:
     """
-    Decodes a JWT access token and retrieves the username
+    Decodes a JWT access token and verifies its signature and expiration
 
     Args:
         token (str): The JWT token string
 
     Returns:
-        Optional[str]: The username if valid
+        dict: The claims of the token
 
     Raises:
         HTTPException: If the token is expired or invalid
     """
+    from jose import JWTError, jwt, ExpiredSignatureError
+
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -128,4 +156,19 @@ def decode_access_token(token: str) -> Optional[str]:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+def decode_access_token(token: str) -> Optional[str]:
+    """
+    Decodes a JWT access token and retrieves the username
+
+    Args:
+        token (str): The JWT token string
+
+    Returns:
+        Optional[str]: The username if valid
+
+    Raises:
+        HTTPException: If the token is expired or invalid
+    """
+    return decode_token_payload(token).get("sub")
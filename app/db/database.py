@@ -1,11 +1,91 @@
+from typing import AsyncIterator
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, echo=False)
+# Async driver of each sync dialect, used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_url(url: str) -> str:
+    """Returns the URL of the database with the async driver of its dialect"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+def is_sqlite_memory(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+def engine_options(url: str) -> dict:
+    """
+    Builds the arguments of the engine for the database of `url`
+
+    Args:
+        url (str): URL of the database
+
+    Returns:
+        dict: Pool sizing and pre-ping, except for SQLite in memory that keeps a single connection
+    """
+    options = {"echo": settings.DB_ECHO}
+    if is_sqlite_memory(url):
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Tunes every new SQLite connection for concurrent access from several workers"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def configure(engine: Engine) -> Engine:
+    """Registers the SQLite pragmas on the engine if it uses SQLite"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+engine = configure(create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL)))
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+configure(async_engine.sync_engine)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+async def ping() -> bool:
+    """Returns whether the database answers a trivial query"""
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+async def dispose_engines() -> None:
+    """Closes the connections of both engines"""
+    await async_engine.dispose()
+    engine.dispose()
@@ -1,5 +1,6 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, ForeignKeyConstraint, UniqueConstraint
 from typing import Optional
+from datetime import datetime
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -7,4 +8,39 @@ class User(SQLModel, table=True):
     full_name: Optional[str]
     hashed_password: str
     disabled: bool = False
-    is_superuser: bool = False
\ No newline at end of file
+    is_superuser: bool = False
+
+class Statement(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("user_id", "digest"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    digest: str
+    filename: Optional[str] = None
+    transactions: int = 0
+    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Transaction(SQLModel, table=True):
+    # Transactions are deduplicated by their id for each user
+    id: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    # Statement the transaction was first stored from, `StatementTransaction` has every statement that contains it
+    statement_id: int = Field(foreign_key="statement.id", index=True)
+    date: str
+    timestamp: Optional[datetime] = Field(default=None, index=True)
+    amount_paid: float
+    currency: str
+    supplier_id: str = Field(index=True)
+    discount: float
+    amount_due: float
+    transaction_type: str = Field(index=True)
+    transaction_status: str = Field(index=True)
+    payment_type: str
+
+class StatementTransaction(SQLModel, table=True):
+    # Transactions found in each statement, including those already stored from an earlier one
+    __table_args__ = (ForeignKeyConstraint(["transaction_id", "user_id"], ["transaction.id", "transaction.user_id"]),)
+
+    statement_id: int = Field(foreign_key="statement.id", primary_key=True)
+    user_id: int = Field(primary_key=True)
+    transaction_id: str = Field(primary_key=True)
@@ -1,7 +1,15 @@
+import asyncio
 from fastapi import FastAPI, Request
-from app.api.v1 import pdf, auth, user
+from app.api.v1 import pdf, auth, user, statements, metrics, health
 from contextlib import asynccontextmanager
-from app.db.database import create_db_and_tables
+from app.db.database import create_db_and_tables, dispose_engines
+from app.core.config import settings
+from app.core.middleware import CompressionMiddleware, MetricsMiddleware, UploadSizeLimitMiddleware
+from app.services.extraction_engines import configured_engines
+from app.services.extraction_pool import extraction_pool
+from app.services.jobs import job_manager
+from app.services.startup import startup_state, warm_up
+from app.core.hashing import password_hasher
 
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import HTTPException
@@ -9,8 +17,24 @@ from starlette.status import HTTP_401_UNAUTHORIZED
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    startup_state.begin()
+    # Fails on startup instead of on the first statement if an engine name is wrong
+    configured_engines()
     create_db_and_tables()
+    await asyncio.to_thread(extraction_pool.start)
+    monitor = asyncio.create_task(extraction_pool.monitor())
+    job_manager.start()
+    await asyncio.to_thread(password_hasher.start)
+    if settings.WARMUP_ENABLED:
+        startup_state.warmup_seconds = await warm_up()
+    startup_state.mark_ready()
     yield
+    startup_state.mark_stopping()
+    await job_manager.stop()
+    monitor.cancel()
+    extraction_pool.shutdown()
+    password_hasher.shutdown()
+    await dispose_engines()
 
 app = FastAPI(
     title="Estado de Cuenta API",
@@ -35,9 +59,31 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
         )
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=exc.headers
     )
 
+# Innermost, the metrics middleware measures the compression and reports it in Server-Timing
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_BYTES,
+        gzip_level=settings.GZIP_LEVEL,
+        brotli_quality=settings.BROTLI_QUALITY,
+    )
+# The body also carries the multipart boundaries and form fields besides the file
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=(settings.UPLOAD_MAX_MB + 1) * 1024 * 1024,
+    path_prefix="/pdf",
+    path_limits={"/pdf/batch": settings.BATCH_MAX_MB},
+)
+# Added last so it is the outermost middleware and also measures rejected uploads
+app.add_middleware(MetricsMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
 app.include_router(auth.router, prefix="/auth", tags=['Autenticación'])
 app.include_router(user.router, prefix="/user", tags=['Usuario'])
-app.include_router(pdf.router, prefix="/pdf", tags=['Procesar PDF'])
\ No newline at end of file
+app.include_router(pdf.router, prefix="/pdf", tags=['Procesar PDF'])
+app.include_router(statements.router, prefix="/statements", tags=['Estados de cuenta guardados'])
+app.include_router(metrics.router, prefix="/metrics", tags=['Métricas'])
+app.include_router(health.router, prefix="/health", tags=['Estado del servidor'])
\ No newline at end of file
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Dict, Literal, Optional
+
+class LivenessResponse(BaseModel):
+    status: Literal['ok']
+
+class ReadinessResponse(BaseModel):
+    status: Literal['ready', 'not_ready']
+    checks: Dict[str, bool]
+    startup_seconds: Optional[float] = None
+    warmup_seconds: Optional[float] = None
@@ -1,24 +1,31 @@
 from pydantic import BaseModel
 from fastapi import Query, UploadFile, File
 from typing import List, Optional, Literal
-from .transaction import TransactionData
+from datetime import datetime
+from .transaction import TransactionData, TransactionFilters
 
-class PdfContentRequest(BaseModel):
+class PdfContentRequest(TransactionFilters):
     file: UploadFile = File(...),
-    status: Literal['all', 'successful', 'failed'] = Query('sucessful', description="Estado de laa transacción")
+    status: Literal['all', 'successful', 'failed'] = Query('successful', description="Estado de la transacción")
     page: Optional[int] = Query(None, ge=1, description="Número de página a extraer")
     limit: Optional[int] = Query(None, ge=5, description="Cantidad de transacciones por página")
 
+class PdfBatchRequest(TransactionFilters):
+    files: List[UploadFile] = File(..., description="Archivos PDF de los estados de cuenta o archivos ZIP que los contienen")
+    status: Literal['all', 'successful', 'failed'] = Query('successful', description="Estado de la transacción")
+
 class PdfTransactionsResponse(BaseModel):
     total: Optional[int] = None
     page: Optional[int] = None
     limit: Optional[int] = None
+    next_cursor: Optional[str] = None
     results: List[TransactionData]
     
 class PdfDepositsResponse(BaseModel):
     total: Optional[int] = None
     page: Optional[int] = None
     limit: Optional[int] = None
+    next_cursor: Optional[str] = None
     total_amount: float
     results: List[TransactionData]
 
@@ -26,6 +33,7 @@ class PdfSalesResponse(BaseModel):
     total: Optional[int] = None
     page: Optional[int] = None
     limit: Optional[int] = None
+    next_cursor: Optional[str] = None
     total_amount: float
     total_saldo: float
     total_propia: float
@@ -35,3 +43,104 @@ class PdfSalesResponse(BaseModel):
     total_factura: float
     profits: float
     results: List[TransactionData]
+
+class PdfSummaryResponse(BaseModel):
+    total: int
+    successful: int
+    failed: int
+    deposits: int
+    total_deposits: float
+    sales: int
+    total_amount: float
+    total_saldo: float
+    total_propia: float
+    total_movil: float
+    total_nauta: float
+    total_nauta_hogar: float
+    total_factura: float
+    profits: float
+
+class PeriodTotals(BaseModel):
+    period: str
+    transactions: int
+    sales: int
+    total_amount: float
+    deposits: int
+    total_deposits: float
+    profits: float
+
+class PdfTimeseriesResponse(BaseModel):
+    period: Literal['day', 'week', 'month']
+    undated: int
+    results: List[PeriodTotals]
+
+class SupplierTotals(BaseModel):
+    supplier_id: str
+    transactions: int
+    total_amount: float
+    share: float
+
+class PdfSuppliersResponse(BaseModel):
+    suppliers: int
+    total_amount: float
+    results: List[SupplierTotals]
+
+class FailureRate(BaseModel):
+    value: str
+    transactions: int
+    failed: int
+    failed_amount: float
+    failure_rate: float
+
+class PdfFailuresResponse(BaseModel):
+    by: Literal['payment_type', 'transaction_type']
+    results: List[FailureRate]
+
+class PdfBatchFileResult(BaseModel):
+    filename: str
+    transactions: Optional[int] = None
+    duplicates: int = 0
+    summary: Optional[PdfSummaryResponse] = None
+    error: Optional[str] = None
+
+class PdfBatchResponse(BaseModel):
+    summary: PdfSummaryResponse
+    duplicates: int
+    files: List[PdfBatchFileResult]
+
+class PdfJobResponse(BaseModel):
+    id: str
+    status: Literal['queued', 'running', 'done', 'failed']
+    stage: Optional[str] = None
+    progress: float
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class PdfJobResultsResponse(BaseModel):
+    transactions: PdfTransactionsResponse
+    deposits: PdfDepositsResponse
+    sales: PdfSalesResponse
+
+class CacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    max_entries: int
+    max_bytes: int
+
+class PoolStatsResponse(BaseModel):
+    workers: int
+    active: int
+    waiting: int
+    queue_size: int
+    admitted: int
+    rejected: int
+    restarts: int
+    wait_seconds_avg: float
+    wait_seconds_max: float
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from fastapi import Query
+from typing import Optional, Literal
+from datetime import datetime
+from .transaction import TransactionFilters
+
+class StatementRead(BaseModel):
+    id: int
+    filename: Optional[str] = None
+    transactions: int
+    uploaded_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class StatementIngestResponse(BaseModel):
+    statement: StatementRead
+    inserted: int
+    duplicates: int
+
+class StatementQuery(TransactionFilters):
+    statement_id: Optional[int] = Query(None, description="Estado de cuenta guardado, si no se indica se consultan todos")
+    status: Literal['all', 'successful', 'failed'] = Query('successful', description="Estado de la transacción")
+    page: Optional[int] = Query(None, ge=1, description="Número de página a extraer")
+    limit: Optional[int] = Query(None, ge=5, description="Cantidad de transacciones por página")
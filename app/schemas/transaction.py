@@ -1,4 +1,7 @@
 from pydantic import BaseModel
+from fastapi import Query
+from typing import Literal, Optional
+from datetime import datetime
 
 class TransactionData(BaseModel):
     id: str
@@ -10,4 +13,18 @@ class TransactionData(BaseModel):
     amount_due: float
     transaction_type: str
     transaction_status: str
-    payment_type: str
\ No newline at end of file
+    payment_type: str
+
+class TransactionFilters(BaseModel):
+    transaction_type: Optional[str] = Query(None, description="Tipo de transacción")
+    supplier_id: Optional[str] = Query(None, description="Número del cliente")
+    date_from: Optional[datetime] = Query(None, description="Fecha inicial de las transacciones")
+    date_to: Optional[datetime] = Query(None, description="Fecha final de las transacciones")
+    amount_min: Optional[float] = Query(None, description="Importe mínimo")
+    amount_max: Optional[float] = Query(None, description="Importe máximo")
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en *next_cursor* para obtener la página siguiente")
+    pagination: Literal['page', 'cursor'] = Query('page', description="Paginación por número de página o por cursor")
+
+    def filters(self) -> dict:
+        """Returns the filters given by the client, without the pagination or the fields of subclasses"""
+        return self.model_dump(include=set(TransactionFilters.model_fields) - {'cursor', 'pagination'}, exclude_none=True)
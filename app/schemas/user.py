@@ -19,4 +19,19 @@ class UserRead(BaseModel):
 
 class Token(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+
+class HashingStatsResponse(BaseModel):
+    workers: int
+    rounds: int
+    active: int
+    waiting: int
+    queue_size: int
+    rejected: int
+    hashed: int
+    verified: int
+    rehashed: int
+    hash_seconds_avg: float
+    hash_seconds_max: float
+    queue_seconds_avg: float
+    queue_seconds_max: float
@@ -1,26 +1,47 @@
-from openpyxl import Workbook, load_workbook
+from typing import Iterable, List, Optional
+import pandas as pd
 
-# Future features ...
-def create_excel(self, excel_file):
-    """ Crea un archivo Excel a partir de los datos en la instancia """
-    wb = Workbook()
-    sheet = wb.active
-    for row in self.__table:
-        sheet.append(row)
+SHEET_TITLE = "Transacciones"
+# openpyxl se importa al crear el primer Excel y no al iniciar la API
+
+def create_excel(chunks: Iterable[pd.DataFrame], excel_file, columns: Optional[List[str]] = None) -> None:
+    """ Crea un archivo Excel a partir de las transacciones, en modo de solo escritura
+    para que la memoria usada no dependa de la cantidad de filas.
+    Args:
+        - chunks: Bloques de transacciones, se escriben a medida que se reciben
+        - excel_file: Ruta o archivo donde se guarda el Excel
+        - columns: Encabezados de la hoja, por defecto las columnas del primer bloque
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet(SHEET_TITLE)
+    if columns is not None:
+        sheet.append(columns)
+    for chunk in chunks:
+        if columns is None:
+            columns = list(chunk.columns)
+            sheet.append(columns)
+        for row in chunk[columns].itertuples(index=False, name=None):
+            sheet.append(row)
     wb.save(excel_file)
 
-def write_to_existing_excel(self, excel_file, base_excel_file):
-    """ Escribe en un archivo Excel existente a partir de los datos en la instancia """
+def write_to_existing_excel(chunks: Iterable[pd.DataFrame], excel_file, base_excel_file) -> None:
+    """ Escribe las transacciones en la hoja activa de un archivo Excel existente,
+    a partir de su primera fila vacía. El archivo base se carga completo en memoria.
+    Args:
+        - chunks: Bloques de transacciones
+        - excel_file: Ruta donde se guarda el Excel resultante
+        - base_excel_file: Ruta del Excel base
+    """
+    from openpyxl import load_workbook
+
     # Abrir el archivo Excel base
     wb_base = load_workbook(filename=base_excel_file)
     # Acceder a la hoja existente en el archivo base
     sheet_base = wb_base.active
-    # Empezar desde la primera fila
-    first_empty_row = 1  
-    # Iterar sobre los datos de la instancia y escribir en la hoja existente
-    for row in self.__table:
-        for idx, value in enumerate(row, start=1):
-            sheet_base.cell(row=first_empty_row, column=idx, value=value)
-        first_empty_row += 1
+    for chunk in chunks:
+        for row in chunk.itertuples(index=False, name=None):
+            sheet_base.append(row)
     # Guardar los cambios en el archivo Excel existente
-    wb_base.save(excel_file)
\ No newline at end of file
+    wb_base.save(excel_file)
@@ -0,0 +1,123 @@
+import importlib.util
+import io
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, Literal, Optional, Tuple
+import pandas as pd
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from .excel2pdf import create_excel
+from .pdf_analyzer import string_values
+from .pdf_extractor import COLUMNS, NUMERIC_COLUMNS, STRING_COLUMNS
+
+# Rows converted and sent at a time when streaming an export
+EXPORT_CHUNK_SIZE = 1000
+READ_SIZE = 1024 * 1024
+
+ExportFormat = Literal['json', 'ndjson', 'csv', 'arrow', 'xlsx']
+
+def table_chunks(table: pd.DataFrame, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Splits a table into blocks of `chunk_size` rows without copying it"""
+    for start in range(0, len(table), chunk_size):
+        yield table.iloc[start:start + chunk_size]
+
+def transaction_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Yields the columns of `TransactionData` of every block, with ids read as numbers and empty cells of the string columns as strings"""
+    for chunk in chunks:
+        yield chunk[COLUMNS].assign(**{column: string_values(chunk[column]) for column in STRING_COLUMNS})
+
+def stream_ndjson(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Writes one JSON object per transaction and line"""
+    for chunk in transaction_chunks(chunks):
+        if len(chunk):
+            lines = chunk.to_json(orient='records', lines=True, force_ascii=False)
+            yield (lines if lines.endswith('\n') else lines + '\n').encode()
+
+def stream_csv(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Writes the transactions as CSV, with the header in the first line"""
+    yield (','.join(COLUMNS) + '\n').encode()
+    for chunk in transaction_chunks(chunks):
+        yield chunk.to_csv(index=False, header=False).encode()
+
+def stream_arrow(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Writes the transactions in the Arrow IPC streaming format, one record batch per block"""
+    import pyarrow as pa
+
+    schema = pa.schema([(column, pa.float64() if column in NUMERIC_COLUMNS else pa.string()) for column in COLUMNS])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in transaction_chunks(chunks):
+            # `from_pandas` does not cast, the string columns must already be strings
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+def stream_xlsx(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Writes the transactions to a temporary workbook in write-only mode and streams the file"""
+    fd, path = tempfile.mkstemp(suffix=".xlsx", dir=settings.UPLOAD_DIR)
+    os.close(fd)
+    try:
+        create_excel(transaction_chunks(chunks), path, columns=COLUMNS)
+        with open(path, 'rb') as file:
+            while data := file.read(READ_SIZE):
+                yield data
+    finally:
+        os.remove(path)
+
+# Media type, file extension and writer of every streamed format
+EXPORTERS: Dict[str, Tuple[str, str, Callable[[Iterable[pd.DataFrame]], Iterator[bytes]]]] = {
+    'ndjson': ('application/x-ndjson', 'ndjson', stream_ndjson),
+    'csv': ('text/csv; charset=utf-8', 'csv', stream_csv),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow', stream_arrow),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx', stream_xlsx),
+}
+
+def negotiate_format(format: Optional[str], accept: Optional[str]) -> str:
+    """
+    Chooses the format of the response, the `format` parameter takes precedence over the Accept header
+
+    Args:
+        format (Optional[str]): Format requested with the `format` parameter
+        accept (Optional[str]): Accept header of the request
+
+    Returns:
+        str: 'json' or one of the keys of `EXPORTERS`
+    """
+    if format is not None:
+        return format
+    for media_range in (accept or '').split(','):
+        media_type = media_range.split(';')[0].strip()
+        for name, (exported_type, _, _) in EXPORTERS.items():
+            if media_type == exported_type.split(';')[0]:
+                return name
+    return 'json'
+
+def export_response(chunks: Iterable[pd.DataFrame], format: str, filename: str) -> StreamingResponse:
+    """
+    Streams the transactions in the given format without building the whole body in memory
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Blocks of transactions, consumed while the response is sent
+        format (str): One of the keys of `EXPORTERS`
+        filename (str): Name of the downloaded file, without extension
+
+    Returns:
+        StreamingResponse: The response to return from the endpoint
+
+    Raises:
+        HTTPException: If the format needs a library that is not installed
+    """
+    if format == 'arrow' and importlib.util.find_spec('pyarrow') is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="El formato Arrow no está disponible en este servidor",
+        )
+    media_type, extension, writer = EXPORTERS[format]
+    return StreamingResponse(
+        writer(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'},
+    )
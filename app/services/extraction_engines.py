@@ -0,0 +1,291 @@
+import logging
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from functools import lru_cache
+from importlib import metadata
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from pypdf import PageObject, PdfReader
+
+logger = logging.getLogger(__name__)
+
+# tabula and pypdf are imported by the engines when they first read a file, so starting
+# the web process does not load them
+
+Pages = Union[str, List[int]]
+
+# Versions of pypdf, from the first included up to the last excluded, whose layout mode internals
+# were checked with the text engine
+TEXT_ENGINE_PYPDF = ((5, 0), (6, 0))
+
+@lru_cache(maxsize=None)
+def text_engine_supported() -> bool:
+    """Whether the installed pypdf is one of `TEXT_ENGINE_PYPDF`, read from its metadata without importing it"""
+    try:
+        installed = metadata.version("pypdf")
+        version = tuple(int(part) for part in installed.split(".")[:2])
+    except (metadata.PackageNotFoundError, ValueError):
+        installed, version = None, None
+    supported = version is not None and TEXT_ENGINE_PYPDF[0] <= version < TEXT_ENGINE_PYPDF[1]
+    if not supported:
+        logger.warning(f'El motor de extracción text no admite la versión {installed} de pypdf, se usará tabula')
+    return supported
+
+class ExtractionEngine(ABC):
+    """Reads the tables of a statement as one DataFrame per page, with the headers of the statement as columns"""
+
+    name: str
+    # Whether the engine runs inside the JVM that the extraction workers start
+    needs_jvm: bool = False
+
+    @property
+    def available(self) -> bool:
+        """Whether the engine can read files with the installed libraries"""
+        return True
+
+    @abstractmethod
+    def read_pages(self, file_path: str, pages: Pages = "all") -> List[pd.DataFrame]:
+        """
+        Reads the tables of the given pages
+
+        Args:
+            file_path (str): Path to the PDF file
+            pages (Pages): 'all' or a list of page numbers starting at 1
+
+        Returns:
+            List[pd.DataFrame]: The table of every page, in page order
+        """
+
+    def iter_pages(self, file_path: str, pages: Pages = "all", batch: int = 10) -> Iterator[pd.DataFrame]:
+        """
+        Reads the tables of the given pages `batch` pages at a time, only the tables of the
+        pages being read are kept in memory
+
+        Args:
+            file_path (str): Path to the PDF file
+            pages (Pages): 'all' or a list of page numbers starting at 1
+            batch (int): Pages read by every call to `read_pages`, which opens the file again
+
+        Yields:
+            pd.DataFrame: The table of every page, in page order
+        """
+        # The reader used to count the pages is released before reading them
+        numbers = list(range(1, page_count(file_path) + 1) if pages == "all" else pages)
+        for start in range(0, len(numbers), max(batch, 1)):
+            yield from self.read_pages(file_path, numbers[start:start + batch])
+
+class TabulaEngine(ExtractionEngine):
+    """Reads the tables with tabula, which guesses the table area of every page"""
+
+    name = "tabula"
+    needs_jvm = True
+
+    def read_pages(self, file_path: str, pages: Pages = "all") -> List[pd.DataFrame]:
+        import tabula
+
+        return tabula.read_pdf(file_path, pages=pages, guess=True)
+
+class TextEngine(ExtractionEngine):
+    """
+    Reads the fixed layout of the Transfermóvil statements from the position of every piece of
+    text, without Java. The header of the table gives the columns: every line below it that has
+    an id starts a transaction, and lines without id just below a transaction continue its cells.
+    """
+
+    name = "text"
+
+    def __init__(self, columns: int = 10) -> None:
+        """
+        Args:
+            columns (int): Number of columns of the table
+        """
+        self.columns = columns
+
+    @property
+    def available(self) -> bool:
+        """The engine reads internals of pypdf that only the versions in `TEXT_ENGINE_PYPDF` are known to have"""
+        return text_engine_supported()
+
+    def read_pages(self, file_path: str, pages: Pages = "all") -> List[pd.DataFrame]:
+        return list(self.iter_pages(file_path, pages))
+
+    def iter_pages(self, file_path: str, pages: Pages = "all", batch: int = 10) -> Iterator[pd.DataFrame]:
+        """
+        Reads the tables of the given pages opening the file once
+
+        Args:
+            file_path (str): Path to the PDF file
+            pages (Pages): 'all' or a list of page numbers starting at 1
+            batch (int): Pages read before dropping the objects pypdf decoded for them,
+            like the fonts they share
+
+        Yields:
+            pd.DataFrame: The table of every page, in page order
+        """
+        from pypdf import PdfReader
+
+        # The file is opened once, so the pages are read one by one, and the header is carried over
+        # to the pages that continue the table
+        with open(file_path, "rb") as file:
+            reader = PdfReader(file)
+            numbers = range(1, len(reader.pages) + 1) if pages == "all" else pages
+            header = None
+            searched = False
+            for index, number in enumerate(numbers, start=1):
+                lines = self.__page_lines(reader, number)
+                if index % max(batch, 1) == 0:
+                    # pypdf keeps every object it decoded, the ones of the pages already read are dropped
+                    reader.resolved_objects.clear()
+                # Pages without header continue the table of the previous page
+                start, header = next(
+                    ((index + 1, cells) for index, cells in enumerate(lines) if self.__is_header(cells)),
+                    (0, header),
+                )
+                if header is None and not searched:
+                    # A range that starts in the middle of the table, like the ones read in parallel,
+                    # takes the header of the statement from the pages before it
+                    searched = True
+                    header = self.__first_header(reader, number)
+                    reader.resolved_objects.clear()
+                if header is None:
+                    continue
+                yield self.__table(header, lines[start:])
+
+    def __page_lines(self, reader: "PdfReader", number: int) -> List[List[Tuple[float, float, float, float, str]]]:
+        """Returns the lines of a page, starting at 1"""
+        return self.__lines(self.__fragments(reader.pages[number - 1]))
+
+    def __first_header(self, reader: "PdfReader", before: int) -> Optional[List[Tuple[float, float, float, float, str]]]:
+        """Returns the first header found in the pages before `before`, the statement has the same columns on every page"""
+        for number in range(1, before):
+            header = next((cells for cells in self.__page_lines(reader, number) if self.__is_header(cells)), None)
+            if header is not None:
+                return header
+        return None
+
+    @staticmethod
+    def __fragments(page: "PageObject") -> List[Tuple[float, float, float, float, str]]:
+        """Returns the start, end, baseline, height and text of every text show operation of the page"""
+        from pypdf.generic import ContentStream
+        # Layout mode internals of pypdf, they decode every text show operation with its position.
+        # The version of pypdf is pinned in requirements.txt and checked by `text_engine_supported`
+        from pypdf._text_extraction._layout_mode._fixed_width_page import recurs_to_target_op
+        from pypdf._text_extraction._layout_mode._text_state_manager import TextStateManager
+
+        if "/Contents" not in page:
+            return []
+        fonts = page._layout_mode_fonts()
+        operations = iter(ContentStream(page["/Contents"].get_object(), page.pdf, "bytes").operations)
+        state = TextStateManager()
+        fragments = []
+        for operands, operator in operations:
+            if operator in (b"BT", b"q"):
+                _, shows = recurs_to_target_op(operations, state, b"ET" if operator == b"BT" else b"Q", fonts, True)
+                fragments.extend(
+                    (show.tx, show.displaced_tx, show.ty, show.font_height, show.txt.strip())
+                    for show in shows if show.txt.strip()
+                )
+            elif operator == b"Tf":
+                state.set_font(fonts[operands[0]], operands[1])
+            else:
+                state.set_state_param(operator, operands)
+        return fragments
+
+    @staticmethod
+    def __lines(fragments: List[Tuple[float, float, float, float, str]]) -> List[List[Tuple[float, float, float, float, str]]]:
+        """
+        Groups the fragments on the same baseline into lines, from the top of the page down,
+        and joins the fragments of a line closer than half a character into cells
+        """
+        lines: List[List[Tuple[float, float, float, float, str]]] = []
+        for fragment in sorted(fragments, key=lambda fragment: (-fragment[2], fragment[0])):
+            if lines and abs(lines[-1][0][2] - fragment[2]) <= max(fragment[3] * 0.3, 1.0):
+                lines[-1].append(fragment)
+            else:
+                lines.append([fragment])
+
+        result = []
+        for line in lines:
+            cells = []
+            for start, end, y, height, text in sorted(line):
+                if cells and start - cells[-1][1] < height * 0.5:
+                    cells[-1] = (cells[-1][0], end, y, height, f"{cells[-1][4]} {text}")
+                else:
+                    cells.append((start, end, y, height, text))
+            result.append(cells)
+        return result
+
+    def __is_header(self, cells: List[Tuple[float, float, float, float, str]]) -> bool:
+        """The header has a cell per column and none of them is a number"""
+        return len(cells) == self.columns and pd.to_numeric(pd.Series([cell[4] for cell in cells]), errors="coerce").isna().all()
+
+    def __table(self, header: List[Tuple[float, float, float, float, str]], lines: List[List[Tuple[float, float, float, float, str]]]) -> pd.DataFrame:
+        """Assigns the cells below the header to its columns and converts the numbers like tabula does"""
+        # A cell belongs to the column whose header starts before it, split in the middle of the gap between headers
+        boundaries = [(previous[1] + current[0]) / 2 for previous, current in zip(header, header[1:])]
+        rows: List[List[Optional[str]]] = []
+        previous_y: Optional[float] = None
+        for cells in lines:
+            values: List[Optional[str]] = [None] * self.columns
+            for start, _, _, _, text in cells:
+                column = bisect_right(boundaries, start)
+                values[column] = text if values[column] is None else f"{values[column]} {text}"
+            filled = sum(value is not None for value in values)
+            y, height = cells[0][2], cells[0][3]
+            if values[0] is not None and filled * 2 >= self.columns:
+                rows.append(values)
+            elif values[0] is None and rows and previous_y is not None and previous_y - y <= height * 1.5:
+                # A cell that wraps into several lines
+                rows[-1] = [
+                    old if new is None else new if old is None else f"{old} {new}"
+                    for old, new in zip(rows[-1], values)
+                ]
+            else:
+                # Titles, totals and page footers
+                continue
+            previous_y = y
+
+        table = pd.DataFrame([[np.nan if value is None else value for value in row] for row in rows], columns=[cell[4] for cell in header])
+        for column in table.columns:
+            try:
+                table[column] = pd.to_numeric(table[column], errors="raise")
+            except (ValueError, TypeError):
+                pass
+        return table
+
+def page_count(file_path: str) -> int:
+    """Returns the number of pages of the PDF file"""
+    from pypdf import PdfReader
+
+    # Given a file object pypdf reads what it needs, given a path it loads the whole file in memory
+    with open(file_path, "rb") as file:
+        return len(PdfReader(file).pages)
+
+ENGINES: Dict[str, ExtractionEngine] = {engine.name: engine for engine in (TabulaEngine(), TextEngine())}
+
+def get_engine(name: str) -> ExtractionEngine:
+    """
+    Returns the extraction engine with the given name, or tabula if the installed libraries
+    do not support it
+
+    Raises:
+        ValueError: If there is no engine with that name
+    """
+    try:
+        engine = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Motor de extracción desconocido: {name}. Debe ser uno de {', '.join(ENGINES)}")
+    return engine if engine.available else ENGINES["tabula"]
+
+def configured_engines() -> List[ExtractionEngine]:
+    """
+    Returns the engines set in `EXTRACTION_ENGINE` and `EXTRACTION_SHADOW_ENGINE`
+
+    Raises:
+        ValueError: If one of them does not exist
+    """
+    return [get_engine(name) for name in (settings.EXTRACTION_ENGINE, settings.EXTRACTION_SHADOW_ENGINE) if name]
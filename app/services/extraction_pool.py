@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+from app.core.config import settings
+from app.core.metrics import metrics, collect
+from .extraction_engines import configured_engines
+
+logger = logging.getLogger(__name__)
+
+JAVA_OPTIONS = ["-Djava.awt.headless=true", "-Dfile.encoding=UTF8"]
+
+class PoolSaturatedError(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+def _start_jvm() -> None:
+    """Starts the JVM of the worker process through jpype so tabula reuses it on every call"""
+    if not any(engine.needs_jvm for engine in configured_engines()):
+        return
+    try:
+        from tabula.backend import TabulaVm
+        TabulaVm(java_options=list(JAVA_OPTIONS), silent=True)
+    except Exception as e:
+        # tabula falls back to launching `java` per call if the JVM cannot be embedded
+        logger.warning(f'No se pudo iniciar la JVM del proceso {os.getpid()}: {e}')
+
+def _ping() -> int:
+    """Health check executed inside a worker process"""
+    return os.getpid()
+
+class ExtractionPool:
+    """
+    Pool of long-lived worker processes that keep a tabula JVM warm across requests.
+    It runs the blocking extraction and analysis off the event loop, admitting at most
+    one task per worker and a bounded number of waiting tasks.
+    """
+
+    def __init__(self, workers: int, queue_size: int, health_interval: int, health_timeout: int) -> None:
+        """
+        Initializes the pool without starting any process
+
+        Args:
+            workers (int): Number of worker processes, 0 runs the tasks in a thread of the calling process
+            queue_size (int): Maximum number of tasks waiting for a free worker
+            health_interval (int): Seconds between health checks of the workers
+            health_timeout (int): Seconds a worker has to answer a health check
+        """
+        self.workers = workers
+        self.concurrency = max(workers, 1)
+        self.queue_size = queue_size
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.restarts = 0
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.__slots: Optional[asyncio.Semaphore] = None
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__lock = Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.__executor is not None
+
+    @property
+    def saturated(self) -> bool:
+        """Whether every worker is busy and the wait queue is full"""
+        return self.__slots is not None and self.__slots.locked() and self.waiting >= self.queue_size
+
+    def start(self) -> None:
+        """Starts the worker processes and waits until every JVM is warm"""
+        self.__slots = asyncio.Semaphore(self.concurrency)
+        self.__spawn()
+
+    def __spawn(self) -> None:
+        if self.workers <= 0:
+            return
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_start_jvm,
+        )
+        with self.__lock:
+            self.__executor = executor
+        # Submitting one task per worker forces every process to spawn and run its initializer
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        """Stops the worker processes"""
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def restart(self, broken: Optional[ProcessPoolExecutor] = None) -> None:
+        """
+        Replaces every worker process, killing the ones that are hung
+
+        Args:
+            broken (Optional[ProcessPoolExecutor]): The executor that failed, if it was
+            already replaced by another caller nothing is done
+        """
+        with self.__lock:
+            if broken is not None and broken is not self.__executor:
+                return
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            for process in list(getattr(executor, '_processes', {}).values()):
+                process.kill()
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.restarts += 1
+        logger.warning('Reiniciando los procesos de extracción')
+        self.__spawn()
+
+    async def run(self, task: Callable[[], Any], reject_when_full: bool = True) -> Any:
+        """
+        Runs a picklable task in a worker process once a worker is free
+
+        Args:
+            task (Callable[[], Any]): Module level function, or a partial of one, to execute
+            reject_when_full (bool): Whether to fail instead of waiting when the queue is full,
+            background tasks that are already bounded by their own queue wait anyway
+
+        Returns:
+            Any: The value returned by the task
+
+        Raises:
+            PoolSaturatedError: If every worker is busy and the wait queue is full
+        """
+        if self.__slots is None:
+            # The lifespan hook did not start the pool, tasks run in threads
+            self.__slots = asyncio.Semaphore(self.concurrency)
+        if reject_when_full and self.saturated:
+            self.rejected += 1
+            raise PoolSaturatedError()
+
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await self.__slots.acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.monotonic() - start
+        self.admitted += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+        metrics.record('queue', wait)
+
+        self.active += 1
+        try:
+            if not metrics.enabled:
+                return await self.__submit(task)
+            # The stages measured in the worker come back with the result
+            result, collected = await self.__submit(partial(collect, task))
+            metrics.replay(collected)
+            return result
+        finally:
+            self.active -= 1
+            self.__slots.release()
+
+    async def __submit(self, task: Callable[[], Any]) -> Any:
+        executor = self.__executor
+        if executor is None:
+            return await asyncio.to_thread(task)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, task)
+        except BrokenProcessPool:
+            # A JVM crash kills its worker, the task is retried once on a fresh pool
+            await asyncio.to_thread(self.restart, executor)
+            return await loop.run_in_executor(self.__executor, task)
+
+    def health_check(self) -> bool:
+        """
+        Checks that no worker died and that idle workers answer in time,
+        restarting the pool if they do not
+
+        Returns:
+            bool: True if the workers were healthy
+        """
+        executor = self.__executor
+        if executor is None:
+            return True
+        processes = list(getattr(executor, '_processes', {}).values())
+        if any(not process.is_alive() for process in processes):
+            self.restart(executor)
+            return False
+        # A ping would queue behind a long extraction, so only idle pools are pinged
+        if self.active:
+            return True
+        try:
+            futures = [executor.submit(_ping) for _ in range(self.workers)]
+            for future in futures:
+                future.result(timeout=self.health_timeout)
+            return True
+        except (BrokenProcessPool, FutureTimeoutError):
+            self.restart(executor)
+            return False
+
+    async def monitor(self) -> None:
+        """Runs the health check periodically until cancelled"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.to_thread(self.health_check)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the queue depth, wait times and restarts of the pool"""
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "wait_seconds_avg": self.wait_seconds_total / self.admitted if self.admitted else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+extraction_pool = ExtractionPool(
+    workers=settings.EXTRACTION_WORKERS,
+    queue_size=settings.EXTRACTION_QUEUE_SIZE,
+    health_interval=settings.EXTRACTION_HEALTH_INTERVAL_SECONDS,
+    health_timeout=settings.EXTRACTION_HEALTH_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from app.core.config import settings
+from app.core.rate_limit import rate_limiter
+from .extraction_pool import extraction_pool
+from .pdf_analyzer import analyze_many, extract_pdf
+
+logger = logging.getLogger(__name__)
+
+ANALYSES = ['transactions', 'deposits', 'sales']
+
+class Job:
+    """Analysis of a statement processed in the background"""
+
+    def __init__(self, file_path: str, digest: str, transaction_status: str, owner: str, filters: Optional[Dict[str, Any]] = None, slot: Optional[int] = None) -> None:
+        """
+        Args:
+            file_path (str): Path of the PDF file, owned by the job until it finishes
+            digest (str): SHA-256 digest of the file
+            transaction_status (str): Status of the transactions to analyze
+            owner (str): Username of the user that submitted the job
+            filters (Optional[Dict[str, Any]]): Arguments of `filter_transactions`
+            slot (Optional[int]): Parse slot of the owner, owned by the job until it finishes
+        """
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.digest = digest
+        self.transaction_status = transaction_status
+        self.filters = filters or {}
+        self.owner = owner
+        self.slot = slot
+        self.status = 'queued'
+        self.stage: Optional[str] = None
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.results: Dict[str, Any] = {}
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.expires_at: Optional[float] = None
+
+class JobManager:
+    """Queue of statement analyses processed by background workers"""
+
+    def __init__(self, workers: int, queue_size: int, ttl_seconds: int) -> None:
+        """
+        Args:
+            workers (int): Number of jobs processed at the same time
+            queue_size (int): Maximum number of jobs waiting to be processed
+            ttl_seconds (int): Seconds the results of a finished job are kept
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl_seconds = ttl_seconds
+        self.__jobs: Dict[str, Job] = {}
+        self.__queue: Optional[asyncio.Queue] = None
+        self.__tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Starts the background workers, must be called from the event loop"""
+        self.__queue = asyncio.Queue(maxsize=self.queue_size)
+        self.__tasks = [asyncio.create_task(self.__worker()) for _ in range(self.workers)]
+        self.__tasks.append(asyncio.create_task(self.__expire()))
+
+    async def stop(self) -> None:
+        """Cancels the background workers and discards the pending jobs"""
+        for task in self.__tasks:
+            task.cancel()
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        self.__tasks = []
+        for job in self.__jobs.values():
+            self.__remove_file(job)
+            self.__release_slot(job)
+        self.__jobs.clear()
+
+    def submit(self, file_path: str, digest: str, transaction_status: str, owner: str, filters: Optional[Dict[str, Any]] = None, slot: Optional[int] = None) -> Job:
+        """
+        Queues the analysis of a statement
+
+        Args:
+            file_path (str): Path of the PDF file, it is deleted once the job finishes
+            digest (str): SHA-256 digest of the file
+            transaction_status (str): Status of the transactions to analyze
+            owner (str): Username of the user that submitted the job
+            filters (Optional[Dict[str, Any]]): Arguments of `filter_transactions` applied to every analysis
+            slot (Optional[int]): Parse slot of the owner, released when the job finishes
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            asyncio.QueueFull: If the queue has no room for more jobs
+        """
+        if self.__queue is None:
+            self.start()
+        job = Job(file_path, digest, transaction_status, owner, filters, slot)
+        self.__queue.put_nowait(job)
+        self.__jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str, owner: str) -> Optional[Job]:
+        """Returns the job with the given id if it belongs to `owner`"""
+        job = self.__jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    async def __worker(self) -> None:
+        while True:
+            job = await self.__queue.get()
+            try:
+                await self.__process(job)
+            except Exception as e:
+                logger.exception(f'Error procesando el trabajo {job.id}')
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                self.__remove_file(job)
+                await asyncio.to_thread(self.__release_slot, job)
+                job.finished_at = datetime.now()
+                job.expires_at = time.monotonic() + self.ttl_seconds
+                self.__queue.task_done()
+
+    async def __process(self, job: Job) -> None:
+        job.status = 'running'
+
+        job.stage = 'extraction'
+        table = await extract_pdf(job.file_path, job.digest, reject_when_full=False)
+        if not isinstance(table, pd.DataFrame):
+            # `read_pdf` returns an error message instead of a table when it fails
+            raise ValueError(table)
+        job.progress = 0.5
+
+        # One task computes every result, the table is sent to the worker and totaled once
+        job.stage = 'analysis'
+        task = partial(analyze_many, table, ANALYSES, filters=job.filters, transaction_status=job.transaction_status)
+        job.results = await extraction_pool.run(task, reject_when_full=False)
+        job.progress = 1.0
+
+        job.stage = None
+        job.status = 'done'
+
+    async def __expire(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.ttl_seconds, 60))
+            now = time.monotonic()
+            for job_id, job in list(self.__jobs.items()):
+                if job.expires_at is not None and job.expires_at < now:
+                    del self.__jobs[job_id]
+
+    def __remove_file(self, job: Job) -> None:
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+    def __release_slot(self, job: Job) -> None:
+        slot, job.slot = job.slot, None
+        if slot is not None:
+            rate_limiter.release(slot)
+
+job_manager = JobManager(
+    workers=settings.JOB_WORKERS,
+    queue_size=settings.JOB_QUEUE_SIZE,
+    ttl_seconds=settings.JOB_TTL_SECONDS,
+)
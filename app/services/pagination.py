@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+import pandas as pd
+from fastapi import HTTPException, status
+from .pdf_analyzer import parse_dates, records
+
+def encode_cursor(timestamp: Optional[datetime], transaction_id: str) -> str:
+    """
+    Encodes the position of the last returned transaction in the (date, id) ordering
+
+    Args:
+        timestamp (Optional[datetime]): Date of the transaction, None if it could not be read
+        transaction_id (str): Id of the transaction
+
+    Returns:
+        str: An opaque cursor for the next page
+    """
+    key = [timestamp.isoformat() if timestamp is not None else None, transaction_id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    """
+    Decodes a cursor created by `encode_cursor`
+
+    Args:
+        cursor (str): The cursor sent by the client
+
+    Returns:
+        Tuple[Optional[datetime], str]: Date and id of the last transaction of the previous page
+
+    Raises:
+        HTTPException: If the cursor is not valid
+    """
+    try:
+        timestamp, transaction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp is not None else None), str(transaction_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El cursor no es válido")
+
+def uses_cursor(limit: Optional[int], cursor: Optional[str], pagination: str) -> bool:
+    """
+    Whether a page is requested by cursor: with the cursor of a previous page, or with
+    `pagination=cursor` for the first one. Otherwise pages are numbered, or every row is returned.
+
+    Raises:
+        HTTPException: If the page is requested by cursor without `limit`
+    """
+    if cursor is None and pagination != 'cursor':
+        return False
+    if limit is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Indica *limit* para paginar por cursor")
+    return True
+
+def keyset_page(table: pd.DataFrame, limit: int, cursor: Optional[str] = None) -> dict:
+    """
+    Returns the `limit` transactions following the cursor, ordered by date and id.
+    Transactions whose date cannot be read go first.
+
+    Args:
+        table (pd.DataFrame): A table of transactions
+        limit (int): Number of transactions of the page
+        cursor (Optional[str]): Cursor of the previous page, the first page is returned if not given
+
+    Returns:
+        dict: The fields of the response for the page
+    """
+    dates = parse_dates(table)
+    ids = table['id'].astype(str)
+    if cursor is not None:
+        last_date, last_id = decode_cursor(cursor)
+        if last_date is None:
+            after = dates.notna() | (dates.isna() & (ids > last_id))
+        else:
+            # Comparisons against NaT are False, so undated transactions are never after a dated one
+            after = (dates > last_date) | ((dates == last_date) & (ids > last_id))
+        table, dates, ids = table[after], dates[after], ids[after]
+
+    # Positions are used instead of labels because the index of the table may repeat
+    order = pd.DataFrame({'date': dates.to_numpy(), 'id': ids.to_numpy()}).sort_values(['date', 'id'], na_position='first')
+    selected = order.index[:limit + 1]
+    page = table.iloc[selected[:limit]]
+
+    next_cursor = None
+    if len(selected) > limit:
+        last = order.loc[selected[limit - 1]]
+        next_cursor = encode_cursor(None if pd.isna(last['date']) else last['date'].to_pydatetime(), last['id'])
+    return {"limit": limit, "next_cursor": next_cursor, "results": records(page)}
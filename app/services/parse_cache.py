@@ -0,0 +1,130 @@
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+def file_digest(file_path: str) -> str:
+    """
+    Computes the SHA-256 digest of a file, reading it in chunks
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: The hexadecimal digest of the file content
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def estimate_size(table: Any) -> int:
+    """Approximates the memory used by a parsed table in bytes"""
+    if hasattr(table, 'memory_usage'):
+        return int(table.memory_usage(deep=True).sum())
+    size = sys.getsizeof(table)
+    for row in table:
+        size += sys.getsizeof(row)
+        values = row.values() if isinstance(row, dict) else row
+        size += sum(sys.getsizeof(value) for value in values)
+    return size
+
+class ParseCache:
+    """Bounded LRU cache of parsed statements with TTL and memory budget"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, max_bytes: int) -> None:
+        """
+        Initializes an empty cache
+
+        Args:
+            max_entries (int): Maximum number of statements kept in the cache
+            ttl_seconds (int): Seconds a statement stays in the cache after being stored
+            max_bytes (int): Approximate memory budget for all cached statements
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.__entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.__size = 0
+        self.__lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the parsed table stored under `key`, or None if it is missing or expired
+
+        Args:
+            key (str): SHA-256 digest of the file
+
+        Returns:
+            Optional[Any]: The cached table
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self.__remove(key)
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: str, table: Any) -> None:
+        """
+        Stores a parsed table, evicting the least recently used entries if needed
+
+        Args:
+            key (str): SHA-256 digest of the file
+            table (Any): The parsed table
+        """
+        if self.max_entries <= 0:
+            return
+        size = estimate_size(table)
+        if size > self.max_bytes:
+            return
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            self.__entries[key] = (time.monotonic() + self.ttl_seconds, size, table)
+            self.__size += size
+            while len(self.__entries) > self.max_entries or self.__size > self.max_bytes:
+                self.__remove(next(iter(self.__entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes every entry from the cache"""
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters and the current usage of the cache"""
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.__entries),
+                "size_bytes": self.__size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __remove(self, key: str) -> None:
+        _, size, _ = self.__entries.pop(key)
+        self.__size -= size
+
+parse_cache = ParseCache(
+    max_entries=settings.PARSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PARSE_CACHE_TTL_SECONDS,
+    max_bytes=settings.PARSE_CACHE_MAX_MB * 1024 * 1024,
+)
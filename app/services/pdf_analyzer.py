@@ -1,39 +1,98 @@
-from .pdf_extractor import PdfExtractor
-from collections import Counter
-from typing import List, Dict
+import asyncio
+import logging
+from datetime import datetime
+from functools import partial
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.core.metrics import metrics
+from .pdf_extractor import PdfExtractor, COLUMNS, READ_ERROR, STRING_COLUMNS, TIMESTAMP_COLUMN
+from .extraction_pool import extraction_pool, PoolSaturatedError
+from .parse_cache import parse_cache, file_digest
+from typing import Any, List, Dict, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Statuses accepted by the analyzer and the value of `transaction_status` they select
+STATUS_GROUPS = {'all': None, 'successful': 'Exitosa', 'failed': 'Fallida'}
+STATUS_BY_VALUE = {value: status for status, value in STATUS_GROUPS.items() if value}
+
+DEPOSIT_TYPE = 'Recarga Bolsa CUP'
+NON_SALES_TYPES = {'Estado de Cuenta', DEPOSIT_TYPE}
+
+# Total of the sales response each transaction type adds to
+SALES_TOTALS = {
+    'Venta de Saldo AT': 'total_saldo',
+    'Recarga Propia AT': 'total_propia',
+    'Recarga Movil': 'total_movil',
+    'Recarga Nauta AT': 'total_nauta',
+    'Recarga Nauta Hogar AT': 'total_nauta_hogar',
+    'Pago Factura AT': 'total_factura',
+}
+
+# Periods of the time series, weeks start on Monday
+PERIODS = ('day', 'week', 'month')
+# Columns the failure rates can be grouped by
+FAILURE_GROUPS = ('payment_type', 'transaction_type')
 
 class PdfAnalyzer:
     """Class for analyzing data extracted from a PDF file"""
 
-    def __init__(self, file_path: str) -> None:
+    def __init__(self, file_path: Optional[str] = None, table: Optional[pd.DataFrame] = None, filters: Optional[Dict[str, Any]] = None, remove_rollbacks: bool = True, streaming: bool = False) -> None:
         """
         Initializes the PdfAnalyzer object by extracting data from the PDF.
 
         Args:
             file_path (str): Path to the PDF file to be processed.
+            table (Optional[pd.DataFrame]): Table already extracted from the PDF, if given
+            the file is not read. A list of transactions is also accepted.
+            filters (Optional[Dict[str, Any]]): Arguments of `filter_transactions` applied
+            to the transactions before they are totaled
+            remove_rollbacks (bool): Whether to remove the transactions of repeated suppliers,
+            disabled for tables merged from statements that were already cleaned
+            streaming (bool): Whether to total the file page by page while it is read, without
+            keeping its table. Only `summary` is available in this mode
         """
+        self.__groups: Optional[Dict[str, Dict[str, Any]]] = None
+        self.__filters = filters or {}
+        self.__remove_rollbacks = remove_rollbacks
+        self.__extractor: Optional[PdfExtractor] = None
+        self.__table: Optional[pd.DataFrame] = None
+        # Raised by the analyses when the file could not be read
+        self.__error = READ_ERROR
         try:
-            self.__table: List[Dict] = PdfExtractor(file_path).read_pdf(return_format='dict')
+            if table is None and streaming:
+                self.__extractor = PdfExtractor(file_path)
+            elif table is None:
+                table = PdfExtractor(file_path).read_pdf(return_format='dataframe')
+            elif isinstance(table, list):
+                table = pd.DataFrame(table, columns=COLUMNS)
+            if isinstance(table, str):
+                # `read_pdf` returns an error message instead of a table when it fails
+                raise ValueError(table)
+            self.__table = table
         except Exception as e:
-            print(f'{e}')
+            logger.warning(f'No se pudo leer el estado de cuenta {file_path}: {e}')
+            self.__error = str(e)
+
+    @property
+    def table(self) -> Optional[pd.DataFrame]:
+        """Table extracted from the PDF, None in streaming mode"""
+        return self.__table
 
-    def remove_all_duplicates_by_supplier(self, transactions: List[Dict]) -> List[Dict]:
+    def remove_all_duplicates_by_supplier(self, transactions: pd.DataFrame) -> pd.DataFrame:
         """
-        Removes all transactions where the supplier appears more than once in the list
+        Removes all transactions where the supplier appears more than once in the table
 
         Args:
-            transactions: A list of transactions
+            transactions: A table of transactions
 
         Returns:
-            list: A list containing only transactions from unique suppliers
+            pd.DataFrame: A table containing only transactions from unique suppliers
         """
-        # Count how many times each supplier_id appears
-        supplier_counts = Counter([t['supplier_id'] for t in transactions])
+        return transactions[~transactions['supplier_id'].duplicated(keep=False)]
 
-        # Filter transactions, removing those whose supplier appears more than once
-        return list(filter(lambda t: supplier_counts[t['supplier_id']] == 1, transactions))
-
-    def transactions(self, transaction_status: str = 'all') -> List[Dict]:
+    def transactions(self, transaction_status: str = 'all') -> pd.DataFrame:
         """Return transactions based on the specified status
 
         Args:
@@ -41,48 +100,585 @@ class PdfAnalyzer:
             Possible values are 'all', 'successful', or 'failed'
 
         Returns:
-            list: A list of transactions matching the specified status
+            pd.DataFrame: A table of transactions matching the specified status
         """
-        filtered_table = self.remove_all_duplicates_by_supplier(self.__table) # table without rollback
-        if transaction_status == 'all':
-            return filtered_table
-        elif transaction_status == 'successful':
-            return list(filter(lambda r: r['transaction_status'] == 'Exitosa', filtered_table))
-        elif transaction_status == 'failed':
-            return list(filter(lambda r: r['transaction_status'] == 'Fallida', filtered_table))
-        else:
-            raise ValueError("El estado de la transacción no es válido. Debe ser 'all', 'successful' o 'failed'")
+        return self.__rows(transaction_status)['transactions']
 
-    def deposits(self, transaction_status: str = 'successful') -> List[Dict]:
+    def deposits(self, transaction_status: str = 'successful') -> Tuple[float, pd.DataFrame]:
         """Calculates the total amount deposited in the bank"""
-        total_amount = 0
-        data = []
-        for row in self.transactions(transaction_status):
-            if row['transaction_type'] == 'Recarga Bolsa CUP':
-                data.append(row)
-                total_amount += row['amount_paid']
-        return total_amount, data
-
-    def sales(self, transaction_status: str = 'successful') -> List[Dict]:
+        group = self.__rows(transaction_status)
+        return group['total_deposits'], group['deposits']
+
+    def sales(self, transaction_status: str = 'successful') -> Tuple:
         """Calculates the total amount deducted for recharges"""
-        total_amount, total_saldo, total_movil, total_nauta = 0, 0, 0, 0
-        total_nauta_hogar, total_factura, total_propia = 0, 0, 0
-        data = []
-        for row in self.transactions(transaction_status):
-            if row['transaction_type'] == 'Venta de Saldo AT':
-                total_saldo += row['amount_paid']
-            if row['transaction_type'] == 'Recarga Propia AT':
-                total_propia += row['amount_paid']
-            if row['transaction_type'] == 'Recarga Movil':
-                total_movil += row['amount_paid']
-            if row['transaction_type'] == 'Recarga Nauta AT':
-                total_nauta += row['amount_paid']
-            if row['transaction_type'] == 'Recarga Nauta Hogar AT':
-                total_nauta_hogar += row['amount_paid']
-            if row['transaction_type'] == 'Pago Factura AT':
-                total_factura += row['amount_paid']
-            if row['transaction_type'] not in ['Estado de Cuenta', 'Recarga Bolsa CUP']:
-                data.append(row)
-                total_amount += row['amount_paid']
+        group = self.__rows(transaction_status)
+        return (*self.__sales_totals(group), group['sales'])
+
+    def summary(self, transaction_status: str = 'successful') -> Dict[str, Any]:
+        """Returns every aggregate of the statement without the transactions"""
+        group = self.__group(transaction_status)
+        total_amount, total_saldo, total_propia, total_movil, total_nauta, total_nauta_hogar, total_factura, profits = self.__sales_totals(group)
+        return {
+            "total": group['transaction_count'],
+            "successful": self.__groups['successful']['transaction_count'],
+            "failed": self.__groups['failed']['transaction_count'],
+            "deposits": group['deposit_count'],
+            "total_deposits": round(group['total_deposits'], 2),
+            "sales": group['sale_count'],
+            "total_amount": total_amount,
+            "total_saldo": total_saldo,
+            "total_propia": total_propia,
+            "total_movil": total_movil,
+            "total_nauta": total_nauta,
+            "total_nauta_hogar": total_nauta_hogar,
+            "total_factura": total_factura,
+            "profits": profits,
+        }
+
+    def timeseries(self, transaction_status: str = 'successful', period: str = 'day') -> Dict[str, Any]:
+        """
+        Totals the transactions, sales, deposits and profits of every day, week or month
+
+        Args:
+            transaction_status (str): The status of the transactions to total
+            period (str): 'day', 'week' or 'month'
+
+        Returns:
+            Dict[str, Any]: The totals of every period with transactions in chronological order,
+            and how many transactions were left out because their date could not be read
+        """
+        if period not in PERIODS:
+            raise ValueError("El periodo no es válido. Debe ser 'day', 'week' o 'month'")
+        transactions = self.transactions(transaction_status)
+        with metrics.stage('analyze'):
+            dates = parse_dates(transactions)
+            days = dates.dt.normalize()
+            if period == 'week':
+                days = days - pd.to_timedelta(dates.dt.weekday, unit='D')
+            elif period == 'month':
+                days = days - pd.to_timedelta(dates.dt.day - 1, unit='D')
+            amount = transactions['amount_paid']
+            is_deposit = transactions['transaction_type'] == DEPOSIT_TYPE
+            is_sale = ~transactions['transaction_type'].isin(NON_SALES_TYPES)
+            # Transactions without date have no period and are dropped by the groupby
+            totals = pd.DataFrame({
+                "period": days,
+                "sales": is_sale,
+                "total_amount": amount.where(is_sale, 0.0),
+                "deposits": is_deposit,
+                "total_deposits": amount.where(is_deposit, 0.0),
+            }).groupby("period").agg(
+                transactions=("sales", "size"),
+                sales=("sales", "sum"),
+                total_amount=("total_amount", "sum"),
+                deposits=("deposits", "sum"),
+                total_deposits=("total_deposits", "sum"),
+            )
+            totals["profits"] = totals["total_amount"] / 0.9 - totals["total_amount"]
+            totals = totals.round({"total_amount": 2, "total_deposits": 2, "profits": 2})
+            totals.index = totals.index.strftime('%Y-%m-%d')
+        return {
+            "period": period,
+            "undated": int(dates.isna().sum()),
+            "results": totals.reset_index().to_dict('records'),
+        }
+
+    def top_suppliers(self, transaction_status: str = 'successful', top: int = 10, order_by: str = 'amount') -> Dict[str, Any]:
+        """
+        Returns the suppliers with the largest sales. Rollbacks are removed like in the other analyses,
+        so a supplier repeated in the same statement is not counted.
+
+        Args:
+            transaction_status (str): The status of the sales to total
+            top (int): Number of suppliers to return
+            order_by (str): 'amount' to rank them by amount sold or 'count' by number of sales
+
+        Returns:
+            Dict[str, Any]: How many suppliers bought and the total sold, and the amount, the number
+            of sales and the share of the total of the first `top` suppliers
+        """
+        if order_by not in ('amount', 'count'):
+            raise ValueError("El orden no es válido. Debe ser 'amount' o 'count'")
+        sales = self.__rows(transaction_status)['sales']
+        with metrics.stage('analyze'):
+            totals = sales.groupby('supplier_id', observed=True)['amount_paid'].agg(transactions='size', total_amount='sum')
+            ranking = ['total_amount', 'transactions'] if order_by == 'amount' else ['transactions', 'total_amount']
+            ranked = totals.sort_values(ranking, ascending=False, kind='stable').head(top)
+            total_amount = float(totals['total_amount'].sum())
+            ranked['share'] = ranked['total_amount'] / total_amount if total_amount else 0.0
+            ranked = ranked.round({"total_amount": 2, "share": 4})
+        return {
+            "suppliers": len(totals),
+            "total_amount": round(total_amount, 2),
+            "results": ranked.reset_index().to_dict('records'),
+        }
+
+    def failure_rates(self, by: str = 'payment_type') -> Dict[str, Any]:
+        """
+        Returns the share of failed transactions of every payment type or transaction type
+
+        Args:
+            by (str): 'payment_type' or 'transaction_type'
+
+        Returns:
+            Dict[str, Any]: For every value of the column, its transactions, the failed ones,
+            their amount and the failure rate, from the highest rate down
+        """
+        if by not in FAILURE_GROUPS:
+            raise ValueError("La agrupación no es válida. Debe ser 'payment_type' o 'transaction_type'")
+        transactions = self.transactions('all')
+        with metrics.stage('analyze'):
+            failed = transactions['transaction_status'] == STATUS_GROUPS['failed']
+            rates = pd.DataFrame({
+                "value": transactions[by],
+                "failed": failed,
+                "failed_amount": transactions['amount_paid'].where(failed, 0.0),
+            }).groupby("value", observed=True).agg(
+                transactions=("failed", "size"),
+                failed=("failed", "sum"),
+                failed_amount=("failed_amount", "sum"),
+            )
+            rates["failure_rate"] = rates["failed"] / rates["transactions"]
+            rates = rates.sort_values("failure_rate", ascending=False, kind='stable').round({"failed_amount": 2, "failure_rate": 4})
+            rates.index = rates.index.astype(str)
+        return {
+            "by": by,
+            "results": rates.reset_index().to_dict('records'),
+        }
+
+    @staticmethod
+    def __sales_totals(group: Dict[str, Any]) -> Tuple:
+        """Rounds the total sold, the total of every sales type and the profits of a group"""
+        totals = group['totals']
+        total_amount = group['total_amount']
         profits = total_amount / 0.9 - total_amount
-        return round(total_amount, 2), round(total_saldo, 2), round(total_propia, 2), round(total_movil, 2), round(total_nauta, 2), round(total_nauta_hogar, 2), round(total_factura, 2), round(profits, 2), data
+        return round(total_amount, 2), round(totals['total_saldo'], 2), round(totals['total_propia'], 2), round(totals['total_movil'], 2), round(totals['total_nauta'], 2), round(totals['total_nauta_hogar'], 2), round(totals['total_factura'], 2), round(profits, 2)
+
+    def __rows(self, transaction_status: str) -> Dict[str, Any]:
+        """Returns the aggregates of the given status, which must include its transactions"""
+        if self.__extractor is not None:
+            raise ValueError("El análisis por páginas solo permite calcular el resumen")
+        return self.__group(transaction_status)
+
+    def __group(self, transaction_status: str) -> Dict[str, Any]:
+        """Returns the aggregates of the transactions with the given status"""
+        if transaction_status not in STATUS_GROUPS:
+            raise ValueError("El estado de la transacción no es válido. Debe ser 'all', 'successful' o 'failed'")
+        if self.__groups is None:
+            if self.__table is None and self.__extractor is None:
+                raise ValueError(self.__error)
+            if self.__extractor is not None:
+                # The stage of the extraction engine is measured while the pages are read
+                self.__groups = self.__aggregate_pages()
+            else:
+                with metrics.stage('analyze'):
+                    self.__groups = self.__aggregate()
+        return self.__groups[transaction_status]
+
+    def __aggregate(self) -> Dict[str, Dict[str, Any]]:
+        """Filters and totals the transactions of every status with vectorized operations over the table"""
+        table = self.__table
+        if self.__remove_rollbacks:
+            table = self.remove_all_duplicates_by_supplier(table) # table without rollback
+        table = filter_transactions(table, **self.__filters)
+        is_deposit = table['transaction_type'] == DEPOSIT_TYPE
+        is_sale = ~table['transaction_type'].isin(NON_SALES_TYPES)
+
+        groups = {}
+        for status, value in STATUS_GROUPS.items():
+            selected = table['transaction_status'] == value if value else pd.Series(True, index=table.index)
+            transactions = table[selected]
+            deposits = table[selected & is_deposit]
+            sales = table[selected & is_sale]
+            by_type = transactions.groupby('transaction_type', observed=True)['amount_paid'].sum()
+            groups[status] = {
+                "transactions": transactions,
+                "transaction_count": len(transactions),
+                "deposits": deposits,
+                "deposit_count": len(deposits),
+                "total_deposits": float(deposits['amount_paid'].sum()),
+                "sales": sales,
+                "sale_count": len(sales),
+                "total_amount": float(sales['amount_paid'].sum()),
+                "totals": {key: float(by_type.get(transaction_type, 0)) for transaction_type, key in SALES_TOTALS.items()},
+            }
+        return groups
+
+    def __aggregate_pages(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Totals the transactions of every status while the file is read page by page. Of every
+        transaction only a hash of its supplier, a code of its type and status and its amount are
+        kept, the state needed to remove the rollbacks once every page was read, so a statement
+        takes about 20 bytes per transaction instead of its whole table.
+        """
+        # Status codes: 0 successful, 1 failed, 2 any other value
+        statuses = {value: code for code, value in enumerate(STATUS_BY_VALUE)}
+        width = len(statuses) + 1
+        types: Dict[str, int] = {}
+        suppliers, codes, amounts = [], [], []
+        pages = self.__extractor.iter_rows()
+        while True:
+            try:
+                page = next(pages, None)
+            except Exception as e:
+                raise ValueError(READ_ERROR) from e
+            if page is None:
+                break
+            with metrics.stage('analyze'):
+                selected = filter_transactions(page, **self.__filters)
+                kinds = page['transaction_type'].astype(str)
+                for kind in kinds.unique():
+                    types.setdefault(kind, len(types))
+                code = kinds.map(types).astype(np.int32) * width + page['transaction_status'].astype(str).map(statuses).fillna(len(statuses)).astype(np.int32)
+                # Filtered out transactions still count to find the repeated suppliers
+                code = code.where(page.index.isin(selected.index), -1)
+                suppliers.append(pd.util.hash_pandas_object(page['supplier_id'], index=False).to_numpy())
+                codes.append(code.to_numpy(np.int32))
+                amounts.append(page['amount_paid'].to_numpy(np.float64))
+
+        with metrics.stage('analyze'):
+            code = np.concatenate(codes) if codes else np.empty(0, np.int32)
+            amount = np.nan_to_num(np.concatenate(amounts)) if amounts else np.empty(0)
+            kept = code >= 0
+            if self.__remove_rollbacks and suppliers:
+                kept &= ~pd.Series(np.concatenate(suppliers)).duplicated(keep=False).to_numpy()
+            # Counts and amounts by transaction type (rows) and status (columns)
+            counts = np.bincount(code[kept], minlength=len(types) * width).reshape(len(types), width)
+            sums = np.bincount(code[kept], weights=amount[kept], minlength=len(types) * width).reshape(len(types), width)
+
+            sale_types = [index for kind, index in types.items() if kind not in NON_SALES_TYPES]
+            groups = {}
+            for status, value in STATUS_GROUPS.items():
+                count = counts.sum(axis=1) if value is None else counts[:, statuses[value]]
+                total = sums.sum(axis=1) if value is None else sums[:, statuses[value]]
+                deposit = types.get(DEPOSIT_TYPE)
+                groups[status] = {
+                    "transaction_count": int(count.sum()),
+                    "deposit_count": int(count[deposit]) if deposit is not None else 0,
+                    "total_deposits": float(total[deposit]) if deposit is not None else 0.0,
+                    "sale_count": int(count[sale_types].sum()),
+                    "total_amount": float(total[sale_types].sum()),
+                    "totals": {key: float(total[types[transaction_type]]) if transaction_type in types else 0.0 for transaction_type, key in SALES_TOTALS.items()},
+                }
+        return groups
+
+def parse_dates(table: pd.DataFrame) -> pd.Series:
+    """
+    Returns the dates of a table as timestamps, dates that cannot be read are NaT. Tables built by
+    `PdfExtractor` already have them, other tables are parsed from the `date` column.
+    """
+    if TIMESTAMP_COLUMN in table:
+        return table[TIMESTAMP_COLUMN]
+    return pd.to_datetime(table['date'], dayfirst=True, errors='coerce')
+
+def filter_transactions(
+    table: pd.DataFrame,
+    transaction_type: Optional[str] = None,
+    supplier_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Selects the transactions matching every given filter with a single vectorized mask
+
+    Args:
+        table (pd.DataFrame): A table of transactions
+        transaction_type (Optional[str]): Type of the transactions
+        supplier_id (Optional[str]): Supplier of the transactions
+        date_from (Optional[datetime]): First date of the transactions, inclusive
+        date_to (Optional[datetime]): Last date of the transactions, inclusive
+        amount_min (Optional[float]): Minimum amount paid, inclusive
+        amount_max (Optional[float]): Maximum amount paid, inclusive
+
+    Returns:
+        pd.DataFrame: The matching transactions, or the same table if no filter was given
+    """
+    selected = pd.Series(True, index=table.index)
+    if transaction_type is not None:
+        selected &= table['transaction_type'] == transaction_type
+    if supplier_id is not None:
+        selected &= table['supplier_id'] == supplier_id
+    if date_from is not None or date_to is not None:
+        dates = parse_dates(table)
+        if date_from is not None:
+            selected &= dates >= date_from
+        if date_to is not None:
+            selected &= dates <= date_to
+    if amount_min is not None:
+        selected &= table['amount_paid'] >= amount_min
+    if amount_max is not None:
+        selected &= table['amount_paid'] <= amount_max
+    return table if selected.all() else table[selected]
+
+def string_values(column: pd.Series) -> List[str]:
+    """
+    Values of a string field of `TransactionData`. The responses built from the table skip the
+    validation of the model, so ids read as numbers become strings and empty cells empty strings
+    """
+    values = column.tolist()
+    cells = column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else column
+    if not column.hasnans and pd.api.types.infer_dtype(cells, skipna=True) == 'string':
+        return values
+    return [value if isinstance(value, str) else '' if pd.isna(value) else str(value) for value in values]
+
+def records(table: pd.DataFrame) -> List[Dict]:
+    """Converts the rows of a table into dictionaries, only done for the rows that are returned"""
+    with metrics.stage('records'):
+        # Zipping the columns as Python lists is several times faster than `DataFrame.to_dict`
+        columns = [column for column in COLUMNS if column in table]
+        values = (string_values(table[column]) if column in STRING_COLUMNS else table[column].tolist() for column in columns)
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+def extract(file_path: str) -> pd.DataFrame:
+    """Extracts the table of the statement, meant to be executed in a worker process"""
+    return PdfExtractor(file_path).read_pdf(return_format='dataframe')
+
+def extract_pages(file_path: str, pages: List[int]) -> Union[list, str]:
+    """Reads the tables of a page range, meant to be executed in a worker process"""
+    try:
+        return PdfExtractor(file_path).read_pages(pages)
+    except Exception:
+        return READ_ERROR
+
+def merge_pages(chunks: List[list]) -> Union[pd.DataFrame, str]:
+    """Builds the table of the statement from the tables of its page ranges, meant to be executed in a worker process"""
+    try:
+        # Rollback pairs split across ranges are removed later by the analyzer over the merged table
+        return PdfExtractor.from_pages([page for chunk in chunks for page in chunk])
+    except Exception:
+        return READ_ERROR
+
+def count_pages(file_path: str) -> int:
+    """Returns the number of pages of the PDF, or 0 if it cannot be read"""
+    try:
+        return PdfExtractor(file_path).page_count()
+    except Exception:
+        return 0
+
+def analyze(file_path: str, table: Optional[pd.DataFrame], method: str, filters: Optional[Dict[str, Any]] = None, streaming: bool = False, **kwargs) -> Tuple[Optional[pd.DataFrame], Any]:
+    """
+    Runs an analysis of the statement, meant to be executed in a worker process
+
+    Args:
+        file_path (str): Path to the PDF file
+        table (Optional[pd.DataFrame]): Table already extracted from the PDF, if any
+        method (str): Name of the `PdfAnalyzer` method to call
+        filters (Optional[Dict[str, Any]]): Arguments of `filter_transactions`
+        streaming (bool): Whether to total the file page by page without keeping its table
+        **kwargs: Arguments of the method
+
+    Returns:
+        Tuple[Optional[pd.DataFrame], Any]: The table extracted from the PDF, or None if it
+        was given or the file was read page by page, and the result of the method
+    """
+    analyzer = PdfAnalyzer(file_path, table=table, filters=filters, streaming=streaming)
+    result = getattr(analyzer, method)(**kwargs)
+    return (analyzer.table if table is None else None), result
+
+def analyze_many(table: pd.DataFrame, methods: List[str], filters: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+    """
+    Runs several analyses of an extracted table with one analyzer, meant to be executed in a worker
+    process. The table is sent to the worker once and its transactions are totaled once for all of them.
+
+    Args:
+        table (pd.DataFrame): Table extracted from the PDF
+        methods (List[str]): Names of the `PdfAnalyzer` methods to call
+        filters (Optional[Dict[str, Any]]): Arguments of `filter_transactions`
+        **kwargs: Arguments of every method
+
+    Returns:
+        Dict[str, Any]: The result of every method, by name
+    """
+    analyzer = PdfAnalyzer(table=table, filters=filters)
+    return {method: getattr(analyzer, method)(**kwargs) for method in methods}
+
+def analyze_batch(tables: List[pd.DataFrame], transaction_status: str, filters: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Analyzes several statements and their merged transactions, meant to be executed in a worker process.
+    Rollbacks are removed per statement, then a transaction repeated in overlapping statements
+    is only counted in the first one that contains it.
+
+    Args:
+        tables (List[pd.DataFrame]): Tables extracted from the statements, in upload order
+        transaction_status (str): The status of the transactions to total
+        filters (Optional[Dict[str, Any]]): Arguments of `filter_transactions`
+
+    Returns:
+        Tuple[Dict[str, Any], List[Dict[str, Any]]]: The summary of the merged transactions, and for
+        every statement its summary, its transactions and how many were already in previous statements
+    """
+    seen = set()
+    merged = []
+    breakdown = []
+    for table in tables:
+        analyzer = PdfAnalyzer(table=table, filters=filters)
+        transactions = analyzer.transactions('all')
+        ids = transactions['id'].astype(str)
+        new = ~ids.isin(seen) & ~ids.duplicated()
+        seen.update(ids[new])
+        merged.append(transactions[new])
+        breakdown.append({
+            "transactions": len(transactions),
+            "duplicates": int((~new).sum()),
+            "summary": analyzer.summary(transaction_status),
+        })
+    table = pd.concat(merged, ignore_index=True) if merged else pd.DataFrame(columns=COLUMNS)
+    return PdfAnalyzer(table=table, remove_rollbacks=False).summary(transaction_status), breakdown
+
+async def analyze_pdfs(pdfs: List[Tuple[str, str]], transaction_status: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Extracts several statements concurrently, `BATCH_CONCURRENCY` at a time, and analyzes
+    them together in the extraction pool. A statement that cannot be read is reported
+    without failing the others.
+
+    Args:
+        pdfs (List[Tuple[str, str]]): Path and SHA-256 digest of every statement
+        transaction_status (str): The status of the transactions to total
+        filters (Optional[Dict[str, Any]]): Arguments of `filter_transactions`
+
+    Returns:
+        Dict[str, Any]: The summary of the merged transactions, the transactions repeated across
+        statements and, for every statement, its breakdown or its error
+
+    Raises:
+        PoolSaturatedError: If every worker is busy and the wait queue is full
+    """
+    # The batch is admitted as a whole, its statements wait for a worker instead of being rejected
+    if extraction_pool.saturated:
+        raise PoolSaturatedError()
+
+    slots = asyncio.Semaphore(max(settings.BATCH_CONCURRENCY, 1))
+
+    async def read(file_path: str, digest: str) -> Union[pd.DataFrame, str]:
+        async with slots:
+            try:
+                return await extract_pdf(file_path, digest, reject_when_full=False)
+            except Exception as e:
+                return str(e)
+
+    tables = await asyncio.gather(*(read(file_path, digest) for file_path, digest in pdfs))
+    # `read_pdf` returns an error message instead of a table when it fails
+    parsed = [table for table in tables if isinstance(table, pd.DataFrame)]
+    summary, breakdown = await extraction_pool.run(
+        partial(analyze_batch, parsed, transaction_status, filters), reject_when_full=False
+    )
+
+    results = iter(breakdown)
+    files = [next(results) if isinstance(table, pd.DataFrame) else {"error": table} for table in tables]
+    return {
+        "summary": summary,
+        "duplicates": sum(file.get("duplicates", 0) for file in files),
+        "files": files,
+    }
+
+async def analyze_pdf(file_path: str, method: str, digest: Optional[str] = None, **kwargs) -> Any:
+    """
+    Runs an analysis of the statement in the extraction pool without blocking the event loop.
+    Statements already parsed are taken from the parse cache without running tabula. The summary
+    of a statement of at least `STREAMING_MIN_PAGES` pages is totaled page by page, its table
+    is neither kept in memory nor cached.
+
+    Args:
+        file_path (str): Path to the PDF file
+        method (str): Name of the `PdfAnalyzer` method to call
+        digest (Optional[str]): SHA-256 digest of the file, computed if not given
+        **kwargs: Arguments of the method
+
+    Returns:
+        Any: The result of the method
+
+    Raises:
+        PoolSaturatedError: If every worker is busy and the wait queue is full
+    """
+    if digest is None:
+        digest = await asyncio.to_thread(file_digest, file_path)
+    table = parse_cache.get(digest)
+    if table is None and method == 'summary' and await is_long(file_path):
+        _, result = await extraction_pool.run(partial(analyze, file_path, None, method, streaming=True, **kwargs))
+        return result
+    if table is None:
+        table = await extract_parallel(file_path)
+        if isinstance(table, str):
+            # The error message of a statement that could not be read
+            raise ValueError(table)
+        if isinstance(table, pd.DataFrame):
+            parse_cache.put(digest, table)
+    extracted, result = await extraction_pool.run(partial(analyze, file_path, table, method, **kwargs))
+    # `read_pdf` returns an error message instead of a table when it fails
+    if isinstance(extracted, pd.DataFrame):
+        parse_cache.put(digest, extracted)
+    return result
+
+async def is_long(file_path: str) -> bool:
+    """Whether the statement has at least `STREAMING_MIN_PAGES` pages, always False when it is 0"""
+    if settings.STREAMING_MIN_PAGES <= 0:
+        return False
+    return await asyncio.to_thread(count_pages, file_path) >= settings.STREAMING_MIN_PAGES
+
+async def extract_pdf(file_path: str, digest: Optional[str] = None, reject_when_full: bool = True) -> pd.DataFrame:
+    """
+    Extracts the table of the statement in the extraction pool, or takes it from the parse cache
+
+    Args:
+        file_path (str): Path to the PDF file
+        digest (Optional[str]): SHA-256 digest of the file, computed if not given
+        reject_when_full (bool): Whether to fail instead of waiting when the pool queue is full
+
+    Returns:
+        pd.DataFrame: The table of the statement, or an error message if it could not be read
+
+    Raises:
+        PoolSaturatedError: If every worker is busy and the wait queue is full
+    """
+    if digest is None:
+        digest = await asyncio.to_thread(file_digest, file_path)
+    table = parse_cache.get(digest)
+    if table is None:
+        table = await extract_parallel(file_path, reject_when_full)
+        if table is None:
+            table = await extraction_pool.run(partial(extract, file_path), reject_when_full=reject_when_full)
+        if isinstance(table, pd.DataFrame):
+            parse_cache.put(digest, table)
+    return table
+
+async def extract_parallel(file_path: str, reject_when_full: bool = True) -> Optional[Union[pd.DataFrame, str]]:
+    """
+    Extracts the table of a long statement by reading ranges of `PAGE_CHUNK_SIZE` pages
+    in parallel in the extraction pool and merging them in page order
+
+    Args:
+        file_path (str): Path to the PDF file
+        reject_when_full (bool): Whether to fail instead of waiting when the pool queue is full
+
+    Returns:
+        Optional[Union[pd.DataFrame, str]]: The table of the statement, an error message if it could
+        not be read, or None if the statement is too short to be split
+
+    Raises:
+        PoolSaturatedError: If every worker is busy and the wait queue is full
+    """
+    chunk_size = settings.PAGE_CHUNK_SIZE
+    if chunk_size <= 0:
+        return None
+    page_count = await asyncio.to_thread(count_pages, file_path)
+    if page_count <= chunk_size:
+        return None
+    # The statement is admitted as a whole, its ranges wait for a worker instead of being rejected
+    if reject_when_full and extraction_pool.saturated:
+        raise PoolSaturatedError()
+
+    slots = asyncio.Semaphore(max(settings.PAGE_PARALLEL_WORKERS, 1))
+
+    async def read(pages: List[int]) -> Union[list, str]:
+        async with slots:
+            return await extraction_pool.run(partial(extract_pages, file_path, pages), reject_when_full=False)
+
+    ranges = [list(range(start, min(start + chunk_size, page_count + 1))) for start in range(1, page_count + 1, chunk_size)]
+    chunks = await asyncio.gather(*(read(pages) for pages in ranges))
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            return chunk
+    # Concatenating and converting the pages of a long statement would block the event loop
+    return await extraction_pool.run(partial(merge_pages, chunks), reject_when_full=False)
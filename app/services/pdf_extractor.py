@@ -1,18 +1,50 @@
-import tabula
-import re
+import logging
 import os
+import time
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterator, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+from .extraction_engines import get_engine, page_count
+
+logger = logging.getLogger(__name__)
+
+# Columns of the transactions table, in the order they appear in the statement
+COLUMNS = [
+    "id",
+    "date",
+    "amount_paid",
+    "currency",
+    "supplier_id",
+    "discount",
+    "amount_due",
+    "transaction_type",
+    "transaction_status",
+    "payment_type",
+]
+NUMERIC_COLUMNS = ["amount_paid", "discount", "amount_due"]
+# Columns that are strings in `TransactionData` and in the database
+STRING_COLUMNS = [column for column in COLUMNS if column not in NUMERIC_COLUMNS]
+# Columns with a few distinct values, stored as categories so the rows share one copy of every string
+CATEGORY_COLUMNS = ["currency", "transaction_type", "transaction_status", "payment_type"]
+# Dates parsed once when the table is built, the cached table keeps them for filters, pagination and analytics
+TIMESTAMP_COLUMN = "timestamp"
+
+READ_ERROR = 'Error al leer los datos, verifique que sea un archivo correcto'
 
 class PdfExtractor:
     """Extracts table information from PDF files"""
 
-    def __init__(self, file_path: str) -> None:
+    def __init__(self, file_path: str, engine: Optional[str] = None) -> None:
         """ Initializes a PdfExtractor object that reads a PDF file and extracts 
         information from its tables.
         Args:
             - file_path: The path to the PDF file to be processed.
+            - engine: Name of the extraction engine, by default `EXTRACTION_ENGINE`.
         Raises:
             - TypeError: If the file path is not a string.
-            - ValueError: If the file path is empty or does not have a .pdf extension.
+            - ValueError: If the file path is empty or does not have a .pdf extension, or the engine does not exist.
             - FileNotFoundError: If the file does not exist.
         """
         if not isinstance(file_path, str):
@@ -25,76 +57,199 @@ class PdfExtractor:
             raise ValueError("El archivo debe tener una extensión .pdf.")
 
         self.__file_path = file_path
+        self.__engine = get_engine(engine or settings.EXTRACTION_ENGINE)
+        shadow = settings.EXTRACTION_SHADOW_ENGINE
+        self.__shadow = get_engine(shadow) if shadow and shadow != self.__engine.name else None
 
-    def __dataframe_to_list(self, df) -> list:
-        """Converts a Pandas DataFrame object into a list of lists in Python."""
-        return [p.values.tolist() for p in list(df)]
-
-    def __flatten_pages(self, pages: list) -> list:
-        """This function flattens a list of pages, returning a list of lines."""
-        lines = []
-        for page in pages:
-            for line in page:
-                if self.__line_important(line):
-                    lines.append(line)
-        return lines
-
-    def __line_important(self, line) -> bool:
-        """Filter line to obtain only lines with important content"""
-        pattern = '^(nan)+$'
-        txt = ''.join(str(cell) for cell in line)
-        return False if re.match(pattern, txt) else True
-
-    def __convert_to_dict(self, data: list) -> list[dict]:
+    def page_count(self) -> int:
+        """Returns the number of pages of the PDF file"""
+        return page_count(self.__file_path)
+
+    def read_pages(self, pages="all") -> list:
+        """Runs the extraction engine over the given pages and returns one DataFrame per table found.
+        If a shadow engine is configured, it reads the same pages and its differences are reported.
+
+        Args:
+            pages: Pages to read, 'all' or a list of page numbers starting at 1.
         """
-        Converts a list of rows into a list of dictionaries with structured keys.
+        start = time.perf_counter()
+        tables = self.__engine.read_pages(self.__file_path, pages)
+        elapsed = time.perf_counter() - start
+        metrics.record(self.__engine.name, elapsed)
+        if self.__shadow is not None:
+            self.__compare_shadow(tables, pages, elapsed)
+        return tables
+
+    def iter_rows(self, pages="all", chunk_pages: int = 10) -> Iterator[pd.DataFrame]:
+        """Reads the PDF a few pages at a time and yields the transactions of every `chunk_pages` pages
+        as a DataFrame with the types of a transaction, so memory does not grow with the number of pages.
+        The shadow engine is not run, it would need the whole table to compare.
 
         Args:
-            data (list): A list of rows, where each row is a list containing payment-related information.
+            pages: Pages to read, 'all' or a list of page numbers starting at 1.
+            chunk_pages (int): Pages converted together, converting every page alone is slower.
+        """
+        elapsed = 0.0
+        pages_read = rows = 0
+        tables = self.__engine.iter_pages(self.__file_path, pages, batch=chunk_pages)
+        chunk = []
+        while True:
+            start = time.perf_counter()
+            page = next(tables, None)
+            elapsed += time.perf_counter() - start
+            if page is not None:
+                chunk.append(page)
+                pages_read += 1
+            if chunk and (page is None or len(chunk) >= chunk_pages):
+                table = self.__table(chunk)
+                chunk = []
+                rows += len(table)
+                if len(table):
+                    yield table
+            if page is None:
+                break
+        metrics.record(self.__engine.name, elapsed)
+        metrics.statement(pages_read, rows)
+
+    def __compare_shadow(self, tables: list, pages, elapsed: float) -> None:
+        """Reads the pages with the shadow engine and logs how its transactions differ, without failing the extraction"""
+        shadow = self.__shadow
+        try:
+            start = time.perf_counter()
+            shadow_tables = shadow.read_pages(self.__file_path, pages)
+            shadow_elapsed = time.perf_counter() - start
+            metrics.record(f'shadow_{shadow.name}', shadow_elapsed)
+            report = compare_tables(self.__table(tables), self.__table(shadow_tables))
+        except Exception as e:
+            logger.warning(f'El motor {shadow.name} no pudo leer {self.__file_path}: {e}')
+            return
+
+        metrics.shadow(shadow.name, {result: report[result] for result in ('matched', 'different', 'missing', 'extra')})
+        message = (
+            f'Motor {self.__engine.name} ({elapsed:.3f} s) frente a {shadow.name} ({shadow_elapsed:.3f} s) '
+            f'en las páginas {pages}: {report["matched"]} iguales, {report["different"]} distintas, '
+            f'{report["missing"]} ausentes y {report["extra"]} sobrantes de {report["rows"]}'
+        )
+        if report['different'] or report['missing'] or report['extra']:
+            logger.warning(f'{message}. {"; ".join(report["examples"])}')
+        else:
+            logger.info(message)
+
+    @classmethod
+    def __table(cls, pages: list) -> pd.DataFrame:
+        """Builds the table of the pages like `from_pages`, without recording metrics"""
+        return cls.__convert_types(cls.__concat_pages(pages))
+
+    @staticmethod
+    def __concat_pages(pages: list) -> pd.DataFrame:
+        """Concatenates the tables of every page into one DataFrame, dropping the lines without content"""
+        if not pages:
+            return pd.DataFrame(columns=COLUMNS)
+        table = pd.concat([page.set_axis(COLUMNS, axis=1) for page in pages], ignore_index=True)
+        return table.dropna(how='all').reset_index(drop=True)
+
+    @staticmethod
+    def __convert_types(table: pd.DataFrame) -> pd.DataFrame:
+        """Converts the columns of the table to the types of a transaction"""
+        table["supplier_id"] = table["supplier_id"].astype(str)
+        table[NUMERIC_COLUMNS] = table[NUMERIC_COLUMNS].astype(float)
+        table[CATEGORY_COLUMNS] = table[CATEGORY_COLUMNS].astype('category')
+        table[TIMESTAMP_COLUMN] = pd.to_datetime(table["date"], dayfirst=True, errors='coerce')
+        return table
+
+    @classmethod
+    def from_pages(cls, pages: list, return_format="dataframe"):
+        """Builds the table from the DataFrames returned by `read_pages`, in page order.
+        Tables read from several page ranges give the same result as reading the whole file.
+
+        Args:
+        pages (list): The DataFrames of every page.
+        return_format (str): The format to return the data in, either 'list', 'dict' or 'dataframe'.
 
         Returns:
-            list[dict]: A list of dictionaries where each dictionary represents a transaction
+            A list of lists, a list of dictionaries or a DataFrame containing the data from the table.
         """
-        return [{
-            "id": row[0],
-            "date": row[1],
-            "amount_paid": row[2],
-            "currency": row[3],
-            "supplier_id": str(row[4]),
-            "discount": row[5],
-            "amount_due": row[6],
-            "transaction_type": row[7],
-            "transaction_status": row[8],
-            "payment_type": row[9],
-        } for row in data]
-
-    def read_pdf(self, return_format="list") -> list:
+        assert return_format in ['list', 'dict', 'dataframe'], "El formato debe ser 'list', 'dict' o 'dataframe'"
+        with metrics.stage('concat'):
+            table = cls.__concat_pages(pages)
+        metrics.statement(len(pages), len(table))
+        if return_format == "list":
+            return table.values.tolist()
+        with metrics.stage('convert'):
+            table = cls.__convert_types(table)
+        if return_format == "dict":
+            with metrics.stage('records'):
+                return table[COLUMNS].to_dict('records')
+        return table
+
+    def read_pdf(self, return_format="list", pages="all"):
         """Reads the corresponding PDF file, extracts data from the tables on each page,
-        and returns the data either as a list of lists or a dictionary.
+        and returns the data either as a list of lists, a list of dictionaries or a DataFrame.
 
         Args:
-        return_format (str): The format to return the data in, either 'list' or 'dict'. Default is 'list'.
+        return_format (str): The format to return the data in, either 'list', 'dict' or 'dataframe'. Default is 'list'.
+        pages: Pages to read, 'all' or a list of page numbers starting at 1. Default is 'all'.
 
         Returns:
-            A list of lists or a dictionary containing the data from the table.
+            A list of lists, a list of dictionaries or a DataFrame containing the data from the table.
         """
         try:
             # Check if 'return_format' is valid
-            assert return_format in ['list', 'dict'], "El formato debe ser 'list' o 'dict'"
+            assert return_format in ['list', 'dict', 'dataframe'], "El formato debe ser 'list', 'dict' o 'dataframe'"
 
             # read PDF file from path
-            df = tabula.read_pdf(self.__file_path, pages='all', guess=True)
-            # convert dataframe to list
-            ls_all_pages = self.__dataframe_to_list(df)
-            # flatten list of pages
-            ls_lines = self.__flatten_pages(ls_all_pages)
-            if return_format == "dict":
-                return self.__convert_to_dict(ls_lines)
-            else:
-                return ls_lines
+            return self.from_pages(self.read_pages(pages), return_format)
         except FileNotFoundError as e:
             return f'No se ha encontrado el archivo especificado en la ruta "{self.__file_path}".'
         except AssertionError as e:
             return str(e)
         except Exception:
-            return 'Error al leer los datos, verifique que sea un archivo correcto'
\ No newline at end of file
+            return READ_ERROR
+
+def _normalized(table: pd.DataFrame) -> pd.DataFrame:
+    """Indexes the transactions by id, with the supplier ids that an engine read as floats written as integers"""
+    table = table[COLUMNS].copy()
+    table['id'] = table['id'].astype(str)
+    table['supplier_id'] = table['supplier_id'].astype(str).str.replace(r'\.0$', '', regex=True)
+    return table.drop_duplicates('id').set_index('id')
+
+def compare_tables(expected: pd.DataFrame, actual: pd.DataFrame, examples: int = 5) -> Dict[str, Any]:
+    """
+    Compares the transactions read from the same statement by two engines, matching them by id
+
+    Args:
+        expected (pd.DataFrame): Table of the engine in use
+        actual (pd.DataFrame): Table of the engine being evaluated
+        examples (int): Maximum number of differences described of every kind
+
+    Returns:
+        Dict[str, Any]: The transactions of `expected`, how many are equal in both tables, differ in
+        some column, are only in `expected` (missing) or only in `actual` (extra), and a description
+        of the first differences
+    """
+    expected, actual = _normalized(expected), _normalized(actual)
+    common = expected.index.intersection(actual.index, sort=False)
+    left, right = expected.loc[common], actual.loc[common]
+    equal = pd.DataFrame({
+        column: np.isclose(left[column], right[column], equal_nan=True) if column in NUMERIC_COLUMNS
+        else left[column].astype(object).fillna('').astype(str).values == right[column].astype(object).fillna('').astype(str).values
+        for column in left.columns
+    }, index=common)
+    different = ~equal.all(axis=1)
+    missing = expected.index.difference(actual.index, sort=False)
+    extra = actual.index.difference(expected.index, sort=False)
+
+    descriptions = []
+    for transaction_id in common[different.values][:examples]:
+        columns = equal.columns[~equal.loc[transaction_id].values]
+        descriptions.append(f"{transaction_id}: " + ", ".join(f"{column} '{left.at[transaction_id, column]}' != '{right.at[transaction_id, column]}'" for column in columns))
+    descriptions += [f"{transaction_id}: ausente" for transaction_id in missing[:examples]]
+    descriptions += [f"{transaction_id}: sobrante" for transaction_id in extra[:examples]]
+    return {
+        "rows": len(expected),
+        "matched": int((~different).sum()),
+        "different": int(different.sum()),
+        "missing": len(missing),
+        "extra": len(extra),
+        "examples": descriptions,
+    }
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import os
+import time
+from functools import partial
+from typing import Optional
+import pandas as pd
+from app.core.hashing import password_hasher
+from .extraction_pool import extraction_pool
+from .pdf_analyzer import analyze
+
+logger = logging.getLogger(__name__)
+
+# Statement of two short pages generated with `scripts.statement_generator`
+WARMUP_PDF = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "warmup.pdf")
+
+class StartupState:
+    """Whether the process finished starting, reported by the readiness endpoint"""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.startup_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.__started = time.perf_counter()
+
+    def begin(self) -> None:
+        """Marks the start of the lifespan hook"""
+        self.ready = False
+        self.__started = time.perf_counter()
+
+    def mark_ready(self) -> None:
+        self.startup_seconds = time.perf_counter() - self.__started
+        self.ready = True
+
+    def mark_stopping(self) -> None:
+        """Stops reporting ready while the process shuts down"""
+        self.ready = False
+
+async def warm_up() -> float:
+    """
+    Parses the bundled statement in every extraction worker and hashes a password in every
+    hashing worker at the same time, so tabula, pandas, bcrypt and the classes of the JVM are
+    loaded before the first request. The result is not kept in the parse cache.
+
+    Returns:
+        float: Seconds the warm-up took
+    """
+    start = time.perf_counter()
+    parses = [
+        extraction_pool.run(partial(analyze, WARMUP_PDF, None, 'summary'), reject_when_full=False)
+        for _ in range(extraction_pool.concurrency)
+    ]
+    hashes = [password_hasher.hash("precalentamiento") for _ in range(password_hasher.concurrency)]
+    results = await asyncio.gather(*parses, *hashes, return_exceptions=True)
+    for result in results[:len(parses)]:
+        # A statement that cannot be read gives an error message instead of a table
+        if isinstance(result, Exception) or not isinstance(result[0], pd.DataFrame):
+            logger.warning(f'El precalentamiento no pudo leer el estado de cuenta de prueba: {result if isinstance(result, Exception) else result[1]}')
+            break
+    for result in results[len(parses):]:
+        if isinstance(result, Exception):
+            logger.warning(f'El precalentamiento no pudo calcular el hash de prueba: {result}')
+            break
+    return time.perf_counter() - start
+
+startup_state = StartupState()
@@ -0,0 +1,205 @@
+from datetime import datetime
+from typing import Iterator, List, Optional
+import pandas as pd
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func, insert, and_, or_
+from app.db.database import engine
+from app.db.models import Statement, StatementTransaction, Transaction
+from app.schemas.pdf import PdfTransactionsResponse, PdfDepositsResponse, PdfSalesResponse
+from app.schemas.statement import StatementRead, StatementIngestResponse, StatementQuery
+from app.schemas.transaction import TransactionData
+from app.services.export import EXPORT_CHUNK_SIZE
+from app.services.pdf_extractor import COLUMNS, STRING_COLUMNS
+from app.services.pagination import encode_cursor, decode_cursor, uses_cursor
+from app.services.pdf_analyzer import PdfAnalyzer, parse_dates, STATUS_GROUPS, DEPOSIT_TYPE, NON_SALES_TYPES, SALES_TOTALS
+
+# Dialects whose INSERT can skip the rows that already exist
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+def insert_ignoring_conflicts(model):
+    """
+    INSERT of `model` that skips the rows whose key already exists, so concurrent ingests of the
+    same transactions do not fail. Other dialects get a plain INSERT
+    """
+    dialect_insert = UPSERT_INSERTS.get(engine.dialect.name)
+    return insert(model) if dialect_insert is None else dialect_insert(model).on_conflict_do_nothing()
+
+def ingest_statement(user_id: int, digest: str, filename: Optional[str], table: pd.DataFrame) -> StatementIngestResponse:
+    """
+    Stores the transactions of a parsed statement, skipping those already stored for the user.
+    Every transaction of the statement is linked to it, also the ones stored from an earlier statement.
+
+    Args:
+        user_id (int): Id of the user that uploaded the statement
+        digest (str): SHA-256 digest of the PDF file
+        filename (Optional[str]): Name of the uploaded file
+        table (pd.DataFrame): Table extracted from the PDF
+
+    Returns:
+        StatementIngestResponse: The stored statement and how many transactions were inserted or skipped
+    """
+    rows = PdfAnalyzer(table=table).transactions('all') # table without rollback
+    rows = rows.assign(timestamp=parse_dates(rows))
+    rows = rows.drop_duplicates(subset='id')
+    # The string columns are NOT NULL, empty cells of the statement are stored as empty strings
+    rows = rows.assign(**{column: rows[column].astype(object).fillna('').astype(str) for column in STRING_COLUMNS})
+    # Sorted so concurrent ingests of overlapping statements lock the rows in the same order
+    rows = rows.sort_values('id')
+
+    with Session(engine) as session:
+        # The statement is inserted first, a concurrent ingest of the same file waits for it and then skips it
+        created = session.exec(insert_ignoring_conflicts(Statement).values(
+            user_id=user_id, digest=digest, filename=filename, transactions=len(rows), uploaded_at=datetime.utcnow()
+        ))
+        statement = session.exec(
+            select(Statement).where(Statement.user_id == user_id, Statement.digest == digest)
+        ).one()
+        if not created.rowcount:
+            session.rollback()
+            return StatementIngestResponse(statement=StatementRead.model_validate(statement), inserted=0, duplicates=len(rows))
+
+        values = [
+            {
+                **row,
+                "timestamp": None if pd.isna(row["timestamp"]) else row["timestamp"].to_pydatetime(),
+                "user_id": user_id,
+                "statement_id": statement.id,
+            }
+            for row in rows[COLUMNS + ['timestamp']].to_dict('records')
+        ]
+        if values:
+            session.exec(insert_ignoring_conflicts(Transaction), params=values)
+            session.exec(insert(StatementTransaction), params=[
+                {"statement_id": statement.id, "user_id": user_id, "transaction_id": value["id"]} for value in values
+            ])
+        # Only the transactions inserted now have the id of this statement
+        inserted = session.exec(select(func.count()).select_from(Transaction).where(
+            Transaction.user_id == user_id, Transaction.statement_id == statement.id
+        )).one()
+        session.commit()
+        session.refresh(statement)
+        return StatementIngestResponse(
+            statement=StatementRead.model_validate(statement), inserted=inserted, duplicates=len(rows) - inserted
+        )
+
+def list_statements(user_id: int) -> List[StatementRead]:
+    """Returns the statements stored by the user, the most recent first"""
+    with Session(engine) as session:
+        statements = session.exec(
+            select(Statement).where(Statement.user_id == user_id).order_by(Statement.uploaded_at.desc())
+        ).all()
+        return [StatementRead.model_validate(statement) for statement in statements]
+
+def _conditions(user_id: int, query: StatementQuery) -> list:
+    """Builds the filters of a query over the stored transactions"""
+    conditions = [Transaction.user_id == user_id]
+    if query.statement_id is not None:
+        # Statements stored before `StatementTransaction` existed only have the transactions first stored from them
+        conditions.append(or_(
+            Transaction.statement_id == query.statement_id,
+            Transaction.id.in_(select(StatementTransaction.transaction_id).where(
+                StatementTransaction.statement_id == query.statement_id, StatementTransaction.user_id == user_id
+            )),
+        ))
+    if query.date_from is not None:
+        conditions.append(Transaction.timestamp >= query.date_from)
+    if query.date_to is not None:
+        conditions.append(Transaction.timestamp <= query.date_to)
+    if query.transaction_type is not None:
+        conditions.append(Transaction.transaction_type == query.transaction_type)
+    if query.supplier_id is not None:
+        conditions.append(Transaction.supplier_id == query.supplier_id)
+    if query.amount_min is not None:
+        conditions.append(Transaction.amount_paid >= query.amount_min)
+    if query.amount_max is not None:
+        conditions.append(Transaction.amount_paid <= query.amount_max)
+    status = STATUS_GROUPS[query.status]
+    if status:
+        conditions.append(Transaction.transaction_status == status)
+    return conditions
+
+def _after(cursor: str):
+    """Condition selecting the transactions that follow the cursor in the (timestamp, id) ordering"""
+    timestamp, transaction_id = decode_cursor(cursor)
+    if timestamp is None:
+        return or_(Transaction.timestamp.is_not(None), and_(Transaction.timestamp.is_(None), Transaction.id > transaction_id))
+    return or_(Transaction.timestamp > timestamp, and_(Transaction.timestamp == timestamp, Transaction.id > transaction_id))
+
+def _page(session: Session, conditions: list, query: StatementQuery) -> dict:
+    """
+    Returns the fields of the response for the requested page, or all transactions if there is no page.
+    Pages requested by cursor use the timestamp index instead of counting and skipping the previous rows.
+    """
+    statement = select(Transaction).where(*conditions).order_by(Transaction.timestamp.asc().nulls_first(), Transaction.id)
+    page, limit = query.page, query.limit
+    if uses_cursor(limit, query.cursor, query.pagination):
+        if query.cursor is not None:
+            statement = statement.where(_after(query.cursor))
+        rows = session.exec(statement.limit(limit + 1)).all()
+        next_cursor = encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
+        return {
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "results": [TransactionData.model_validate(row, from_attributes=True) for row in rows[:limit]],
+        }
+
+    if page is None or limit is None:
+        rows = session.exec(statement).all()
+        return {"results": [TransactionData.model_validate(row, from_attributes=True) for row in rows]}
+
+    total = session.exec(select(func.count()).select_from(Transaction).where(*conditions)).one()
+    rows = session.exec(statement.offset((page - 1) * limit).limit(limit)).all()
+    return {
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "results": [TransactionData.model_validate(row, from_attributes=True) for row in rows],
+    }
+
+def query_transactions(user_id: int, query: StatementQuery) -> PdfTransactionsResponse:
+    """Returns the stored transactions matching the query"""
+    with Session(engine) as session:
+        return PdfTransactionsResponse(**_page(session, _conditions(user_id, query), query))
+
+def iter_transactions(user_id: int, query: StatementQuery) -> Iterator[pd.DataFrame]:
+    """
+    Yields the stored transactions matching the query in blocks of `EXPORT_CHUNK_SIZE` rows,
+    fetched from the database as they are consumed. Pagination is ignored.
+    """
+    statement = (
+        select(*[getattr(Transaction, column) for column in COLUMNS])
+        .where(*_conditions(user_id, query))
+        .order_by(Transaction.timestamp.asc().nulls_first(), Transaction.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    with Session(engine) as session:
+        for rows in session.exec(statement).partitions():
+            yield pd.DataFrame.from_records(rows, columns=COLUMNS)
+
+def query_deposits(user_id: int, query: StatementQuery) -> PdfDepositsResponse:
+    """Returns the stored deposits matching the query and their total, computed by the database"""
+    conditions = _conditions(user_id, query) + [Transaction.transaction_type == DEPOSIT_TYPE]
+    with Session(engine) as session:
+        total_amount = session.exec(select(func.coalesce(func.sum(Transaction.amount_paid), 0)).where(*conditions)).one()
+        return PdfDepositsResponse(total_amount=total_amount, **_page(session, conditions, query))
+
+def query_sales(user_id: int, query: StatementQuery) -> PdfSalesResponse:
+    """Returns the stored sales matching the query and their totals by type, computed by the database"""
+    conditions = _conditions(user_id, query)
+    with Session(engine) as session:
+        by_type = dict(session.exec(
+            select(Transaction.transaction_type, func.sum(Transaction.amount_paid))
+            .where(*conditions)
+            .group_by(Transaction.transaction_type)
+        ).all())
+        conditions.append(Transaction.transaction_type.not_in(NON_SALES_TYPES))
+        total_amount = session.exec(select(func.coalesce(func.sum(Transaction.amount_paid), 0)).where(*conditions)).one()
+        profits = total_amount / 0.9 - total_amount
+        totals = {key: round(by_type.get(transaction_type) or 0, 2) for transaction_type, key in SALES_TOTALS.items()}
+        return PdfSalesResponse(
+            total_amount=round(total_amount, 2),
+            profits=round(profits, 2),
+            **totals,
+            **_page(session, conditions, query)
+        )
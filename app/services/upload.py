@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+import zipfile
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from app.core.config import settings
+from app.core.metrics import metrics
+
+CHUNK_SIZE = 1024 * 1024
+
+class UploadedPdf:
+    """PDF file uploaded by the user and stored temporarily on disk"""
+
+    def __init__(self, path: str, size: int, digest: str) -> None:
+        """
+        Args:
+            path (str): Path of the temporary file
+            size (int): Size of the file in bytes
+            digest (str): SHA-256 digest of the file content
+        """
+        self.path = path
+        self.size = size
+        self.digest = digest
+
+def upload_too_large(max_mb: Optional[int] = None) -> HTTPException:
+    """Error returned when an upload exceeds `max_mb`, by default `UPLOAD_MAX_MB`"""
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"El archivo excede el tamaño máximo permitido de {max_mb or settings.UPLOAD_MAX_MB} MB",
+    )
+
+@asynccontextmanager
+async def save_upload(file: UploadFile, max_mb: Optional[int] = None) -> AsyncIterator[UploadedPdf]:
+    """
+    Copies an uploaded file to `UPLOAD_DIR` in fixed-size chunks, hashing it along the way.
+    The temporary file is deleted on exit, whether the request succeeded or failed.
+
+    Args:
+        file (UploadFile): The uploaded file
+        max_mb (Optional[int]): Maximum size of the file, by default `UPLOAD_MAX_MB`
+
+    Yields:
+        UploadedPdf: The file stored on disk
+
+    Raises:
+        HTTPException: If the file exceeds the maximum size
+    """
+    max_mb = max_mb or settings.UPLOAD_MAX_MB
+    max_bytes = max_mb * 1024 * 1024
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=settings.UPLOAD_DIR)
+    try:
+        with metrics.stage('upload'), os.fdopen(fd, 'wb') as temp_pdf:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise upload_too_large(max_mb)
+                sha256.update(chunk)
+                temp_pdf.write(chunk)
+        yield UploadedPdf(path, size, sha256.hexdigest())
+    finally:
+        os.remove(path)
+
+def keep_upload(pdf: UploadedPdf) -> str:
+    """
+    Creates a second link to an uploaded file so it outlives the request,
+    the caller becomes responsible for deleting it
+
+    Args:
+        pdf (UploadedPdf): The file stored on disk
+
+    Returns:
+        str: Path of the new link
+    """
+    path = os.path.join(os.path.dirname(pdf.path), f"job-{uuid.uuid4().hex}.pdf")
+    os.link(pdf.path, path)
+    return path
+
+def too_many_files() -> HTTPException:
+    """Error returned when a batch has more than `BATCH_MAX_FILES` statements"""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Se pueden procesar como máximo {settings.BATCH_MAX_FILES} estados de cuenta a la vez",
+    )
+
+def remove_files(pdfs: List[Tuple[str, UploadedPdf]]) -> None:
+    """Deletes the files extracted from an archive"""
+    for _, pdf in pdfs:
+        if os.path.exists(pdf.path):
+            os.remove(pdf.path)
+
+def is_statement(info: zipfile.ZipInfo) -> bool:
+    """Whether a member of a ZIP archive is a PDF file to process"""
+    return not info.is_dir() and os.path.basename(info.filename).lower().endswith('.pdf') and not info.filename.startswith('__MACOSX/')
+
+def count_statements(files: List[UploadFile]) -> int:
+    """
+    Counts the statements of a batch from the uploads received by the server, without storing them:
+    one per PDF file and one per PDF file inside a ZIP archive, as `save_batch` expands them
+
+    Args:
+        files (List[UploadFile]): The uploaded PDF files or ZIP archives
+
+    Returns:
+        int: Number of statements, at most `BATCH_MAX_FILES`
+    """
+    count = 0
+    for file in files:
+        try:
+            if zipfile.is_zipfile(file.file):
+                with zipfile.ZipFile(file.file) as archive:
+                    count += sum(1 for info in archive.infolist() if is_statement(info))
+            else:
+                count += 1
+        except zipfile.BadZipFile:
+            count += 1
+        finally:
+            file.file.seek(0)
+    return min(count, settings.BATCH_MAX_FILES)
+
+def extract_zip(zip_path: str, max_files: int) -> List[Tuple[str, UploadedPdf]]:
+    """
+    Copies the PDF files of a ZIP archive to `UPLOAD_DIR` in fixed-size chunks, hashing them along the way.
+    Sizes are counted while decompressing instead of trusting the archive headers.
+
+    Args:
+        zip_path (str): Path of the archive
+        max_files (int): Maximum number of PDF files the archive may contain
+
+    Returns:
+        List[Tuple[str, UploadedPdf]]: Name and stored file of every PDF, the caller deletes them
+
+    Raises:
+        HTTPException: If the archive has too many PDF files or one of them exceeds `UPLOAD_MAX_MB`
+    """
+    max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+    pdfs: List[Tuple[str, UploadedPdf]] = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                if not is_statement(info):
+                    continue
+                name = os.path.basename(info.filename)
+                if len(pdfs) >= max_files:
+                    raise too_many_files()
+                sha256 = hashlib.sha256()
+                size = 0
+                fd, path = tempfile.mkstemp(suffix=".pdf", dir=settings.UPLOAD_DIR)
+                pdfs.append((name, UploadedPdf(path, 0, '')))
+                with os.fdopen(fd, 'wb') as temp_pdf, archive.open(info) as member:
+                    while chunk := member.read(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise upload_too_large()
+                        sha256.update(chunk)
+                        temp_pdf.write(chunk)
+                pdfs[-1] = (name, UploadedPdf(path, size, sha256.hexdigest()))
+        return pdfs
+    except Exception:
+        remove_files(pdfs)
+        raise
+
+@asynccontextmanager
+async def save_batch(files: List[UploadFile]) -> AsyncIterator[List[Tuple[str, UploadedPdf]]]:
+    """
+    Stores every uploaded file on disk, expanding ZIP archives into the PDF files they contain.
+    Every stored file is deleted on exit.
+
+    Args:
+        files (List[UploadFile]): The uploaded PDF files or ZIP archives
+
+    Yields:
+        List[Tuple[str, UploadedPdf]]: Name and stored file of every statement, in upload order
+
+    Raises:
+        HTTPException: If there are more than `BATCH_MAX_FILES` statements or a file is too large
+    """
+    pdfs: List[Tuple[str, UploadedPdf]] = []
+    async with AsyncExitStack() as stack:
+        for file in files:
+            upload = await stack.enter_async_context(save_upload(file, max_mb=settings.BATCH_MAX_MB))
+            if await asyncio.to_thread(zipfile.is_zipfile, upload.path):
+                members = await asyncio.to_thread(extract_zip, upload.path, settings.BATCH_MAX_FILES - len(pdfs))
+                stack.callback(remove_files, members)
+                pdfs.extend(members)
+            else:
+                if upload.size > settings.UPLOAD_MAX_MB * 1024 * 1024:
+                    raise upload_too_large()
+                if len(pdfs) >= settings.BATCH_MAX_FILES:
+                    raise too_many_files()
+                pdfs.append((file.filename or f"archivo-{len(pdfs) + 1}.pdf", upload))
+        yield pdfs
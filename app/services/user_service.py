@@ -1,11 +1,29 @@
 from app.db.models import User
 from app.schemas.user import UserCreate, UserRead, UserLogin, Token
-from app.core.security import get_password_hash, verify_password, create_access_token
-from sqlmodel import Session, select
-from app.db.database import engine
-from fastapi import HTTPException
+from app.core.config import settings
+from app.core.hashing import password_hasher, HashingSaturatedError
+from app.core.security import create_access_token, get_user
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import async_engine
+from fastapi import HTTPException, status
 
-def register_user(user: UserCreate) -> UserRead:
+def hashing_busy_error() -> HTTPException:
+    """Error returned when there are too many passwords waiting to be hashed"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="El servidor está procesando demasiadas solicitudes de acceso. Inténtalo de nuevo más tarde",
+        headers={"Retry-After": str(settings.EXTRACTION_RETRY_AFTER_SECONDS)},
+    )
+
+async def save_user(db_user: User) -> User:
+    """Inserts or updates a user in the database through the async engine"""
+    async with AsyncSession(async_engine) as session:
+        session.add(db_user)
+        await session.commit()
+        await session.refresh(db_user)
+    return db_user
+
+async def register_user(user: UserCreate) -> UserRead:
     """
     Registers a new user in the system.
 
@@ -14,18 +32,22 @@ def register_user(user: UserCreate) -> UserRead:
 
     Returns:
         UserRead: A validated Pydantic model representing the stored user
+
+    Raises:
+        HTTPException: If the server is busy hashing other passwords
     """
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except HashingSaturatedError:
+        raise hashing_busy_error()
     db_user = User(username=user.username, full_name=user.full_name, hashed_password=hashed_password)
-    with Session(engine) as session:
-        session.add(db_user)
-        session.commit()
-        session.refresh(db_user)
+    db_user = await save_user(db_user)
     return UserRead.model_validate(db_user)
 
-def login_user(user: UserLogin) -> Token:
+async def login_user(user: UserLogin) -> Token:
     """
-    Authenticates a user by verifying their credentials and generates an access token
+    Authenticates a user by verifying their credentials and generates an access token.
+    If the stored hash was created with another bcrypt cost it is replaced.
 
     Args:
         user (UserLogin): Object containing the credentials
@@ -34,11 +56,19 @@ def login_user(user: UserLogin) -> Token:
         Token: A token object containing the access token and its type
     
     Raises:
-        HTTPException: If the credentials are incorrect or the user does not exist.
+        HTTPException: If the credentials are incorrect, the user does not exist or the server is busy
     """
-    with Session(engine) as session:
-        db_user = session.exec(select(User).where(User.username == user.username)).first()
-        if not db_user or not verify_password(user.password, db_user.hashed_password):
-            raise HTTPException(status_code=400, detail="Credenciales incorrectas")
-        access_token = create_access_token({"sub": db_user.username})
-        return Token(access_token=access_token, token_type='bearer')
\ No newline at end of file
+    db_user = await get_user(user.username)
+    if not db_user:
+        raise HTTPException(status_code=400, detail="Credenciales incorrectas")
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(user.password, db_user.hashed_password)
+    except HashingSaturatedError:
+        raise hashing_busy_error()
+    if not valid:
+        raise HTTPException(status_code=400, detail="Credenciales incorrectas")
+    if new_hash is not None:
+        db_user.hashed_password = new_hash
+        await save_user(db_user)
+    access_token = create_access_token({"sub": db_user.username})
+    return Token(access_token=access_token, token_type='bearer')
@@ -0,0 +1,114 @@
+"""
+Compares the memory taken by the transactions of a statement in every representation:
+a dict per row, the DataFrame with a Python string per cell and the DataFrame returned by
+`PdfExtractor`, that stores the repeated fields as categories.
+
+Also measures the size of the table pickled for the extraction workers, the time of the analyses
+and the peak memory of the summary of a PDF read whole or page by page (`streaming`).
+Without Java the PDF pages are the generated tables instead of being read by tabula.
+
+Usage:
+    python -m scripts.bench_memory --rows 10000 100000
+"""
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+import pandas as pd
+from scripts.statement_generator import generate_pages, write_pdf
+from app.services.pdf_analyzer import PdfAnalyzer
+from app.services.pdf_extractor import CATEGORY_COLUMNS, COLUMNS, PdfExtractor
+
+def allocated(build: Callable[[], object]) -> int:
+    """Returns the bytes still allocated by the value that `build` returns"""
+    tracemalloc.start()
+    try:
+        value = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del value
+    return size
+
+def peak(function: Callable[[], object]) -> int:
+    """Returns the most bytes allocated at once while `function` runs"""
+    tracemalloc.start()
+    try:
+        function()
+        _, size = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size
+
+def best_time(function: Callable[[], object], repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def measure_memory(rows: int) -> Dict[str, Dict[str, float]]:
+    """Measures every representation of a statement with `rows` transactions"""
+    pages = generate_pages(rows, max(rows // 40, 1))
+    table = PdfExtractor.from_pages([page.copy() for page in pages])
+    strings = table.astype({column: object for column in CATEGORY_COLUMNS})
+    results = {}
+    for name, build, value in (
+        ('dicts', lambda: table[COLUMNS].to_dict('records'), table[COLUMNS].to_dict('records')),
+        ('strings', lambda: strings.copy(), strings),
+        ('categories', lambda: table.copy(), table),
+    ):
+        results[name] = {
+            'memory': allocated(build),
+            'pickle': len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+        }
+        if isinstance(value, pd.DataFrame):
+            results[name]['summary'] = best_time(lambda: PdfAnalyzer(table=value).summary('all'))
+    return results
+
+def measure_streaming(rows: int, workdir: str) -> Dict[str, Dict[str, float]]:
+    """Measures the summary of a PDF with `rows` transactions read whole and page by page"""
+    from scripts.bench_suite import ROWS_PER_PAGE, file_digest, use_generated_tables
+
+    pages = generate_pages(rows, max(rows // ROWS_PER_PAGE, 1))
+    file_path = os.path.join(workdir, f"estado-{rows}.pdf")
+    write_pdf(file_path, pages)
+    if shutil.which("java") is None:
+        use_generated_tables({file_digest(file_path): pages})
+    results = {}
+    for name, streaming in (('pdf', False), ('pdf streaming', True)):
+        summary = lambda: PdfAnalyzer(file_path, streaming=streaming).summary('all')
+        # Timed first, the modules imported by the first run are not counted in the peak
+        results[name] = {'summary': best_time(summary, repeat=1), 'peak': peak(summary)}
+    return results
+
+def bench_memory():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="Cantidades de transacciones a medir")
+    parser.add_argument("--no-pdf", action="store_true", help="No mide el resumen leyendo el PDF completo y por páginas")
+    args = parser.parse_args()
+
+    print(f"{'filas':>8} {'representación':<16}{'memoria':>12}{'pickle':>12}{'resumen':>12}")
+    for rows in args.rows:
+        for name, result in measure_memory(rows).items():
+            summary = f"{result['summary'] * 1000:>9.1f} ms" if 'summary' in result else f"{'-':>12}"
+            print(f"{rows:>8} {name:<16}{result['memory'] / 2**20:>9.2f} MB{result['pickle'] / 2**20:>9.2f} MB{summary}")
+    if args.no_pdf:
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench-memory-")
+    try:
+        print(f"\n{'filas':>8} {'lectura':<16}{'pico':>12}{'resumen':>12}")
+        for rows in args.rows:
+            for name, result in measure_streaming(rows, workdir).items():
+                print(f"{rows:>8} {name:<16}{result['peak'] / 2**20:>9.2f} MB{result['summary'] * 1000:>9.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    bench_memory()
@@ -0,0 +1,73 @@
+"""
+Compares serial and page-parallel extraction of a statement by page count.
+
+Usage:
+    python -m scripts.bench_page_parallel statement.pdf --pages 10 50 100 300 --chunk-size 25 --workers 4
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from app.services.extraction_pool import _start_jvm
+from app.services.pdf_analyzer import extract_pages
+from app.services.pdf_extractor import PdfExtractor
+
+def merge(chunks) -> object:
+    """Builds the table from the pages read by each worker, failing if a worker could not read its pages"""
+    pages = []
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            raise SystemExit(chunk)
+        pages.extend(chunk)
+    return PdfExtractor.from_pages(pages)
+
+def extract_serial(executor: ProcessPoolExecutor, file_path: str, page_count: int):
+    """Reads pages 1..page_count in a single worker"""
+    return merge([executor.submit(extract_pages, file_path, list(range(1, page_count + 1))).result()])
+
+def extract_parallel(executor: ProcessPoolExecutor, file_path: str, page_count: int, chunk_size: int):
+    """Reads pages 1..page_count in ranges of `chunk_size` pages spread over the workers"""
+    ranges = [list(range(start, min(start + chunk_size, page_count + 1))) for start in range(1, page_count + 1, chunk_size)]
+    return merge(executor.map(extract_pages, [file_path] * len(ranges), ranges))
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def bench_page_parallel():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="Estado de cuenta en PDF")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100, 300], help="Cantidades de páginas a medir")
+    parser.add_argument("--chunk-size", type=int, default=25, help="Páginas por rango")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Procesos de extracción")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medida, se toma la mejor")
+    args = parser.parse_args()
+
+    total_pages = PdfExtractor(args.file).page_count()
+    executor = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_start_jvm,
+    )
+    # Warm every JVM so the measures do not include its startup
+    list(executor.map(extract_pages, [args.file] * args.workers, [[1]] * args.workers))
+
+    print(f"{'páginas':>8} {'serie (s)':>10} {'paralelo (s)':>13} {'aceleración':>12} {'iguales':>8}")
+    for page_count in args.pages:
+        if page_count > total_pages:
+            print(f"{page_count:>8} omitido, el archivo tiene {total_pages} páginas")
+            continue
+        serial_times, parallel_times = [], []
+        for _ in range(args.repeat):
+            serial_time, serial = timed(extract_serial, executor, args.file, page_count)
+            parallel_time, parallel = timed(extract_parallel, executor, args.file, page_count, args.chunk_size)
+            serial_times.append(serial_time)
+            parallel_times.append(parallel_time)
+        serial_time, parallel_time = min(serial_times), min(parallel_times)
+        print(f"{page_count:>8} {serial_time:>10.2f} {parallel_time:>13.2f} {serial_time / parallel_time:>11.2f}x {str(serial.equals(parallel)):>8}")
+
+    executor.shutdown()
+
+if __name__ == "__main__":
+    bench_page_parallel()
@@ -0,0 +1,124 @@
+"""
+Measures the cold start of the API in new processes, with and without the warm-up
+(`WARMUP_ENABLED`): the import of `app.main`, the lifespan hook, the time until
+/health/ready answers, the first login and the first and second statements analyzed.
+
+Compares the results with a stored baseline like `scripts.bench_suite`.
+Without Java the statements are read with the text engine.
+
+Usage:
+    python -m scripts.bench_startup --save
+    python -m scripts.bench_startup --runs 5 --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+# Runs in the child process, only the standard library is imported before `app.main`
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+results = {"import": imported - start}
+with TestClient(app.main.app) as client:
+    results["lifespan"] = time.perf_counter() - imported
+    if client.get("/health/ready").status_code != 200:
+        raise SystemExit("/health/ready no respondió 200")
+    results["ready"] = time.perf_counter() - start
+    user = {"username": "bench", "full_name": "Benchmark", "password": "bench-password"}
+    client.post("/auth/register", json=user)
+    moment = time.perf_counter()
+    token = client.post("/auth/login", json={"username": user["username"], "password": user["password"]}).json()["access_token"]
+    results["first_login"] = time.perf_counter() - moment
+    headers = {"Authorization": f"Bearer {token}"}
+    for stage, file_path in zip(("first_request", "second_request"), sys.argv[1:]):
+        with open(file_path, "rb") as pdf:
+            content = pdf.read()
+        moment = time.perf_counter()
+        response = client.post("/pdf/summary/?status=all", headers=headers, files={"file": ("estado.pdf", content, "application/pdf")})
+        if response.status_code != 200 or "error" in response.json():
+            raise SystemExit(f"/pdf/summary/ respondió {response.status_code}: {response.text[:200]}")
+        results[stage] = time.perf_counter() - moment
+print(json.dumps(results))
+"""
+
+def run_child(files: List[str], env: Dict[str, str]) -> Dict[str, float]:
+    """Starts the API in a new process and returns the durations it measured"""
+    completed = subprocess.run([sys.executable, "-c", CHILD, *files], env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise SystemExit(f"El proceso de prueba falló:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def bench_startup():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Procesos iniciados por modo, se toma el mejor tiempo de cada etapa")
+    parser.add_argument("--rows", type=int, default=400, help="Transacciones de los estados de cuenta analizados")
+    parser.add_argument("--baseline", default="benchmarks/startup.json", help="Archivo con los tiempos de referencia")
+    parser.add_argument("--save", action="store_true", help="Guarda los tiempos medidos como referencia")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Aumento relativo que se considera una regresión")
+    parser.add_argument("--min-ms", type=float, default=50.0, help="Diferencias menores se ignoran por ser ruido")
+    args = parser.parse_args()
+
+    from scripts.bench_suite import ROWS_PER_PAGE, compare
+    from scripts.statement_generator import generate_pages, write_pdf
+
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    env = dict(os.environ)
+    env.setdefault("BCRYPT_ROUNDS", "4")
+    if shutil.which("java") is None:
+        env.setdefault("EXTRACTION_ENGINE", "text")
+        print("Java no está disponible: se usa el motor de extracción text", file=sys.stderr)
+
+    results = {}
+    try:
+        # Two different statements, the second request would be a parse cache hit otherwise
+        files = []
+        for seed in (1, 2):
+            file_path = os.path.join(workdir, f"estado-{seed}.pdf")
+            write_pdf(file_path, generate_pages(args.rows, max(args.rows // ROWS_PER_PAGE, 1), seed))
+            files.append(file_path)
+        for mode, warmup in (("cold", "false"), ("warm", "true")):
+            best: Dict[str, float] = {}
+            for run in range(args.runs):
+                # A new database per process, the first login must not find the user of a previous run
+                database = os.path.join(workdir, f"{mode}-{run}.db")
+                measured = run_child(files, {**env, "WARMUP_ENABLED": warmup, "DATABASE_URL": f"sqlite:///{database}"})
+                for stage, seconds in measured.items():
+                    best[stage] = min(best.get(stage, float("inf")), seconds)
+            results[mode] = best
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stages = list(dict.fromkeys(stage for mode in results.values() for stage in mode))
+    print(f"{'etapa':<20}" + "".join(f"{mode:>14}" for mode in results))
+    for stage in stages:
+        print(f"{stage:<20}" + "".join(f"{results[mode][stage] * 1000:>11.0f} ms" for mode in results))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, file, indent=2)
+        print(f"Referencia guardada en {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No existe la referencia {args.baseline}, ejecute con --save para crearla")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold, args.min_ms / 1000)
+    if regressions:
+        print("Regresiones:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print(f"Sin regresiones respecto a {args.baseline}")
+
+if __name__ == "__main__":
+    bench_startup()
@@ -0,0 +1,205 @@
+"""
+Times every stage of the statement pipeline over synthetic statements and compares the
+results with a stored baseline, failing if a stage got slower than the threshold.
+
+Stages: tabula and text engine extraction, concatenation of the pages, type conversion, the analyses
+(transactions, deposits, sales, summary), serialization of the response and the whole
+request through the FastAPI test client, with and without the parse cache.
+
+Without Java the tabula stage is skipped and the other stages read the generated tables.
+
+Usage:
+    python -m scripts.bench_suite --rows 1000 10000 --save
+    python -m scripts.bench_suite --rows 1000 10000 --threshold 0.25
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+from scripts.statement_generator import generate_pages, write_pdf
+
+ANALYSES = ['transactions', 'deposits', 'sales', 'summary']
+ROWS_PER_PAGE = 40
+
+def measure(function: Callable[[object], object], setup: Optional[Callable[[], object]] = None, repeat: int = 3) -> float:
+    """
+    Runs `function` `repeat` times and returns the best time in seconds
+
+    Args:
+        function (Callable[[object], object]): The measured code, receives the value returned by `setup`
+        setup (Optional[Callable[[], object]]): Code run before every repetition, not measured
+        repeat (int): Number of repetitions
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def file_digest(file_path: str) -> str:
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def use_generated_tables(tables_by_digest: Dict[str, list]) -> None:
+    """
+    Makes tabula return the generated tables of each PDF, for machines without Java.
+    The tables are found by the content of the file, uploads are saved with another name.
+    """
+    import tabula
+
+    digests: Dict[tuple, str] = {}
+
+    def read_pdf(file_path, pages='all', **kwargs):
+        # Streaming reads one page per call, the digest of a file is computed once
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_size, stat.st_mtime_ns)
+        if key not in digests:
+            digests[key] = file_digest(file_path)
+        tables = tables_by_digest[digests[key]]
+        if pages == 'all':
+            return [table.copy() for table in tables]
+        return [tables[page - 1].copy() for page in pages]
+
+    tabula.read_pdf = read_pdf
+
+def bench_stages(file_path: str, pages: list, has_java: bool, repeat: int) -> Dict[str, float]:
+    """Times the stages of the extractor and the analyzer for one statement"""
+    from app.api.v1.pdf import json_response, transactions_response
+    from app.services.extraction_engines import ENGINES
+    from app.services.pdf_analyzer import PdfAnalyzer
+    from app.services.pdf_extractor import PdfExtractor
+
+    concat_pages = PdfExtractor._PdfExtractor__concat_pages
+    convert_types = PdfExtractor._PdfExtractor__convert_types
+    results = {}
+    if has_java:
+        results['tabula'] = measure(lambda _: ENGINES['tabula'].read_pages(file_path), repeat=repeat)
+    results['text_engine'] = measure(lambda _: ENGINES['text'].read_pages(file_path), repeat=repeat)
+    results['concat_pages'] = measure(lambda _: concat_pages([page.copy() for page in pages]), repeat=repeat)
+    concatenated = concat_pages([page.copy() for page in pages])
+    results['convert_types'] = measure(convert_types, setup=concatenated.copy, repeat=repeat)
+    table = PdfExtractor.from_pages([page.copy() for page in pages])
+    for method in ANALYSES:
+        results[method] = measure(
+            lambda analyzer: getattr(analyzer, method)('all'),
+            setup=lambda: PdfAnalyzer(table=table),
+            repeat=repeat,
+        )
+    transactions = PdfAnalyzer(table=table).transactions('all')
+    results['serialize'] = measure(lambda _: json_response(transactions_response(transactions)).body, repeat=repeat)
+    return results
+
+def bench_endpoints(client, headers: dict, file_path: str, repeat: int) -> Dict[str, float]:
+    """Times whole requests through the FastAPI test client"""
+    from app.services.parse_cache import parse_cache
+
+    with open(file_path, 'rb') as pdf:
+        content = pdf.read()
+
+    def post(endpoint: str):
+        response = client.post(f'/pdf/{endpoint}/?status=all', headers=headers, files={'file': ('estado.pdf', content, 'application/pdf')})
+        if response.status_code != 200:
+            raise SystemExit(f'/pdf/{endpoint}/ respondió {response.status_code}: {response.text[:200]}')
+        return response
+
+    return {
+        'request_transactions': measure(lambda _: post('transactions'), setup=parse_cache.clear, repeat=repeat),
+        'request_transactions_cached': measure(lambda _: post('transactions'), setup=lambda: post('summary'), repeat=repeat),
+        'request_summary_cached': measure(lambda _: post('summary'), setup=lambda: post('summary'), repeat=repeat),
+    }
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds: float) -> List[str]:
+    """Returns the stages slower than the baseline by more than `threshold`, ignoring differences below `min_seconds`"""
+    regressions = []
+    for size, stages in results.items():
+        for stage, seconds in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            if seconds > base * (1 + threshold) and seconds - base > min_seconds:
+                regressions.append(f"{size} {stage}: {base * 1000:.1f} ms -> {seconds * 1000:.1f} ms (+{(seconds / base - 1) * 100:.0f}%)")
+    return regressions
+
+def bench_suite():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Cantidades de transacciones a medir")
+    parser.add_argument("--rows-per-page", type=int, default=ROWS_PER_PAGE, help="Transacciones por página")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por medida, se toma la mejor")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json", help="Archivo con los tiempos de referencia")
+    parser.add_argument("--save", action="store_true", help="Guarda los tiempos medidos como referencia")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Aumento relativo que se considera una regresión")
+    parser.add_argument("--min-ms", type=float, default=2.0, help="Diferencias menores se ignoran por ser ruido")
+    parser.add_argument("--no-requests", action="store_true", help="No mide las peticiones completas")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    has_java = shutil.which("java") is not None
+    # The app reads its settings when imported, the database and workers must be set before
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("HASH_WORKERS", "0")
+    if not has_java:
+        # The generated tables replace tabula, which is only patched in this process
+        os.environ["EXTRACTION_WORKERS"] = "0"
+        print("Java no está disponible: se omite la etapa de tabula", file=sys.stderr)
+
+    statements = {}
+    for rows in args.rows:
+        pages = generate_pages(rows, max(rows // args.rows_per_page, 1))
+        file_path = os.path.abspath(os.path.join(workdir, f"estado-{rows}.pdf"))
+        write_pdf(file_path, pages)
+        statements[rows] = (file_path, pages)
+    if not has_java:
+        use_generated_tables({file_digest(file_path): pages for file_path, pages in statements.values()})
+
+    results = {}
+    try:
+        for rows, (file_path, pages) in statements.items():
+            results[f"{rows}"] = bench_stages(file_path, pages, has_java, args.repeat)
+        if not args.no_requests:
+            from fastapi.testclient import TestClient
+            from app.main import app
+
+            with TestClient(app) as client:
+                user = {'username': 'bench', 'full_name': 'Benchmark', 'password': 'bench-password'}
+                client.post('/auth/register', json=user)
+                token = client.post('/auth/login', json={'username': user['username'], 'password': user['password']}).json()['access_token']
+                headers = {'Authorization': f'Bearer {token}'}
+                for rows, (file_path, _) in statements.items():
+                    results[f"{rows}"].update(bench_endpoints(client, headers, file_path, args.repeat))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stages = list(dict.fromkeys(stage for size in results.values() for stage in size))
+    print(f"{'etapa':<30}" + "".join(f"{rows + ' filas':>16}" for rows in results))
+    for stage in stages:
+        print(f"{stage:<30}" + "".join(f"{results[size][stage] * 1000:>13.1f} ms" if stage in results[size] else f"{'-':>16}" for size in results))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, file, indent=2)
+        print(f"Referencia guardada en {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No existe la referencia {args.baseline}, ejecute con --save para crearla")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold, args.min_ms / 1000)
+    if regressions:
+        print("Regresiones:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print(f"Sin regresiones respecto a {args.baseline}")
+
+if __name__ == "__main__":
+    bench_suite()
@@ -0,0 +1,49 @@
+"""
+Reads statements with two extraction engines and reports the transactions that differ and how long
+each engine took, to check a new engine before switching to it.
+
+Usage:
+    python -m scripts.compare_engines estado1.pdf estado2.pdf --engine tabula --candidate text
+"""
+import argparse
+import sys
+import time
+from app.services.extraction_engines import ENGINES
+from app.services.pdf_extractor import PdfExtractor, compare_tables
+
+def read(file_path: str, engine: str) -> tuple:
+    """Returns how long the engine took to read the statement and its table"""
+    start = time.perf_counter()
+    pages = ENGINES[engine].read_pages(file_path)
+    elapsed = time.perf_counter() - start
+    return elapsed, PdfExtractor.from_pages(pages)
+
+def compare_engines():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="Estados de cuenta en PDF")
+    parser.add_argument("--engine", default="tabula", choices=list(ENGINES), help="Motor de referencia")
+    parser.add_argument("--candidate", default="text", choices=list(ENGINES), help="Motor a evaluar")
+    parser.add_argument("--examples", type=int, default=10, help="Diferencias mostradas por archivo")
+    args = parser.parse_args()
+
+    differences = 0
+    print(f"{'archivo':<40}{'filas':>8}{'iguales':>9}{'distintas':>11}{'ausentes':>10}{'sobrantes':>11}{args.engine:>10}{args.candidate:>10}")
+    for file_path in args.files:
+        expected_seconds, expected = read(file_path, args.engine)
+        actual_seconds, actual = read(file_path, args.candidate)
+        report = compare_tables(expected, actual, args.examples)
+        print(
+            f"{file_path[-40:]:<40}{report['rows']:>8}{report['matched']:>9}{report['different']:>11}{report['missing']:>10}{report['extra']:>11}"
+            f"{expected_seconds:>9.2f}s{actual_seconds:>9.2f}s"
+        )
+        for example in report["examples"]:
+            print(f"    {example}")
+        differences += report["different"] + report["missing"] + report["extra"]
+
+    if differences:
+        print(f"{differences} transacciones distintas entre {args.engine} y {args.candidate}")
+        sys.exit(1)
+    print(f"{args.engine} y {args.candidate} leen las mismas transacciones")
+
+if __name__ == "__main__":
+    compare_engines()
@@ -1,10 +1,8 @@
 import os
 from sqlmodel import Session, select
 from app.db.models import User
-from app.db import engine
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.db.database import engine
+from app.core.hashing import pwd_context
 
 def create_superuser():
     username = os.getenv("SUPERUSER_USERNAME")
@@ -21,7 +19,7 @@ def create_superuser():
             print("El superusuario ya existe.")
             return
 
-        hashed_password = pwd_context.hash(password)
+        hashed_password = pwd_context().hash(password)
         superuser = User(
             username=username,
             full_name=full_name,
@@ -0,0 +1,26 @@
+"""
+Stand-in for tabula used by `scripts.load_test`, which puts this directory first in the
+PYTHONPATH of the server so the web process and the extraction workers import it.
+
+Returns the tables generated for every PDF, stored by the load test as `<sha256>.pkl` in
+the directory `LOAD_TEST_TABLES`, and waits `LOAD_TEST_STUB_PAGE_MS` milliseconds per page
+to stand for the time tabula takes to read it.
+"""
+import hashlib
+import os
+import pickle
+import time
+from functools import lru_cache
+from typing import List
+
+@lru_cache(maxsize=None)
+def _tables(digest: str) -> list:
+    with open(os.path.join(os.environ["LOAD_TEST_TABLES"], f"{digest}.pkl"), "rb") as file:
+        return pickle.load(file)
+
+def read_pdf(file_path: str, pages="all", **kwargs) -> List:
+    with open(file_path, "rb") as file:
+        tables = _tables(hashlib.sha256(file.read()).hexdigest())
+    numbers = range(1, len(tables) + 1) if pages == "all" else pages
+    time.sleep(float(os.getenv("LOAD_TEST_STUB_PAGE_MS", 0)) / 1000 * len(numbers))
+    return [tables[number - 1].copy() for number in numbers]
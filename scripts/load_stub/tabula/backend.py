@@ -0,0 +1,5 @@
+class TabulaVm:
+    """The stub does not need a JVM"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        pass
@@ -0,0 +1,286 @@
+"""
+Load test of the API: sends mixed traffic from concurrent clients (logins, /user/me and uploads of
+statements of several sizes) and reports the throughput and the p50/p95/p99 latency of every endpoint.
+Uploads are reported by endpoint and size. Several concurrency levels make a saturation sweep, that
+stops at the first level over `--max-p99-ms` or `--max-error-rate`.
+
+By default the API is started locally with uvicorn and a new SQLite database, the parse cache and the
+per user limits disabled (`--rate-limit` keeps them, rejections are counted as 429) and a stub of tabula that returns the generated tables (`--engine stub`), optionally waiting
+`--stub-page-ms` per page. `--engine text` and `--engine tabula` read the PDF files for real.
+With `--url` the traffic goes to a server that is already running.
+
+Usage:
+    python -m scripts.load_test --concurrency 1 4 16 64 --duration 20
+    python -m scripts.load_test --engine tabula --workers 2 --output benchmarks/load-2-workers.json
+    python -m scripts.load_test --url http://localhost:8000 --username demo --password secreto
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+import httpx
+import numpy as np
+from scripts.statement_generator import generate_pages, write_pdf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_DIR = os.path.join(ROOT, "scripts", "load_stub")
+ROWS_PER_PAGE = 40
+# Endpoints of the traffic mix, the uploads send a statement of every size
+OPERATIONS = {
+    "login": ("POST", "/auth/login"),
+    "me": ("GET", "/user/me"),
+    "sales": ("POST", "/pdf/sales/"),
+    "summary": ("POST", "/pdf/summary/"),
+    "transactions": ("POST", "/pdf/transactions/"),
+}
+UPLOADS = {"sales", "summary", "transactions"}
+
+# A sample: endpoint label, seconds, status code and whether it succeeded
+Sample = Tuple[str, float, int, bool]
+
+def parse_mix(values: List[str]) -> Dict[str, float]:
+    """Reads the weights of the traffic mix, given as `endpoint=weight`"""
+    mix = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Operación desconocida: {name}. Debe ser una de {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    """Waits until /health/ready answers 200, failing if the server exits first"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"El servidor terminó con el código {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"El servidor no estuvo listo en {timeout:.0f} s")
+
+@contextmanager
+def local_server(args: argparse.Namespace, workdir: str) -> Iterator[str]:
+    """Starts the API with uvicorn and yields its URL, the server is stopped on exit"""
+    port = free_port()
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    env["EXTRACTION_ENGINE"] = "tabula" if args.engine == "stub" else args.engine
+    if not args.cache:
+        env["PARSE_CACHE_MAX_ENTRIES"] = "0"
+    if not args.rate_limit:
+        env["RATE_LIMIT_ENABLED"] = "false"
+    env["RATE_LIMIT_DB"] = os.path.join(workdir, "rate_limit.db")
+    if args.extraction_workers is not None:
+        env["EXTRACTION_WORKERS"] = str(args.extraction_workers)
+    if args.engine == "stub":
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [STUB_DIR, env.get("PYTHONPATH")]))
+        env["LOAD_TEST_TABLES"] = workdir
+        env["LOAD_TEST_STUB_PAGE_MS"] = str(args.stub_page_ms)
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    # The tables are created before, the uvicorn workers would race to create them in the new database
+    subprocess.run([sys.executable, "-c", "from app.db.database import create_db_and_tables; create_db_and_tables()"], cwd=ROOT, env=env, check=True)
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(url, process, args.startup_timeout)
+        yield url
+    finally:
+        # Like Ctrl+C, the server stops its worker processes before exiting
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def write_statements(sizes: List[int], workdir: str) -> Dict[int, bytes]:
+    """Generates a statement of every size, with its tables stored for the tabula stub"""
+    statements = {}
+    for rows in sizes:
+        pages = generate_pages(rows, max(rows // ROWS_PER_PAGE, 1))
+        file_path = os.path.join(workdir, f"estado-{rows}.pdf")
+        write_pdf(file_path, pages)
+        with open(file_path, "rb") as file:
+            content = file.read()
+        with open(os.path.join(workdir, f"{hashlib.sha256(content).hexdigest()}.pkl"), "wb") as file:
+            pickle.dump(pages, file)
+        statements[rows] = content
+    return statements
+
+def login(url: str, username: str, password: str) -> str:
+    """Registers the user if it does not exist and returns its token"""
+    credentials = {"username": username, "password": password}
+    response = httpx.post(f"{url}/auth/login", json=credentials, timeout=60)
+    if response.status_code != 200:
+        httpx.post(f"{url}/auth/register", json={**credentials, "full_name": "Prueba de carga"}, timeout=60)
+        response = httpx.post(f"{url}/auth/login", json=credentials, timeout=60)
+    if response.status_code != 200:
+        raise SystemExit(f"No se pudo autenticar a {username}: {response.text[:200]}")
+    return response.json()["access_token"]
+
+def make_request(name: str, rows: Optional[int], statements: Dict[int, bytes], credentials: dict, token: str) -> dict:
+    """Returns the arguments of `httpx.AsyncClient.request` for an operation"""
+    method, path = OPERATIONS[name]
+    if name == "login":
+        return {"method": method, "url": path, "json": credentials}
+    request = {"method": method, "url": path, "headers": {"Authorization": f"Bearer {token}"}}
+    if name in UPLOADS:
+        request["params"] = {"status": "all"}
+        request["files"] = {"file": ("estado.pdf", statements[rows], "application/pdf")}
+    return request
+
+async def run_clients(url: str, plan: List[Tuple[str, dict]], weights: List[float], concurrency: int, duration: float, timeout: float, seed: int) -> Tuple[List[Sample], float]:
+    """
+    Runs `concurrency` clients that send requests drawn from the plan until the duration is over
+
+    Returns:
+        Tuple[List[Sample], float]: Every request made and the seconds until the last one finished
+    """
+    samples: List[Sample] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+
+        async def run(rng: random.Random, deadline: float) -> None:
+            while time.perf_counter() < deadline:
+                label, request = rng.choices(plan, weights)[0]
+                start = time.perf_counter()
+                try:
+                    response = await client.request(**request)
+                    # The PDF endpoints answer errors reading the file with 200 and an `error` field
+                    status, ok = response.status_code, response.status_code < 400 and not response.content.startswith(b'{"error"')
+                except httpx.HTTPError:
+                    status, ok = 0, False
+                samples.append((label, time.perf_counter() - start, status, ok))
+
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(run(random.Random(seed + client), deadline) for client in range(concurrency)))
+        return samples, time.perf_counter() - start
+
+async def warm_up(url: str, plan: List[Tuple[str, dict]], timeout: float) -> None:
+    """Sends every request of the plan once, failing if one of them does not succeed"""
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        for label, request in plan:
+            response = await client.request(**request)
+            if response.status_code >= 400 or response.content.startswith(b'{"error"'):
+                raise SystemExit(f"{label} respondió {response.status_code}: {response.text[:200]}")
+
+def report(samples: List[Sample], elapsed: float) -> Dict[str, Dict[str, float]]:
+    """Returns the requests, errors, throughput and latency percentiles of every endpoint and of all of them"""
+    labels = sorted({sample[0] for sample in samples})
+    results = {}
+    for label in labels + ["total"]:
+        selected = [sample for sample in samples if label in ("total", sample[0])]
+        latencies = np.array([sample[1] for sample in selected])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        results[label] = {
+            "requests": len(selected),
+            "errors": sum(not sample[3] for sample in selected),
+            "busy": sum(sample[2] == 503 for sample in selected),
+            "limited": sum(sample[2] == 429 for sample in selected),
+            "throughput": len(selected) / elapsed,
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+        }
+    return results
+
+def print_level(concurrency: int, results: Dict[str, Dict[str, float]]) -> None:
+    print(f"\nConcurrencia {concurrency}")
+    print(f"{'endpoint':<20}{'peticiones':>11}{'errores':>9}{'503':>6}{'429':>6}{'req/s':>9}{'p50':>11}{'p95':>11}{'p99':>11}")
+    for label, result in results.items():
+        print(
+            f"{label:<20}{result['requests']:>11}{result['errors']:>9}{result['busy']:>6}{result['limited']:>6}{result['throughput']:>9.1f}"
+            + "".join(f"{result[percentile] * 1000:>8.0f} ms" for percentile in ("p50", "p95", "p99"))
+        )
+
+def load_test():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Servidor que ya está en ejecución, si no se indica se inicia uno local")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Clientes concurrentes de cada nivel del barrido")
+    parser.add_argument("--duration", type=float, default=15.0, help="Segundos de tráfico por nivel")
+    parser.add_argument("--mix", nargs="+", default=["login=1", "me=4", "sales=5"], help=f"Peso de cada operación: {', '.join(OPERATIONS)}")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="Transacciones de los estados de cuenta subidos")
+    parser.add_argument("--engine", choices=["stub", "text", "tabula"], default="stub", help="Extracción del servidor local")
+    parser.add_argument("--stub-page-ms", type=float, default=0.0, help="Milisegundos que tarda el stub de tabula por página")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn del servidor local")
+    parser.add_argument("--extraction-workers", type=int, help="EXTRACTION_WORKERS del servidor local")
+    parser.add_argument("--cache", action="store_true", help="Mantiene la caché de estados de cuenta del servidor local")
+    parser.add_argument("--rate-limit", action="store_true", help="Mantiene los límites por usuario del servidor local")
+    parser.add_argument("--username", default="loadtest", help="Usuario de las peticiones, se registra si no existe")
+    parser.add_argument("--password", default="loadtest-password", help="Contraseña del usuario")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Segundos de espera de cada petición")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Segundos de espera hasta que el servidor local esté listo")
+    parser.add_argument("--max-p99-ms", type=float, help="Latencia p99 a partir de la que se considera saturado")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Proporción de errores a partir de la que se considera saturado")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de la elección de operaciones")
+    parser.add_argument("--output", help="Guarda la configuración y los resultados en un archivo JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    levels = []
+    try:
+        statements = write_statements(args.sizes, workdir) if UPLOADS & set(mix) else {}
+        with local_server(args, workdir) if args.url is None else nullcontext(args.url.rstrip("/")) as url:
+            credentials = {"username": args.username, "password": args.password}
+            token = login(url, **credentials)
+            plan, weights = [], []
+            for name, weight in mix.items():
+                for rows in (args.sizes if name in UPLOADS else [None]):
+                    plan.append((name if rows is None else f"{name} {rows}", make_request(name, rows, statements, credentials, token)))
+                    weights.append(weight / (len(args.sizes) if rows is not None else 1))
+            # Every request once before measuring, the first ones load the modules and the JVM
+            asyncio.run(warm_up(url, plan, args.timeout))
+            for concurrency in args.concurrency:
+                samples, elapsed = asyncio.run(run_clients(url, plan, weights, concurrency, args.duration, args.timeout, args.seed))
+                results = report(samples, elapsed)
+                print_level(concurrency, results)
+                levels.append({"concurrency": concurrency, "seconds": elapsed, "endpoints": results})
+                total = results["total"]
+                error_rate = total["errors"] / total["requests"] if total["requests"] else 1.0
+                if error_rate > args.max_error_rate or (args.max_p99_ms is not None and total["p99"] * 1000 > args.max_p99_ms):
+                    print(f"Saturado con {concurrency} clientes: {error_rate:.1%} de errores, p99 {total['p99'] * 1000:.0f} ms")
+                    break
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if len(levels) > 1:
+        print(f"\n{'clientes':>9}{'req/s':>9}{'p99':>11}{'errores':>9}")
+        for level in levels:
+            total = level["endpoints"]["total"]
+            print(f"{level['concurrency']:>9}{total['throughput']:>9.1f}{total['p99'] * 1000:>8.0f} ms{total['errors']:>9}")
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("password", "output")}
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump({"config": config, "levels": levels}, file, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    load_test()
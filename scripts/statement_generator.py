@@ -0,0 +1,155 @@
+"""
+Generates synthetic Transfermóvil-style statements with any number of rows and pages.
+
+Usage:
+    python -m scripts.statement_generator estado.pdf --rows 5000 --pages 125
+"""
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+from typing import List
+import numpy as np
+import pandas as pd
+
+# Headers of the table as they appear in the statement, `PdfExtractor` renames them
+HEADERS = ["Id", "Fecha", "Importe", "Moneda", "Cliente", "Descuento", "A pagar", "Tipo", "Estado", "Pago"]
+TRANSACTION_TYPES = [
+    'Venta de Saldo AT',
+    'Recarga Propia AT',
+    'Recarga Movil',
+    'Recarga Nauta AT',
+    'Recarga Nauta Hogar AT',
+    'Pago Factura AT',
+    'Recarga Bolsa CUP',
+    'Estado de Cuenta',
+]
+
+def generate_rows(rows: int, seed: int = 1, rollback_ratio: float = 0.02) -> List[list]:
+    """
+    Generates the transactions of a statement in chronological order
+
+    Args:
+        rows (int): Number of transactions
+        seed (int): Seed of the random generator, the same seed gives the same statement
+        rollback_ratio (float): Share of transactions that are rolled back, each one
+        adds a second transaction to the same supplier
+
+    Returns:
+        List[list]: The rows of the table, with the values tabula reads from the PDF
+    """
+    rnd = random.Random(seed)
+    start = datetime(2025, 3, 1, 8)
+    result = []
+    while len(result) < rows:
+        index = len(result)
+        date = start + timedelta(minutes=index * 3 + rnd.randint(0, 2))
+        amount = float(rnd.choice([25, 50, 100, 150, 200, 250, 300, 500, 1000]))
+        row = [
+            f"TM{seed:03d}{index:08d}",
+            date.strftime("%d/%m/%Y %H:%M:%S"),
+            amount,
+            "CUP",
+            rnd.randint(50000000, 59999999),
+            0.0,
+            amount,
+            rnd.choice(TRANSACTION_TYPES),
+            "Exitosa" if rnd.random() < 0.9 else "Fallida",
+            "Saldo",
+        ]
+        result.append(row)
+        if rnd.random() < rollback_ratio and len(result) < rows:
+            rollback = list(row)
+            rollback[0] = f"TM{seed:03d}{index + 1:08d}"
+            rollback[1] = (date + timedelta(minutes=1)).strftime("%d/%m/%Y %H:%M:%S")
+            result.append(rollback)
+    return result
+
+def split_pages(rows: List[list], pages: int) -> List[pd.DataFrame]:
+    """
+    Splits the rows into one table per page, shaped like the DataFrames returned by tabula:
+    the statement headers as columns and an empty line at the end of every page
+
+    Args:
+        rows (List[list]): Rows returned by `generate_rows`
+        pages (int): Number of pages, at least one
+
+    Returns:
+        List[pd.DataFrame]: The table of every page
+    """
+    pages = max(pages, 1)
+    per_page = max(math.ceil(len(rows) / pages), 1)
+    tables = []
+    for page in range(pages):
+        table = pd.DataFrame(rows[page * per_page:(page + 1) * per_page], columns=HEADERS)
+        table.loc[len(table)] = [np.nan] * len(HEADERS)
+        tables.append(table)
+    return tables
+
+def generate_pages(rows: int, pages: int, seed: int = 1) -> List[pd.DataFrame]:
+    """Generates the tables of every page of a statement"""
+    return split_pages(generate_rows(rows, seed), pages)
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(file_path: str, tables: List[pd.DataFrame], repeat_header: bool = True) -> None:
+    """
+    Writes the tables as a PDF with one landscape page per table and the text of every
+    cell in fixed columns, so tabula can read it back and pypdf can count its pages
+
+    Args:
+        file_path (str): Path of the PDF file
+        tables (List[pd.DataFrame]): The table of every page
+        repeat_header (bool): Whether every page starts with the header, or only the first one
+    """
+    widths = [70, 80, 50, 35, 60, 50, 50, 110, 50, 40]
+    columns = [20 + sum(widths[:index]) for index in range(len(widths))]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page, table in enumerate(tables):
+        # The empty line of the page turns the supplier column into floats
+        rows = table.dropna(how='all').astype({"Cliente": "int64"})
+        lines = ([HEADERS] if repeat_header or page == 0 else []) + [[str(value) for value in row] for row in rows.values.tolist()]
+        leading = min(12.0, 540.0 / max(len(lines), 1))
+        commands = [f"BT /F1 {min(7.0, leading * 0.8):.2f} Tf"]
+        for line, values in enumerate(lines):
+            y = 570 - line * leading
+            for x, value in zip(columns, values):
+                commands.append(f"1 0 0 1 {x} {y:.2f} Tm ({_escape(value)}) Tj")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 842 595] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    with open(file_path, "wb") as pdf:
+        pdf.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(pdf.tell())
+            pdf.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = pdf.tell()
+        pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            pdf.write(b"%010d 00000 n \n" % offset)
+        pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+def statement_generator():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="Ruta del PDF a generar")
+    parser.add_argument("--rows", type=int, default=1000, help="Cantidad de transacciones")
+    parser.add_argument("--pages", type=int, default=25, help="Cantidad de páginas")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla del generador")
+    parser.add_argument("--header-once", action="store_true", help="Escribe el encabezado de la tabla solo en la primera página")
+    args = parser.parse_args()
+    write_pdf(args.file, generate_pages(args.rows, args.pages, args.seed), repeat_header=not args.header_once)
+    print(f"{args.file}: {args.rows} transacciones en {args.pages} páginas")
+
+if __name__ == "__main__":
+    statement_generator()
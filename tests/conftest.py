@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+# The settings are read when the app is imported, the tests use a database of their own,
+# run the extraction and hashing in threads and read the generated statements without Java
+DATA_DIR = tempfile.mkdtemp(prefix="ecuenta-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(DATA_DIR, 'test.db')}",
+    "RATE_LIMIT_DB": os.path.join(DATA_DIR, "rate_limit.db"),
+    "RATE_LIMIT_ENABLED": "false",
+    "EXTRACTION_ENGINE": "text",
+    "EXTRACTION_WORKERS": "0",
+    "HASH_WORKERS": "0",
+    "BCRYPT_ROUNDS": "4",
+    "PARSE_CACHE_MAX_ENTRIES": "0",
+})
+
+import numpy as np
+import pandas as pd
+import pytest
+from typing import List
+from fastapi.testclient import TestClient
+from scripts.statement_generator import HEADERS, generate_pages, generate_rows, write_pdf
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    user = {"username": "tester", "full_name": "Tester", "password": "tester-password"}
+    client.post("/auth/register", json=user)
+    token = client.post("/auth/login", json={"username": user["username"], "password": user["password"]}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="session")
+def statement_pdf():
+    """Content of a statement of 200 transactions in 5 pages"""
+    file_path = os.path.join(DATA_DIR, "estado.pdf")
+    write_pdf(file_path, generate_pages(200, 5))
+    with open(file_path, "rb") as file:
+        return file.read()
+
+@pytest.fixture(scope="session")
+def rollback_statement():
+    """
+    Path of a statement of 300 transactions in 6 pages, with the header only on the first one,
+    where every page after the first starts with the second transaction of a rollback
+    """
+    rows = generate_rows(300, seed=7, rollback_ratio=0.1)
+    # The generator only repeats a supplier in the transaction that rolls back the previous one
+    rollbacks = [index for index in range(1, len(rows)) if rows[index][4] == rows[index - 1][4]]
+    breaks = [next(index for index in rollbacks if index >= target) for target in range(50, 300, 50)]
+    file_path = os.path.join(DATA_DIR, "rollbacks.pdf")
+    write_statement(file_path, rows, breaks, repeat_header=False)
+    return file_path
+
+def write_statement(file_path: str, rows: List[list], breaks: List[int], repeat_header: bool = True) -> None:
+    """Writes the rows as a statement whose pages start at the rows of `breaks`"""
+    tables = []
+    for start, end in zip([0, *breaks], [*breaks, len(rows)]):
+        table = pd.DataFrame(rows[start:end], columns=HEADERS)
+        table.loc[len(table)] = [np.nan] * len(HEADERS)
+        tables.append(table)
+    write_pdf(file_path, tables, repeat_header=repeat_header)
+
+def pdf_file(content: bytes, name: str = "estado.pdf") -> dict:
+    return {"file": (name, content, "application/pdf")}
@@ -0,0 +1,48 @@
+import os
+import pytest
+from scripts.statement_generator import generate_rows
+from tests.conftest import DATA_DIR, write_statement
+
+@pytest.fixture(scope="session")
+def overlapping_statements():
+    """Content of two statements sharing 50 transactions and of one statement with the rows of both"""
+    rows = generate_rows(250, seed=3, rollback_ratio=0)
+    contents = []
+    for name, part in (("primero", rows[:150]), ("segundo", rows[100:]), ("completo", rows)):
+        file_path = os.path.join(DATA_DIR, f"{name}.pdf")
+        write_statement(file_path, part, list(range(50, len(part), 50)))
+        with open(file_path, "rb") as file:
+            contents.append(file.read())
+    return contents
+
+def batch_files(*contents):
+    return [("files", (f"estado-{index}.pdf", content, "application/pdf")) for index, content in enumerate(contents)]
+
+def test_overlapping_statements_are_counted_once(client, auth_headers, overlapping_statements):
+    first, second, whole = overlapping_statements
+
+    batch = client.post("/pdf/batch/?status=all", headers=auth_headers, files=batch_files(first, second)).json()
+    expected = client.post("/pdf/summary/?status=all", headers=auth_headers, files={"file": ("completo.pdf", whole, "application/pdf")}).json()
+
+    assert batch["summary"] == expected
+    assert batch["duplicates"] == 50
+    assert [file["transactions"] for file in batch["files"]] == [150, 150]
+    assert [file["duplicates"] for file in batch["files"]] == [0, 50]
+
+def test_repeated_statement_adds_nothing(client, auth_headers, overlapping_statements):
+    first, _, _ = overlapping_statements
+
+    single = client.post("/pdf/batch/?status=all", headers=auth_headers, files=batch_files(first)).json()
+    repeated = client.post("/pdf/batch/?status=all", headers=auth_headers, files=batch_files(first, first)).json()
+
+    assert repeated["summary"] == single["summary"]
+    assert repeated["duplicates"] == 150
+
+def test_unreadable_statement_does_not_fail_the_batch(client, auth_headers, overlapping_statements):
+    first, _, _ = overlapping_statements
+
+    batch = client.post("/pdf/batch/?status=all", headers=auth_headers, files=batch_files(first, b"%PDF-1.4 garbage")).json()
+
+    assert batch["files"][0]["transactions"] == 150
+    assert batch["files"][1]["error"]
+    assert batch["summary"]["total"] == batch["files"][0]["summary"]["total"]
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+import numpy as np
+import pytest
+from app.services.export import stream_arrow, stream_csv, stream_ndjson, table_chunks
+from app.services.pdf_extractor import COLUMNS, PdfExtractor
+from scripts.statement_generator import generate_pages
+from tests.conftest import pdf_file
+
+@pytest.fixture
+def table():
+    """Transactions whose ids were read as numbers and with an empty payment type"""
+    table = PdfExtractor.from_pages(generate_pages(30, 2))
+    table['id'] = np.arange(len(table), dtype='int64')
+    table['supplier_id'] = table['supplier_id'].astype(float).astype('int64')
+    table.loc[2, 'payment_type'] = np.nan
+    return table
+
+def test_arrow_export_casts_numeric_ids_to_strings(table):
+    import pyarrow as pa
+
+    content = b"".join(stream_arrow(table_chunks(table, chunk_size=10)))
+    exported = pa.ipc.open_stream(content).read_all()
+
+    assert exported.num_rows == len(table)
+    assert exported.schema.field('id').type == pa.string()
+    assert exported.column('id').to_pylist() == [str(value) for value in range(len(table))]
+    assert exported.column('payment_type').to_pylist()[2] == ''
+
+def test_ndjson_export_follows_transaction_schema(table):
+    lines = b"".join(stream_ndjson(table_chunks(table, chunk_size=10))).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+
+    assert len(rows) == len(table)
+    assert rows[0]['id'] == '0' and isinstance(rows[0]['supplier_id'], str)
+    assert rows[2]['payment_type'] == ''
+
+def test_csv_export_has_header_and_every_row(table):
+    rows = list(csv.reader(io.StringIO(b"".join(stream_csv(table_chunks(table, chunk_size=10))).decode())))
+
+    assert rows[0] == COLUMNS
+    assert len(rows) == len(table) + 1
+
+@pytest.mark.parametrize("format", ["ndjson", "csv", "arrow"])
+def test_exported_transactions_match_json(client, auth_headers, statement_pdf, format):
+    expected = client.post("/pdf/transactions/?status=all", headers=auth_headers, files=pdf_file(statement_pdf)).json()["results"]
+
+    response = client.post(f"/pdf/transactions/?status=all&format={format}", headers=auth_headers, files=pdf_file(statement_pdf))
+
+    assert response.status_code == 200
+    if format == "ndjson":
+        exported = [json.loads(line) for line in response.text.splitlines()]
+    elif format == "csv":
+        exported = list(csv.DictReader(io.StringIO(response.text)))
+        expected = [{column: str(value) for column, value in row.items()} for row in expected]
+    else:
+        import pyarrow as pa
+        exported = pa.ipc.open_stream(response.content).read_all().to_pylist()
+    assert exported == expected
@@ -0,0 +1,85 @@
+import asyncio
+import pandas as pd
+import pypdf
+import pytest
+from app.core.config import settings
+from app.services import extraction_engines
+from app.services.extraction_engines import ENGINES, get_engine
+from app.services.pdf_analyzer import analyze, extract_parallel
+from app.services.pdf_extractor import PdfExtractor
+from scripts.statement_generator import generate_pages, write_pdf
+
+@pytest.fixture
+def statement(tmp_path):
+    """Statement of 12 pages and 600 rows with the header only on the first page"""
+    file_path = str(tmp_path / "estado.pdf")
+    write_pdf(file_path, generate_pages(600, 12), repeat_header=False)
+    return file_path
+
+def test_parallel_ranges_match_serial_extraction_without_repeated_headers(statement, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_ENGINE", "text")
+    monkeypatch.setattr(settings, "PAGE_CHUNK_SIZE", 5)
+    serial = PdfExtractor(statement).read_pdf(return_format='dataframe')
+    parallel = asyncio.run(extract_parallel(statement))
+
+    assert len(serial) == 600
+    pd.testing.assert_frame_equal(parallel, serial)
+
+@pytest.mark.parametrize("chunk_pages", [1, 2, 4])
+def test_rollbacks_split_across_ranges_are_removed_like_serial(rollback_statement, chunk_pages, monkeypatch):
+    # Every page of the statement after the first starts with the second transaction of a rollback
+    monkeypatch.setattr(settings, "EXTRACTION_ENGINE", "text")
+    monkeypatch.setattr(settings, "PAGE_CHUNK_SIZE", chunk_pages)
+    serial = PdfExtractor(rollback_statement).read_pdf(return_format='dataframe')
+    parallel = asyncio.run(extract_parallel(rollback_statement))
+
+    pd.testing.assert_frame_equal(parallel, serial)
+    _, serial_summary = analyze(rollback_statement, serial, 'summary', transaction_status='all')
+    _, parallel_summary = analyze(rollback_statement, parallel, 'summary', transaction_status='all')
+    _, serial_transactions = analyze(rollback_statement, serial, 'transactions', transaction_status='all')
+    _, parallel_transactions = analyze(rollback_statement, parallel, 'transactions', transaction_status='all')
+
+    assert parallel_summary == serial_summary
+    assert parallel_summary["total"] < len(serial)
+    pd.testing.assert_frame_equal(parallel_transactions, serial_transactions)
+
+@pytest.fixture
+def pypdf_version(monkeypatch):
+    """Sets the version of pypdf the text engine sees"""
+    def set_version(version):
+        monkeypatch.setattr(extraction_engines.metadata, "version", lambda name: version)
+        extraction_engines.text_engine_supported.cache_clear()
+
+    yield set_version
+    extraction_engines.text_engine_supported.cache_clear()
+
+def test_text_engine_falls_back_to_tabula_on_untested_pypdf(pypdf_version):
+    pypdf_version("6.1.0")
+    assert get_engine("text") is ENGINES["tabula"]
+
+    pypdf_version("5.4.0")
+    assert get_engine("text") is ENGINES["text"]
+
+def test_text_engine_drops_decoded_objects_every_batch(statement, monkeypatch):
+    clears = []
+
+    class Objects(dict):
+        def clear(self):
+            clears.append(len(self))
+            super().clear()
+
+    class Reader(pypdf.PdfReader):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.resolved_objects = Objects(self.resolved_objects)
+
+    monkeypatch.setattr(pypdf, "PdfReader", Reader)
+    engine = ENGINES["text"]
+    by_page = list(engine.iter_pages(statement, batch=1))
+    clears_by_page = len(clears)
+    by_four = list(engine.iter_pages(statement, batch=4))
+
+    assert clears_by_page == 12
+    assert len(clears) - clears_by_page == 3
+    for page, same_page in zip(by_page, by_four):
+        pd.testing.assert_frame_equal(page, same_page)
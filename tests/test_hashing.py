@@ -0,0 +1,41 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from app.core.hashing import PasswordHasher
+
+class BrokenExecutor(Executor):
+    """Executor whose worker died, every task fails"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A worker died"))
+        return future
+
+class ThreadExecutor(Executor):
+    """Executor that runs every task in the calling thread"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+def test_broken_pool_is_replaced_outside_the_event_loop(monkeypatch):
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    spawned_in = []
+
+    def spawn():
+        spawned_in.append(threading.get_ident())
+        hasher._PasswordHasher__executor = ThreadExecutor()
+
+    monkeypatch.setattr(hasher, "_PasswordHasher__spawn", spawn)
+    hasher._PasswordHasher__executor = BrokenExecutor()
+
+    async def hash_password():
+        return await hasher.hash("password"), threading.get_ident()
+
+    hashed_password, loop_thread = asyncio.run(hash_password())
+
+    assert hashed_password.startswith("$2b$")
+    assert len(spawned_in) == 1
+    assert spawned_in[0] != loop_thread
@@ -0,0 +1,29 @@
+from app.services.extraction_pool import extraction_pool
+from tests.conftest import pdf_file
+from tests.test_pagination import wait_for_job
+
+def test_job_analyzes_the_table_in_one_task(client, auth_headers, statement_pdf, monkeypatch):
+    tasks = []
+    run = extraction_pool.run
+
+    async def recording_run(task, *args, **kwargs):
+        tasks.append(getattr(task, "func", task).__name__)
+        return await run(task, *args, **kwargs)
+
+    monkeypatch.setattr(extraction_pool, "run", recording_run)
+    job = client.post("/pdf/jobs?status=all", headers=auth_headers, files=pdf_file(statement_pdf)).json()
+    job = wait_for_job(client, auth_headers, job["id"])
+
+    assert job["status"] == "done"
+    assert job["progress"] == 1.0
+    assert tasks.count("analyze_many") == 1
+    assert "analyze" not in tasks
+
+def test_job_results_match_the_analysis_endpoints(client, auth_headers, statement_pdf):
+    job = client.post("/pdf/jobs?status=all&amount_min=100", headers=auth_headers, files=pdf_file(statement_pdf)).json()
+    assert wait_for_job(client, auth_headers, job["id"])["status"] == "done"
+    results = client.get(f"/pdf/jobs/{job['id']}/results", headers=auth_headers).json()
+
+    for name in ("transactions", "deposits", "sales"):
+        expected = client.post(f"/pdf/{name}/?status=all&amount_min=100", headers=auth_headers, files=pdf_file(statement_pdf)).json()
+        assert results[name] == expected
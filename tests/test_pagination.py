@@ -0,0 +1,102 @@
+import time
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from app.services.pagination import keyset_page, uses_cursor
+from tests.conftest import pdf_file
+
+def walk_pages(fetch):
+    """Follows `next_cursor` from the first page and returns the ids of every page"""
+    ids, cursor = [], None
+    while True:
+        body = fetch(cursor)
+        ids.extend(row["id"] for row in body["results"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+def wait_for_job(client, auth_headers, job_id):
+    for _ in range(200):
+        job = client.get(f"/pdf/jobs/{job_id}", headers=auth_headers).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("El trabajo no terminó")
+
+def test_limit_without_page_returns_every_transaction(client, auth_headers, statement_pdf):
+    everything = client.post("/pdf/transactions/?status=all", headers=auth_headers, files=pdf_file(statement_pdf)).json()
+    limited = client.post("/pdf/transactions/?status=all&limit=10", headers=auth_headers, files=pdf_file(statement_pdf)).json()
+
+    assert limited["results"] == everything["results"]
+    assert limited["next_cursor"] is None
+
+def test_cursor_pages_cover_every_transaction_once(client, auth_headers, statement_pdf):
+    everything = client.post("/pdf/transactions/?status=all", headers=auth_headers, files=pdf_file(statement_pdf)).json()["results"]
+
+    def fetch(cursor):
+        url = "/pdf/transactions/?status=all&limit=30&pagination=cursor" + (f"&cursor={cursor}" if cursor else "")
+        return client.post(url, headers=auth_headers, files=pdf_file(statement_pdf)).json()
+
+    ids = walk_pages(fetch)
+    assert len(ids) == len(set(ids)) == len(everything)
+    assert set(ids) == {row["id"] for row in everything}
+
+def test_cursor_pagination_needs_limit(client, auth_headers, statement_pdf):
+    response = client.post("/pdf/transactions/?pagination=cursor", headers=auth_headers, files=pdf_file(statement_pdf))
+
+    assert response.status_code == 400
+
+def test_filters_apply_before_the_page(client, auth_headers, statement_pdf):
+    everything = client.post("/pdf/transactions/?status=all", headers=auth_headers, files=pdf_file(statement_pdf)).json()["results"]
+    amount_min = sorted(row["amount_paid"] for row in everything)[len(everything) // 2]
+
+    def fetch(cursor):
+        url = f"/pdf/transactions/?status=all&amount_min={amount_min}&limit=10&pagination=cursor" + (f"&cursor={cursor}" if cursor else "")
+        return client.post(url, headers=auth_headers, files=pdf_file(statement_pdf)).json()
+
+    ids = walk_pages(fetch)
+    assert set(ids) == {row["id"] for row in everything if row["amount_paid"] >= amount_min}
+
+def test_job_results_take_a_cursor_per_list(client, auth_headers, statement_pdf):
+    job = client.post("/pdf/jobs?status=all", headers=auth_headers, files=pdf_file(statement_pdf)).json()
+    assert wait_for_job(client, auth_headers, job["id"])["status"] == "done"
+    results = client.get(f"/pdf/jobs/{job['id']}/results", headers=auth_headers).json()
+
+    for name in ("transactions", "deposits", "sales"):
+        def fetch(cursor):
+            url = f"/pdf/jobs/{job['id']}/results?limit=5&pagination=cursor" + (f"&{name}_cursor={cursor}" if cursor else "")
+            return client.get(url, headers=auth_headers).json()[name]
+
+        assert sorted(walk_pages(fetch)) == sorted(row["id"] for row in results[name]["results"])
+
+def test_keyset_page_orders_undated_transactions_first():
+    table = pd.DataFrame({
+        "id": ["3", "1", "2", "4"],
+        "date": ["02/01/2024 10:00:00", "01/01/2024 10:00:00", "sin fecha", "01/01/2024 10:00:00"],
+        "amount_paid": [1.0, 2.0, 3.0, 4.0],
+    }, index=[0, 0, 1, 1])
+
+    first = keyset_page(table, 2)
+    second = keyset_page(table, 2, first["next_cursor"])
+
+    assert [row["id"] for row in first["results"] + second["results"]] == ["2", "1", "4", "3"]
+    assert second["next_cursor"] is None
+
+def test_uses_cursor_only_when_asked():
+    assert not uses_cursor(10, None, "page")
+    assert uses_cursor(10, None, "cursor")
+    assert uses_cursor(10, "abc", "page")
+    with pytest.raises(HTTPException):
+        uses_cursor(None, None, "cursor")
+
+def test_stored_transactions_follow_the_same_modes(client, auth_headers, statement_pdf):
+    statement_id = client.post("/statements/", headers=auth_headers, files=pdf_file(statement_pdf)).json()["statement"]["id"]
+    base = f"/statements/transactions/?statement_id={statement_id}&status=all"
+    everything = client.get(base, headers=auth_headers).json()["results"]
+
+    limited = client.get(f"{base}&limit=10", headers=auth_headers).json()
+    ids = walk_pages(lambda cursor: client.get(f"{base}&limit=25&pagination=cursor" + (f"&cursor={cursor}" if cursor else ""), headers=auth_headers).json())
+
+    assert limited["results"] == everything
+    assert limited["next_cursor"] is None
+    assert sorted(ids) == sorted(row["id"] for row in everything)
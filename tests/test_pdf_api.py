@@ -0,0 +1,24 @@
+import pytest
+from app.services.pdf_extractor import READ_ERROR
+from tests.conftest import pdf_file
+
+@pytest.mark.parametrize("route", [
+    "/pdf/transactions/",
+    "/pdf/deposits/",
+    "/pdf/sales/",
+    "/pdf/summary/",
+    "/pdf/analytics/timeseries/",
+    "/pdf/analytics/suppliers/",
+    "/pdf/analytics/failures/",
+])
+def test_unreadable_pdf_returns_read_error(client, auth_headers, route):
+    response = client.post(route, headers=auth_headers, files=pdf_file(b"%PDF-1.4 garbage"))
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": READ_ERROR}
+
+def test_readable_pdf_is_analyzed(client, auth_headers, statement_pdf):
+    response = client.post("/pdf/summary/?status=all", headers=auth_headers, files=pdf_file(statement_pdf))
+
+    assert response.status_code == 200
+    assert response.json()["total"] > 0
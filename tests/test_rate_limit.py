@@ -0,0 +1,95 @@
+import io
+import threading
+import zipfile
+import pytest
+from app.core.config import settings
+from app.core.rate_limit import Limits, RateLimiter, rate_limiter
+from app.services import jobs
+from tests.conftest import pdf_file
+from tests.test_pagination import wait_for_job
+
+@pytest.fixture
+def limiter(tmp_path):
+    return RateLimiter(str(tmp_path / "rate_limit.db"), lease_seconds=600, busy_retry_after=5)
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    """Enables the limits of the app with one slot and a bucket of three requests that barely refills"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_MINUTE", 0.1)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 3)
+    monkeypatch.setattr(settings, "RATE_LIMIT_CONCURRENT", 1)
+    rate_limiter.reset()
+    yield
+    rate_limiter.reset()
+
+def taken_slots() -> int:
+    return rate_limiter._RateLimiter__connect().execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+
+def test_bucket_rejects_once_empty(limiter):
+    limits = Limits(per_minute=60, burst=2, concurrent=0)
+
+    assert limiter.admit("user", limits).allowed
+    assert limiter.admit("user", limits).allowed
+    rejected = limiter.admit("user", limits)
+
+    assert not rejected.allowed
+    assert rejected.reason == 'rate'
+    assert 0 < rejected.retry_after <= 1
+
+def test_slots_are_freed_on_release(limiter):
+    limits = Limits(per_minute=0, burst=0, concurrent=1)
+
+    admission = limiter.admit("user", limits)
+    busy = limiter.admit("user", limits)
+    other_user = limiter.admit("other", limits)
+    limiter.release(admission.slot)
+
+    assert admission.allowed and other_user.allowed
+    assert not busy.allowed and busy.reason == 'concurrent' and busy.retry_after == 5
+    assert limiter.admit("user", limits).allowed
+
+def test_cost_leaves_the_bucket_in_debt(limiter):
+    limits = Limits(per_minute=60, burst=2, concurrent=0)
+
+    assert limiter.admit("user", limits, cost=5).allowed
+    rejected = limiter.admit("user", limits)
+
+    # Two tokens were left and five were charged, one more is needed after the three owed
+    assert not rejected.allowed
+    assert 3.9 < rejected.retry_after <= 4
+
+def test_job_holds_its_slot_until_it_finishes(client, auth_headers, statement_pdf, rate_limited, monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+    extract_pdf = jobs.extract_pdf
+
+    async def slow_extract_pdf(*args, **kwargs):
+        started.set()
+        await jobs.asyncio.to_thread(finish.wait, 10)
+        return await extract_pdf(*args, **kwargs)
+
+    monkeypatch.setattr(jobs, "extract_pdf", slow_extract_pdf)
+    job = client.post("/pdf/jobs?status=all", headers=auth_headers, files=pdf_file(statement_pdf)).json()
+    assert started.wait(10)
+
+    busy = client.post("/pdf/summary/", headers=auth_headers, files=pdf_file(statement_pdf))
+    finish.set()
+
+    assert busy.status_code == 429
+    assert wait_for_job(client, auth_headers, job["id"])["status"] == "done"
+    assert taken_slots() == 0
+    assert client.post("/pdf/summary/", headers=auth_headers, files=pdf_file(statement_pdf)).status_code == 200
+
+def test_batch_is_charged_per_statement(client, auth_headers, statement_pdf, rate_limited):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("uno.pdf", statement_pdf)
+        zip_file.writestr("dos.pdf", statement_pdf)
+        zip_file.writestr("notas.txt", "sin estado de cuenta")
+    files = [("files", ("estados.zip", archive.getvalue(), "application/zip")), ("files", ("tres.pdf", statement_pdf, "application/pdf"))]
+
+    assert client.post("/pdf/batch/", headers=auth_headers, files=files).status_code == 200
+    rejected = client.post("/pdf/summary/", headers=auth_headers, files=pdf_file(statement_pdf))
+
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) > 60
@@ -0,0 +1,36 @@
+import json
+import numpy as np
+import pytest
+from app.api.v1.pdf import json_response, transactions_response
+from app.schemas.pdf import PdfTransactionsResponse
+from app.schemas.transaction import TransactionData
+from app.services.pdf_extractor import PdfExtractor
+from scripts.statement_generator import generate_pages
+
+@pytest.fixture
+def table():
+    return PdfExtractor.from_pages(generate_pages(200, 5))
+
+def fast_path(table, **pagination) -> dict:
+    return json.loads(json_response(transactions_response(table, **pagination)).body)
+
+@pytest.mark.parametrize("pagination", [{}, {"page": 2, "limit": 10}, {"limit": 10}])
+def test_fast_path_matches_model_validated_response(table, pagination):
+    content = transactions_response(table, **pagination)
+    expected = json.loads(PdfTransactionsResponse(**content).model_dump_json())
+
+    assert fast_path(table, **pagination) == expected
+
+def test_fast_path_follows_transaction_schema_with_empty_cells_and_numeric_ids(table):
+    table = table.head(20).copy()
+    table['id'] = range(len(table))
+    table.loc[3, 'payment_type'] = np.nan
+    table['date'] = table['date'].astype(object)
+    table.loc[4, 'date'] = None
+
+    results = fast_path(table)['results']
+
+    assert [TransactionData.model_validate(result).model_dump() for result in results] == results
+    assert results[0]['id'] == '0'
+    assert results[3]['payment_type'] == ''
+    assert results[4]['date'] == ''
@@ -0,0 +1,44 @@
+import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from app.api.v1 import user
+from app.core import auth_cache as auth_cache_module
+from app.core.auth_cache import auth_cache
+from app.core.config import settings
+from app.db.database import engine
+from app.db.models import User
+
+def test_request_resolves_current_user_once():
+    # /user/me depends on the current user in the router and in the endpoint
+    app = FastAPI()
+    app.include_router(user.router, prefix="/user")
+    auth_cache.put_token("cached-token", "cached-user")
+    auth_cache.put_user(User(id=1, username="cached-user", full_name="Cached user", hashed_password="hash"))
+    before = auth_cache.stats()["token_lookups"]
+
+    response = TestClient(app).get("/user/me", headers={"Authorization": "Bearer cached-token"})
+
+    assert response.status_code == 200
+    assert response.json()["username"] == "cached-user"
+    assert auth_cache.stats()["token_lookups"] == before + 1
+
+def test_change_from_another_process_is_seen_after_the_ttl(client, monkeypatch):
+    user = {"username": "stale-user", "full_name": "Stale user", "password": "stale-password"}
+    client.post("/auth/register", json=user)
+    token = client.post("/auth/login", json={"username": user["username"], "password": user["password"]}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    now = [time.monotonic()]
+    monkeypatch.setattr(auth_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0], time=time.time))
+    assert client.get("/user/me", headers=headers).status_code == 200
+
+    # A Core UPDATE does not fire the ORM events, like a change saved by another process
+    with engine.begin() as connection:
+        connection.execute(update(User).where(User.username == user["username"]).values(disabled=True))
+    cached = client.get("/user/me", headers=headers)
+    now[0] += settings.AUTH_CACHE_TTL_SECONDS + 1
+    expired = client.get("/user/me", headers=headers)
+
+    assert cached.status_code == 200
+    assert expired.status_code == 403
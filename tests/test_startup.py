@@ -0,0 +1,11 @@
+import subprocess
+import sys
+
+LAZY_MODULES = ["jose", "cryptography", "bcrypt", "passlib", "tabula", "pypdf", "openpyxl"]
+
+def test_importing_app_skips_lazy_modules():
+    # A new process, the test session has already imported them
+    code = f"import sys, app.main; print([m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert completed.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,35 @@
+import pytest
+from app.core.config import settings
+from app.services.extraction_pool import extraction_pool
+from app.services.pdf_analyzer import analyze
+from tests.conftest import pdf_file
+
+@pytest.mark.parametrize("transaction_status", ["all", "successful", "failed"])
+@pytest.mark.parametrize("filters", [None, {"amount_min": 100}, {"transaction_type": "Recarga Bolsa CUP"}])
+def test_streaming_summary_matches_in_memory_summary(rollback_statement, transaction_status, filters):
+    table, in_memory = analyze(rollback_statement, None, 'summary', filters=filters, transaction_status=transaction_status)
+    streamed_table, streamed = analyze(rollback_statement, None, 'summary', filters=filters, streaming=True, transaction_status=transaction_status)
+
+    assert streamed_table is None
+    assert streamed == in_memory
+    # The rollbacks that start a page are removed with the transaction they roll back
+    assert in_memory["successful"] + in_memory["failed"] < len(table)
+
+def test_summary_endpoint_streams_long_statements(client, auth_headers, rollback_statement, monkeypatch):
+    with open(rollback_statement, "rb") as file:
+        content = file.read()
+    in_memory = client.post("/pdf/summary/?status=all", headers=auth_headers, files=pdf_file(content)).json()
+
+    streaming = []
+    run = extraction_pool.run
+
+    async def recording_run(task, *args, **kwargs):
+        streaming.append(task.keywords.get("streaming", False))
+        return await run(task, *args, **kwargs)
+
+    monkeypatch.setattr(extraction_pool, "run", recording_run)
+    monkeypatch.setattr(settings, "STREAMING_MIN_PAGES", 2)
+    streamed = client.post("/pdf/summary/?status=all", headers=auth_headers, files=pdf_file(content)).json()
+
+    assert streaming == [True]
+    assert streamed == in_memory